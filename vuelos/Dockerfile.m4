@@ -2,10 +2,17 @@ FROM python:3.11-slim
 
 WORKDIR /app
 
-RUN pip install --no-cache-dir flask flask-socketio
+RUN pip install --no-cache-dir flask flask-socketio msgpack
 
 COPY m4_mapa.py .
+COPY rutas.py .
+COPY geo.py .
+COPY trayectoria.py .
+COPY indice_espacial.py .
+COPY frame_binario.py .
+COPY protocolo.py .
 COPY templates/ templates/
+COPY static/ static/
 
 EXPOSE 5000
 
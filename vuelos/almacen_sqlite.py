@@ -0,0 +1,311 @@
+"""
+ALMACENAMIENTO SQLITE (M3)
+Una fila por vuelo (clave: id) con el último estado, más una tabla con el
+historial de posiciones. La base está en modo WAL (las lecturas no bloquean
+la escritura) y las sentencias son constantes, así que el módulo sqlite3 las
+prepara una vez por conexión. Los guardados y las horas de llegada se encolan
+en orden y un hilo los aplica con executemany en una transacción por lote
+(UPSERT por id y UPDATE por clave primaria). Las estadísticas cuentan cada
+registro guardado, como el log JSONL: contadores y conteo por ruta que se
+suman en la misma transacción.
+La durabilidad sigue FSYNC_MODO: 'registros' -> synchronous=FULL y commit por
+lote, 'tiempo' -> synchronous=NORMAL y commit cada FSYNC_CADA_MS, 'so' -> OFF
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from itertools import groupby
+from collections import Counter, deque
+
+from almacenamiento import Almacenamiento
+from escritor_grupal import MODO_REGISTROS, MODO_SO, MODO_TIEMPO, MODOS_DURABILIDAD
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS vuelos (
+    id TEXT PRIMARY KEY,
+    origen TEXT,
+    destino TEXT,
+    distancia_total REAL,
+    velocidad REAL,
+    hora_llegada TEXT,
+    actualizado_en TEXT,
+    timestamp_unix REAL,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS vuelos_ruta ON vuelos (origen, destino);
+CREATE TABLE IF NOT EXISTS posiciones (
+    vuelo_id TEXT NOT NULL,
+    timestamp_unix REAL,
+    lat REAL,
+    lon REAL,
+    altitud REAL,
+    progreso REAL
+);
+CREATE INDEX IF NOT EXISTS posiciones_vuelo ON posiciones (vuelo_id, timestamp_unix);
+CREATE TABLE IF NOT EXISTS totales (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    registros INTEGER NOT NULL DEFAULT 0,
+    distancia_total REAL NOT NULL DEFAULT 0,
+    velocidad_total REAL NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO totales (id) VALUES (1);
+CREATE TABLE IF NOT EXISTS rutas (
+    origen TEXT NOT NULL,
+    destino TEXT NOT NULL,
+    cantidad INTEGER NOT NULL,
+    PRIMARY KEY (origen, destino)
+);
+"""
+
+SQL_GUARDAR = """
+INSERT INTO vuelos (id, origen, destino, distancia_total, velocidad, hora_llegada,
+                    actualizado_en, timestamp_unix, datos)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    origen = excluded.origen,
+    destino = excluded.destino,
+    distancia_total = excluded.distancia_total,
+    velocidad = excluded.velocidad,
+    hora_llegada = excluded.hora_llegada,
+    actualizado_en = excluded.actualizado_en,
+    timestamp_unix = excluded.timestamp_unix,
+    datos = excluded.datos
+"""
+SQL_POSICION = "INSERT INTO posiciones VALUES (?, ?, ?, ?, ?, ?)"
+SQL_PARCHE = """
+UPDATE vuelos SET hora_llegada = ?, actualizado_en = ?, datos = json_patch(datos, ?)
+WHERE id = ?
+"""
+SQL_OBTENER = "SELECT datos, hora_llegada, actualizado_en FROM vuelos WHERE id = ?"
+SQL_TRAYECTORIA = """
+SELECT lat, lon FROM posiciones WHERE vuelo_id = ?
+ORDER BY timestamp_unix DESC LIMIT 1000
+"""
+SQL_SUMAR_TOTALES = """
+UPDATE totales SET registros = registros + ?, distancia_total = distancia_total + ?,
+                   velocidad_total = velocidad_total + ?
+"""
+SQL_SUMAR_RUTA = """
+INSERT INTO rutas VALUES (?, ?, ?)
+ON CONFLICT (origen, destino) DO UPDATE SET cantidad = cantidad + excluded.cantidad
+"""
+SQL_TOTALES = "SELECT registros, distancia_total, velocidad_total FROM totales"
+SQL_RUTAS = "SELECT origen || '-' || destino, cantidad FROM rutas ORDER BY cantidad DESC LIMIT 5"
+
+SINCRONIZACION = {MODO_REGISTROS: 'FULL', MODO_TIEMPO: 'NORMAL', MODO_SO: 'OFF'}
+CAMPOS_COLUMNA = ('hora_llegada', 'actualizado_en')  # Campos de parche con columna propia
+
+
+def filas_de_registro(registro):
+    """(fila de vuelos, fila de posiciones o None) de un registro de vuelo"""
+    origen = registro.get('origen') or {}
+    destino = registro.get('destino') or {}
+    # La trayectoria vive en la tabla de posiciones
+    datos = {k: v for k, v in registro.items() if k != 'trayectoria'}
+    vuelo = (
+        registro['id'], origen.get('code'), destino.get('code'),
+        registro.get('distancia_total', 0), registro.get('velocidad', 0),
+        registro.get('hora_llegada'), registro.get('actualizado_en'),
+        registro.get('timestamp_unix'), json.dumps(datos, ensure_ascii=False)
+    )
+    posicion = None
+    if registro.get('lat_actual') is not None:
+        posicion = (
+            registro['id'], registro.get('timestamp_unix'), registro['lat_actual'],
+            registro.get('lon_actual'), registro.get('altitud'), registro.get('progreso')
+        )
+    return vuelo, posicion
+
+
+class AlmacenSQLite(Almacenamiento):
+    """Backend SQLite con escritura por lotes desde un hilo propio"""
+
+    def __init__(self, ruta, modo=MODO_REGISTROS, cada_ms=100):
+        if modo not in MODOS_DURABILIDAD:
+            raise ValueError(f"Modo de durabilidad desconocido: {modo}")
+        self.ubicacion = ruta
+        self.modo = modo
+        self.cada_s = max(1, cada_ms) / 1000.0
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        # Conexión de escritura (la usan el hilo escritor y quien fuerce un vaciado)
+        self.conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self.conexion.execute('PRAGMA journal_mode=WAL')
+        self.conexion.execute(f'PRAGMA synchronous={SINCRONIZACION[modo]}')
+        self.conexion.executescript(ESQUEMA)
+        # Conexión de lectura: en WAL lee sin bloquear al escritor
+        self.lectura = sqlite3.connect(ruta, check_same_thread=False)
+        self.lock_lectura = threading.Lock()
+        # Ids guardados (incluye los encolados): agregar_parche responde sin consultar la base
+        self.ids = {vuelo_id for vuelo_id, in self.conexion.execute('SELECT id FROM vuelos')}
+        self.pendientes = deque()  # (es_parche, fila, fila de posiciones o None), en orden de llegada
+        self.cond = threading.Condition()
+        self.lock_escritura = threading.Lock()
+        self.running = True
+        # Métricas
+        self.registros = 0
+        self.lotes = 0
+        self.commits = 0
+        self.hilo = threading.Thread(target=self._escribir_lotes, daemon=True)
+        self.hilo.start()
+
+    @classmethod
+    def desde_entorno(cls, ruta):
+        """Misma configuración de durabilidad que el escritor JSONL (FSYNC_MODO, FSYNC_CADA_MS)"""
+        return cls(
+            ruta,
+            modo=os.getenv('FSYNC_MODO', MODO_REGISTROS).strip().lower(),
+            cada_ms=int(os.getenv('FSYNC_CADA_MS', '100')),
+        )
+
+    # ---------- Escritura ----------
+
+    def guardar(self, registro):
+        vuelo, posicion = filas_de_registro(registro)
+        with self.cond:
+            self.ids.add(vuelo[0])
+            self.pendientes.append((False, vuelo, posicion))
+            self.cond.notify()
+
+    def _escribir_lotes(self):
+        while self.running:
+            with self.cond:
+                if not self.pendientes:
+                    self.cond.wait()
+            if self.modo == MODO_TIEMPO:
+                time.sleep(self.cada_s)  # Junta lo que llegue durante la ventana
+            try:
+                self.vaciar()
+            except Exception as e:
+                print(f"❌ Error escribiendo lote en SQLite: {e}")
+
+    def vaciar(self):
+        """Aplica lo encolado en una sola transacción"""
+        with self.lock_escritura:
+            self._insertar_pendientes()
+
+    def _insertar_pendientes(self):
+        # Llamar con lock_escritura tomado
+        with self.cond:
+            lote = list(self.pendientes)
+            self.pendientes.clear()
+        if not lote:
+            return
+        conexion = self.conexion
+        registros = 0
+        distancia = velocidad = 0
+        rutas = Counter()
+        conexion.execute('BEGIN')
+        try:
+            # Tramos consecutivos de guardados o de parches: un parche se aplica
+            # después de los guardados anteriores y antes de los siguientes
+            for es_parche, tramo in groupby(lote, key=lambda e: e[0]):
+                tramo = list(tramo)
+                if es_parche:
+                    conexion.executemany(SQL_PARCHE, [fila for _, fila, _ in tramo])
+                    continue
+                conexion.executemany(SQL_GUARDAR, [vuelo for _, vuelo, _ in tramo])
+                conexion.executemany(SQL_POSICION, [p for _, _, p in tramo if p is not None])
+                registros += len(tramo)
+                for _, (_, origen, destino, d, v, *_), _ in tramo:
+                    distancia += d or 0
+                    velocidad += v or 0
+                    if origen is not None and destino is not None:
+                        rutas[origen, destino] += 1
+            if registros:
+                conexion.execute(SQL_SUMAR_TOTALES, (registros, distancia, velocidad))
+                conexion.executemany(SQL_SUMAR_RUTA, [(o, d, c) for (o, d), c in rutas.items()])
+            conexion.execute('COMMIT')
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+        self.registros += registros
+        self.lotes += 1
+        self.commits += 1
+
+    def agregar_parche(self, vuelo_id, campos):
+        """Encola un UPDATE por clave primaria; se aplica en el lote, después de lo ya encolado"""
+        resto = {k: v for k, v in campos.items() if k not in CAMPOS_COLUMNA}
+        fila = (campos.get('hora_llegada'), campos.get('actualizado_en', ''),
+                json.dumps(resto, ensure_ascii=False), vuelo_id)
+        with self.cond:
+            if vuelo_id not in self.ids:
+                return False
+            self.pendientes.append((True, fila, None))
+            self.cond.notify()
+        return True
+
+    # ---------- Lectura ----------
+
+    def __len__(self):
+        self.vaciar()
+        with self.lock_lectura:
+            return self.lectura.execute('SELECT registros FROM totales').fetchone()[0]
+
+    def obtener(self, vuelo_id):
+        self.vaciar()
+        with self.lock_lectura:
+            fila = self.lectura.execute(SQL_OBTENER, (vuelo_id,)).fetchone()
+            if fila is None:
+                return None
+            puntos = self.lectura.execute(SQL_TRAYECTORIA, (vuelo_id,)).fetchall()
+        datos, hora_llegada, actualizado_en = fila
+        vuelo = json.loads(datos)
+        if actualizado_en is not None:
+            vuelo['hora_llegada'] = hora_llegada
+            if actualizado_en:
+                vuelo['actualizado_en'] = actualizado_en
+        vuelo['trayectoria'] = [[lat, lon] for lat, lon in reversed(puntos)]
+        return vuelo
+
+    def resumen_estadisticas(self):
+        """Contadores por registro guardado (mismo significado que en el log JSONL)"""
+        self.vaciar()
+        with self.lock_lectura:
+            total, distancia, velocidad = self.lectura.execute(SQL_TOTALES).fetchone()
+            rutas = self.lectura.execute(SQL_RUTAS).fetchall()
+        return {
+            'total_vuelos': total,
+            'distancia_total': round(distancia, 2),
+            'promedio_velocidad': round(velocidad / total if total > 0 else 0, 2),
+            'rutas_populares': [(ruta, cantidad) for ruta, cantidad in rutas]
+        }
+
+    def metricas(self):
+        with self.cond:
+            return {
+                'modo': self.modo,
+                'pendientes': len(self.pendientes),
+                'registros': self.registros,
+                'lotes': self.lotes,
+                'fsyncs': self.commits,
+            }
+
+    # ---------- Mantenimiento ----------
+
+    def compactar(self):
+        """Vuelca el WAL a la base y lo trunca"""
+        with self.lock_escritura:
+            self.conexion.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def reiniciar(self):
+        with self.lock_escritura:
+            with self.cond:
+                self.pendientes.clear()
+                self.ids.clear()
+            self.conexion.execute('BEGIN')
+            self.conexion.execute('DELETE FROM vuelos')
+            self.conexion.execute('DELETE FROM posiciones')
+            self.conexion.execute('DELETE FROM rutas')
+            self.conexion.execute('UPDATE totales SET registros = 0, distancia_total = 0, velocidad_total = 0')
+            self.conexion.execute('COMMIT')
+
+    def cerrar(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        self.hilo.join(timeout=5)
+        self.vaciar()
+        self.lectura.close()
+        self.conexion.close()
@@ -0,0 +1,212 @@
+"""
+ALMACÉN COMPACTO DE VUELOS (M2)
+Registros con __slots__ en lugar de diccionarios por vuelo: los aeropuertos
+y las imágenes se guardan como índices a tablas compartidas y las horas como
+timestamps float; el formato de diccionario/ISO solo se genera al serializar
+"""
+from datetime import datetime
+
+from trayectoria import Trayectoria
+
+# Imágenes de aviones reales (se guardan por índice en cada vuelo)
+IMAGENES_AVION = (
+    'https://upload.wikimedia.org/wikipedia/commons/thumb/9/9a/Boeing_737-800_%28American_Airlines%29.jpg/320px-Boeing_737-800_%28American_Airlines%29.jpg',
+    'https://upload.wikimedia.org/wikipedia/commons/thumb/4/4e/Airbus_A320-211_Airbus_Industries_F-WWBA_%28cn_001%29_%281988%29.jpg/320px-Airbus_A320-211_Airbus_Industries_F-WWBA_%28cn_001%29_%281988%29.jpg',
+    'https://upload.wikimedia.org/wikipedia/commons/thumb/8/8a/Boeing_777-300ER_%28Emirates%29.jpg/320px-Boeing_777-300ER_%28Emirates%29.jpg',
+    'https://upload.wikimedia.org/wikipedia/commons/thumb/0/0a/Airbus_A350-900_%28Qatar_Airways%29.jpg/320px-Airbus_A350-900_%28Qatar_Airways%29.jpg',
+    'https://upload.wikimedia.org/wikipedia/commons/thumb/5/5a/Boeing_787-9_Dreamliner_%28ANA%29.jpg/320px-Boeing_787-9_Dreamliner_%28ANA%29.jpg',
+    'https://upload.wikimedia.org/wikipedia/commons/thumb/3/3a/Airbus_A380-800_%28Emirates%29.jpg/320px-Airbus_A380-800_%28Emirates%29.jpg'
+)
+
+
+def iso(timestamp):
+    """Formatea un timestamp float como ISO 8601 (None se conserva)"""
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+class TablaAeropuertos:
+    """Aeropuertos en columnas paralelas; los vuelos solo guardan el índice"""
+
+    def __init__(self, aeropuertos):
+        self.codigos = list(aeropuertos.keys())
+        self.indice = {code: i for i, code in enumerate(self.codigos)}
+        self.lat = [aeropuertos[c][0] for c in self.codigos]
+        self.lon = [aeropuertos[c][1] for c in self.codigos]
+        self.nombres = [aeropuertos[c][2] for c in self.codigos]
+        # Un único dict por aeropuerto, compartido por todos los mensajes que lo serializan
+        self._dicts = [
+            {'code': c, 'nombre': self.nombres[i], 'lat': self.lat[i], 'lon': self.lon[i]}
+            for i, c in enumerate(self.codigos)
+        ]
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def __contains__(self, code):
+        return code in self.indice
+
+    def a_dict(self, i):
+        return self._dicts[i]
+
+
+class RegistroVuelo:
+    """Estado de un vuelo con huella de memoria fija (sin __dict__)"""
+
+    __slots__ = (
+        'id', 'origen', 'destino', 'distancia_total', 'rumbo',
+        'velocidad', 'velocidad_base', 'altitud', 'progreso',
+        'lat_actual', 'lon_actual', 'activo', 'emergencia', 'combustible',
+        't_salida', 't_llegada_estimada', 't_eta', 't_llegada',
+        'distancia_restante', 'imagen', 'trayectoria', 'ruta', 'cambios'
+    )
+
+    def __init__(self, vuelo_id, origen, destino, distancia_total, rumbo,
+                 velocidad, altitud, lat, lon, combustible, t_salida,
+                 t_llegada_estimada, imagen, ruta=None):
+        self.id = vuelo_id
+        self.origen = origen      # índice en TablaAeropuertos
+        self.destino = destino    # índice en TablaAeropuertos
+        self.ruta = ruta          # Ruta precalculada compartida (rutas.TablaRutas)
+        self.distancia_total = distancia_total
+        self.rumbo = rumbo
+        self.velocidad = velocidad
+        self.velocidad_base = velocidad  # Para recordar la original
+        self.altitud = altitud
+        self.progreso = 0.0
+        self.lat_actual = lat
+        self.lon_actual = lon
+        self.activo = True
+        self.emergencia = False
+        self.combustible = combustible
+        self.t_salida = t_salida
+        self.t_llegada_estimada = t_llegada_estimada
+        self.t_eta = None
+        self.t_llegada = None
+        self.distancia_restante = None
+        self.imagen = imagen      # índice en IMAGENES_AVION
+        self.trayectoria = Trayectoria()  # Buffer acotado que se simplifica al agregar
+        self.trayectoria.agregar(lat, lon)
+        self.cambios = None       # Campos ocasionales modificados desde el último mensaje
+
+
+class AlmacenVuelos:
+    """Vuelos activos indexados por id, serializables al formato de mensaje original"""
+
+    def __init__(self, aeropuertos):
+        self.aeropuertos = aeropuertos if isinstance(aeropuertos, TablaAeropuertos) else TablaAeropuertos(aeropuertos)
+        self.vuelos = {}
+        self.marcados = set()  # Ids con campos marcados pendientes de enviar
+
+    def __len__(self):
+        return len(self.vuelos)
+
+    def __contains__(self, vuelo_id):
+        return vuelo_id in self.vuelos
+
+    def __getitem__(self, vuelo_id):
+        return self.vuelos[vuelo_id]
+
+    def get(self, vuelo_id, default=None):
+        return self.vuelos.get(vuelo_id, default)
+
+    def values(self):
+        return self.vuelos.values()
+
+    def items(self):
+        return self.vuelos.items()
+
+    def agregar(self, registro):
+        self.vuelos[registro.id] = registro
+
+    def eliminar(self, vuelo_id):
+        self.marcados.discard(vuelo_id)
+        return self.vuelos.pop(vuelo_id, None)
+
+    def limpiar(self):
+        self.vuelos = {}
+        self.marcados = set()
+
+    def nombre_ruta(self, registro):
+        codigos = self.aeropuertos.codigos
+        return f"{codigos[registro.origen]}→{codigos[registro.destino]}"
+
+    def marcar(self, registro, *campos):
+        """Anota campos que no cambian cada tick para incluirlos en el próximo delta"""
+        if registro.cambios is None:
+            registro.cambios = set(campos)
+        else:
+            registro.cambios.update(campos)
+        self.marcados.add(registro.id)
+
+    def a_delta(self, registro):
+        """
+        Delta de un vuelo_update: solo lo que cambia en cada tick (posición,
+        progreso, combustible, ETA y el último punto de la trayectoria) más
+        los campos marcados con marcar()
+        """
+        eta = iso(registro.t_eta)
+        delta = {
+            'id': registro.id,
+            'lat_actual': registro.lat_actual,
+            'lon_actual': registro.lon_actual,
+            'progreso': registro.progreso,
+            'combustible': registro.combustible,
+            'distancia_restante': registro.distancia_restante,
+            'eta': eta,
+            'hora_llegada_estimada': eta,
+            'punto': registro.trayectoria.ultimo_punto()
+        }
+        if registro.cambios:
+            for campo in registro.cambios:
+                delta[campo] = getattr(registro, campo)
+            registro.cambios = None
+            self.marcados.discard(registro.id)
+        return delta
+
+    def a_posicion(self, registro):
+        """
+        Delta de solo posición como tupla para el registro fijo del protocolo
+        binario (equivale a a_delta cuando no hay campos marcados)
+        """
+        return (registro.id, registro.lat_actual, registro.lon_actual, registro.progreso,
+                registro.combustible, registro.distancia_restante, registro.t_eta)
+    
+    def a_dict(self, registro):
+        """Genera el diccionario de vuelo que esperan M1, M3 y M4"""
+        registro.cambios = None
+        self.marcados.discard(registro.id)
+        tabla = self.aeropuertos
+        hora_salida = iso(registro.t_salida)
+        vuelo = {
+            'id': registro.id,
+            'origen': tabla.a_dict(registro.origen),
+            'destino': tabla.a_dict(registro.destino),
+            'distancia_total': registro.distancia_total,
+            'rumbo': registro.rumbo,
+            'velocidad': registro.velocidad,
+            'velocidad_base': registro.velocidad_base,
+            'altitud': registro.altitud,
+            'progreso': registro.progreso,
+            'lat_actual': registro.lat_actual,
+            'lon_actual': registro.lon_actual,
+            'activo': registro.activo,
+            'emergencia': registro.emergencia,
+            'combustible': registro.combustible,
+            'hora_salida': hora_salida,
+            'hora_llegada_estimada': None,
+            'inicio': hora_salida,  # Mantener compatibilidad
+            'imagen_avion': IMAGENES_AVION[registro.imagen],
+            'trayectoria': registro.trayectoria.puntos()
+        }
+        if registro.distancia_restante is not None:
+            vuelo['distancia_restante'] = registro.distancia_restante
+            vuelo['eta'] = iso(registro.t_eta)
+        # Mientras vuela, la hora estimada de llegada es la ETA: se formatea una sola vez
+        if registro.t_eta is not None and registro.t_eta == registro.t_llegada_estimada:
+            vuelo['hora_llegada_estimada'] = vuelo['eta']
+        else:
+            vuelo['hora_llegada_estimada'] = iso(registro.t_llegada_estimada)
+        if registro.t_llegada is not None:
+            vuelo['fin'] = iso(registro.t_llegada)
+            vuelo['hora_llegada'] = vuelo['fin']  # Hora real de llegada
+        return vuelo
@@ -0,0 +1,69 @@
+"""
+ALMACENAMIENTO DE M3
+Interfaz común de los backends donde BaseDatos guarda los vuelos y fábrica que
+elige uno con ALMACENAMIENTO:
+- 'jsonl':  log segmentado de líneas JSON (log_segmentado.py, por defecto)
+- 'sqlite': tabla de vuelos por id + historial de posiciones (almacen_sqlite.py)
+"""
+import os
+from abc import ABC, abstractmethod
+
+ALMACENAMIENTO_JSONL = 'jsonl'
+ALMACENAMIENTO_SQLITE = 'sqlite'
+
+
+class Almacenamiento(ABC):
+    """Operaciones que BaseDatos necesita de un backend de almacenamiento"""
+
+    ubicacion = None  # Ruta del archivo o directorio (para los mensajes)
+
+    @abstractmethod
+    def __len__(self):
+        """Cantidad de registros que cuentan las estadísticas"""
+
+    @abstractmethod
+    def guardar(self, registro):
+        """Guarda el estado completo de un vuelo (alta o actualización)"""
+
+    @abstractmethod
+    def agregar_parche(self, vuelo_id, campos):
+        """Actualiza campos de un vuelo existente; False si el vuelo no existe"""
+
+    @abstractmethod
+    def obtener(self, vuelo_id):
+        """Estado actual de un vuelo, o None"""
+
+    @abstractmethod
+    def resumen_estadisticas(self):
+        """{'total_vuelos', 'distancia_total', 'promedio_velocidad', 'rutas_populares'}"""
+
+    @abstractmethod
+    def metricas(self):
+        """Métricas de escritura: modo, pendientes, registros, lotes, fsyncs"""
+
+    def compactar(self):
+        """Mantenimiento en segundo plano (puede no hacer nada)"""
+
+    @abstractmethod
+    def reiniciar(self):
+        """Borra todo lo guardado"""
+
+    @abstractmethod
+    def cerrar(self):
+        """Escribe lo pendiente y libera los archivos"""
+
+
+def crear_almacenamiento(base_dir, tipo=None):
+    """Backend configurado (ALMACENAMIENTO=jsonl|sqlite) con sus datos en base_dir"""
+    tipo = (tipo or os.getenv('ALMACENAMIENTO', ALMACENAMIENTO_JSONL)).strip().lower()
+    if tipo == ALMACENAMIENTO_SQLITE:
+        from almacen_sqlite import AlmacenSQLite
+        return AlmacenSQLite.desde_entorno(os.path.join(base_dir, 'vuelos.db'))
+    if tipo != ALMACENAMIENTO_JSONL:
+        raise ValueError(f"Almacenamiento desconocido: {tipo}")
+    from log_segmentado import LogSegmentado
+    # Adopta el archivo único del formato anterior si existe
+    return LogSegmentado.desde_entorno(
+        os.path.join(base_dir, 'vuelos_guardados'),
+        importar=os.path.join(base_dir, 'vuelos_guardados.jsonl')
+    )
@@ -0,0 +1,160 @@
+"""
+ARCHIVO DE TRAYECTORIAS (M3)
+Las trayectorias de los vuelos completados se guardan en formato columnar
+binario en vez de como pares JSON dentro de cada registro:
+- trayectorias.i32: enteros int32 little-endian. Por vuelo, la columna de
+  latitudes y luego la de longitudes, en microgrados; el primer valor de cada
+  columna es absoluto y los siguientes son la diferencia con el anterior
+- trayectorias.idx: índice de registros fijos <16sqI (id, offset en int32,
+  puntos), legible con struct o como arreglo estructurado de NumPy
+El registro del vuelo solo guarda la referencia {'offset', 'puntos'}; para
+analítica, cargar_columnas() mapea el archivo en memoria sin parsear JSON.
+Ambos archivos se escriben con EscritorGrupal (commit en grupo con la
+durabilidad de FSYNC_MODO); al abrir se descarta lo que una caída dejó a medias
+"""
+import os
+import sys
+import struct
+import threading
+from array import array
+
+from escritor_grupal import EscritorGrupal
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: solo hace falta para mapear el archivo
+    np = None
+
+MICROGRADOS = 1_000_000
+FORMATO_INDICE = '<16sqI'  # id, offset (en int32), puntos
+TAMANO_INDICE = struct.calcsize(FORMATO_INDICE)
+BYTES_VALOR = 4
+
+
+def codificar_columna(valores):
+    """Microgrados con delta: [v0, v1 - v0, v2 - v1, ...]"""
+    enteros = [round(v * MICROGRADOS) for v in valores]
+    return [enteros[0]] + [b - a for a, b in zip(enteros, enteros[1:])] if enteros else []
+
+
+def decodificar_columna(deltas):
+    valores = []
+    acumulado = 0
+    for delta in deltas:
+        acumulado += delta
+        valores.append(acumulado / MICROGRADOS)
+    return valores
+
+
+class ArchivoTrayectorias:
+    """Archivo columnar de solo-agregar con su índice de offsets"""
+
+    def __init__(self, directorio, crear_escritor=EscritorGrupal.desde_entorno):
+        self.directorio = directorio
+        self.ruta_datos = os.path.join(directorio, 'trayectorias.i32')
+        self.ruta_indice = os.path.join(directorio, 'trayectorias.idx')
+        self.crear_escritor = crear_escritor
+        self.lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+        self.abrir()
+
+    def abrir(self):
+        self.recuperar()
+        self.datos = self.crear_escritor(self.ruta_datos)
+        self.indice = self.crear_escritor(self.ruta_indice)
+        self.valores = self.datos.tamano // BYTES_VALOR  # Siguiente offset libre
+
+    def recuperar(self):
+        """
+        Deja el índice y los datos consistentes tras una caída: los dos archivos
+        se sincronizan por separado, así que se descartan los registros del índice
+        cortados o que apuntan más allá de los datos, y los datos que quedan
+        después del último registro
+        """
+        for ruta in (self.ruta_datos, self.ruta_indice):
+            open(ruta, 'ab').close()
+        with open(self.ruta_indice, 'r+b') as indice, open(self.ruta_datos, 'r+b') as datos:
+            registros = os.fstat(indice.fileno()).st_size // TAMANO_INDICE
+            disponibles = os.fstat(datos.fileno()).st_size // BYTES_VALOR
+            fin = 0
+            while registros:
+                indice.seek((registros - 1) * TAMANO_INDICE)
+                _, offset, puntos = struct.unpack(FORMATO_INDICE, indice.read(TAMANO_INDICE))
+                fin = offset + 2 * puntos
+                if fin <= disponibles:
+                    break
+                registros -= 1
+                fin = 0
+            indice.truncate(registros * TAMANO_INDICE)
+            datos.truncate(fin * BYTES_VALOR)
+
+    def archivar(self, vuelo_id, trayectoria):
+        """Agrega la trayectoria [[lat, lon], ...] y devuelve la referencia para el registro"""
+        columnas = array('i', codificar_columna([p[0] for p in trayectoria]))
+        columnas.extend(codificar_columna([p[1] for p in trayectoria]))
+        if sys.byteorder != 'little':
+            columnas.byteswap()
+        with self.lock:
+            # Encolar sin esperar al disco; el lock mantiene el índice en el orden de los datos
+            offset = self.valores
+            self.datos.escribir(columnas.tobytes())
+            self.indice.escribir(struct.pack(FORMATO_INDICE, vuelo_id.encode('utf-8')[:16], offset, len(trayectoria)))
+            self.valores += len(columnas)
+        return {'offset': offset, 'puntos': len(trayectoria)}
+
+    def leer(self, referencia):
+        """Trayectoria [[lat, lon], ...] de una referencia devuelta por archivar()"""
+        puntos = referencia['puntos']
+        columnas = array('i')
+        self.datos.vaciar()
+        with open(self.ruta_datos, 'rb') as f:
+            f.seek(referencia['offset'] * BYTES_VALOR)
+            columnas.frombytes(f.read(2 * puntos * BYTES_VALOR))
+        if sys.byteorder != 'little':
+            columnas.byteswap()
+        lats = decodificar_columna(columnas[:puntos])
+        lons = decodificar_columna(columnas[puntos:])
+        return [[lat, lon] for lat, lon in zip(lats, lons)]
+
+    def entradas(self):
+        """[(id, offset, puntos)] del índice, en orden de archivo"""
+        self.indice.vaciar()
+        with open(self.ruta_indice, 'rb') as f:
+            contenido = f.read()
+        contenido = contenido[:len(contenido) - len(contenido) % TAMANO_INDICE]
+        return [
+            (vuelo_id.rstrip(b'\0').decode('utf-8'), offset, puntos)
+            for vuelo_id, offset, puntos in struct.iter_unpack(FORMATO_INDICE, contenido)
+        ]
+
+    def cargar_columnas(self):
+        """
+        (índice, valores) mapeados en memoria con NumPy. Las coordenadas de un
+        vuelo son np.cumsum(valores[offset:offset + puntos]) / 1e6 (lat) y el
+        tramo siguiente de igual largo (lon)
+        """
+        if np is None:
+            raise ImportError("cargar_columnas requiere NumPy (pip install numpy)")
+        self.datos.vaciar()
+        self.indice.vaciar()
+        tipo_indice = np.dtype([('id', 'S16'), ('offset', '<i8'), ('puntos', '<u4')])
+        indice = np.fromfile(self.ruta_indice, dtype=tipo_indice)
+        if not self.valores:
+            return indice, np.zeros(0, dtype='<i4')
+        return indice, np.memmap(self.ruta_datos, dtype='<i4', mode='r', shape=(self.valores,))
+
+    def tamano(self):
+        """Bytes ocupados (datos + índice)"""
+        return self.datos.tamano + self.indice.tamano
+
+    def reiniciar(self):
+        with self.lock:
+            with self.datos.pausado(descartar=True), self.indice.pausado(descartar=True):
+                for ruta in (self.ruta_datos, self.ruta_indice):
+                    open(ruta, 'wb').close()
+            self.valores = 0
+
+    def cerrar(self):
+        """Escribe y sincroniza lo encolado en ambos archivos"""
+        self.datos.cerrar()
+        self.indice.cerrar()
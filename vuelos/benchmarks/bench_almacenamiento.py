@@ -0,0 +1,107 @@
+"""
+BENCHMARK - BACKENDS DE ALMACENAMIENTO DE M3
+Carga los mismos registros en el log JSONL segmentado y en SQLite y compara:
+ingesta (registros/s hasta quedar todo escrito), actualizaciones de hora de
+llegada/s, latencia de obtener un vuelo y de las estadísticas, tiempo de
+reapertura y tamaño en disco. Cada vuelo recibe varias actualizaciones, como
+en la ingesta real (JSONL guarda todas, SQLite una fila por vuelo)
+La durabilidad sale de FSYNC_MODO / FSYNC_CADA_MS como en M3
+
+Uso: python benchmarks/bench_almacenamiento.py [registros] [directorio]
+     (por defecto 1.000.000 registros en ./data)
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import ALMACENAMIENTO_JSONL, ALMACENAMIENTO_SQLITE, crear_almacenamiento
+
+ACTUALIZACIONES_POR_VUELO = 10
+AEROPUERTOS = ['BOG', 'MDE', 'CLO', 'CTG', 'BAQ', 'SMR', 'BGA', 'PEI', 'ADZ', 'LET']
+
+
+def registro(i, vuelos):
+    n = i % vuelos
+    return {
+        'id': f"FL{n:07d}", 'origen': {'code': AEROPUERTOS[n % 10], 'lat': 4.70, 'lon': -74.14},
+        'destino': {'code': AEROPUERTOS[(n // 10) % 10], 'lat': 6.16, 'lon': -75.42},
+        'lat_actual': 4.70 + (i % 100) * 0.01, 'lon_actual': -74.14, 'progreso': (i % 100) / 100,
+        'velocidad': 820.0, 'altitud': 10500, 'combustible': 8000.0, 'distancia_total': 215.3,
+        'distancia_restante': 124.9, 'estado': 'en_vuelo', 'hora_llegada': None,
+        'trayectoria': [[4.70 + k * 0.01, -74.14 - k * 0.01] for k in range(5)],
+        'guardado_en': '2025-01-01T00:00:00', 'timestamp_unix': 1_700_000_000 + i,
+    }
+
+
+def tamano_en_disco(ruta):
+    total = 0
+    for raiz, _, archivos in os.walk(ruta):
+        total += sum(os.path.getsize(os.path.join(raiz, a)) for a in archivos)
+    return total
+
+
+def medir(tipo, n, base):
+    vuelos = max(1, n // ACTUALIZACIONES_POR_VUELO)
+    almacen = crear_almacenamiento(base, tipo)
+    resultado = {}
+
+    inicio = time.perf_counter()
+    for i in range(n):
+        almacen.guardar(registro(i, vuelos))
+    len(almacen)  # Espera a que todo esté escrito
+    resultado['ingesta'] = n / (time.perf_counter() - inicio)
+
+    ids = [f"FL{random.randrange(vuelos):07d}" for _ in range(2000)]
+    inicio = time.perf_counter()
+    for vuelo_id in ids:
+        assert almacen.agregar_parche(vuelo_id, {'hora_llegada': '12:00', 'actualizado_en': '2025-01-01T12:00:00'})
+    len(almacen)  # Espera a que los parches estén escritos
+    resultado['llegadas'] = len(ids) / (time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    for vuelo_id in ids[:1000]:
+        assert almacen.obtener(vuelo_id)['hora_llegada'] == '12:00'
+    resultado['obtener_ms'] = (time.perf_counter() - inicio) * 1000 / 1000
+
+    inicio = time.perf_counter()
+    for _ in range(20):
+        estadisticas = almacen.resumen_estadisticas()
+    resultado['estadisticas_ms'] = (time.perf_counter() - inicio) * 1000 / 20
+    resultado['total'] = estadisticas['total_vuelos']
+
+    almacen.compactar()
+    almacen.cerrar()
+    inicio = time.perf_counter()
+    almacen = crear_almacenamiento(base, tipo)
+    resultado['reapertura_s'] = time.perf_counter() - inicio
+    almacen.cerrar()
+    resultado['disco_mb'] = tamano_en_disco(base) / 2 ** 20
+    return resultado
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    base = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.getcwd(), 'data')
+    os.makedirs(base, exist_ok=True)
+    print(f"{n:,} registros ({n // ACTUALIZACIONES_POR_VUELO:,} vuelos) en {base}, "
+          f"FSYNC_MODO={os.getenv('FSYNC_MODO', 'registros')}")
+    print(f"{'backend':>8} | {'ingesta/s':>10} | {'llegadas/s':>10} | {'obtener':>9} | "
+          f"{'estadíst.':>10} | {'reapertura':>10} | {'disco':>9} | total")
+    print("-" * 96)
+    for tipo in (ALMACENAMIENTO_JSONL, ALMACENAMIENTO_SQLITE):
+        directorio = tempfile.mkdtemp(dir=base, prefix=f'bench_{tipo}_')
+        try:
+            r = medir(tipo, n, directorio)
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+        print(f"{tipo:>8} | {r['ingesta']:>10,.0f} | {r['llegadas']:>10,.0f} | {r['obtener_ms']:>6.3f} ms | "
+              f"{r['estadisticas_ms']:>7.3f} ms | {r['reapertura_s']:>8.3f} s | {r['disco_mb']:>6.0f} MB | {r['total']:,}")
+
+
+if __name__ == "__main__":
+    main()
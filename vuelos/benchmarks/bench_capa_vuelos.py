@@ -0,0 +1,108 @@
+"""
+BENCHMARK - CAPA DE VUELOS EN CANVAS (M4)
+Graba del simulador, para 1k/10k/50k vuelos, el estado inicial de cada vuelo
+(como nuevo_vuelo) y una secuencia de frames binarios (frame_binario.py), y
+sirve la página bench_capa_vuelos.html que los reproduce a FPS_MAPA sobre la
+capa canvas (o sobre un L.marker + L.polyline por vuelo, como antes) mientras
+desplaza el mapa, e informa FPS y ms por dibujo
+
+Uso: python benchmarks/bench_capa_vuelos.py [vuelos ...] [--frames N] [--puerto P]
+     y abrir http://localhost:P/ en el navegador
+"""
+import io
+import os
+import sys
+import json
+import shutil
+import struct
+import random
+import tempfile
+import contextlib
+import http.server
+import functools
+
+DIRECTORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIRECTORIO)
+
+from m2_simulador import SimuladorVuelos
+from frame_binario import COLUMNAS_REALES, empaquetar_frame
+
+CAMPOS = COLUMNAS_REALES + ('activo', 'emergencia')
+
+
+def grabar(n, frames, destino):
+    """grabacion_<n>.json (estados iniciales) y grabacion_<n>.bin ([uint32 largo][frame] ...)"""
+    random.seed(7)
+    simulador = SimuladorVuelos()
+    simulador.enviar_mensaje = lambda mensaje: None
+    for i in range(n):
+        vuelo = simulador.generar_vuelo()
+        vuelo.id = f"FL{i:06d}"
+        vuelo.combustible = vuelo.distancia_total * 10
+        simulador.agregar_vuelo_activo(vuelo)
+    almacen = simulador.vuelos_activos
+    ids = [registro.id for registro in almacen.values()]
+    nums = list(range(len(ids)))
+    estados = []
+    for num, registro in zip(nums, almacen.values()):
+        vuelo = almacen.a_dict(registro)
+        estados.append({'id': vuelo['id'], 'num': num, 'lat_actual': vuelo['lat_actual'],
+                        'lon_actual': vuelo['lon_actual'], 'rumbo': vuelo['rumbo'],
+                        'emergencia': vuelo['emergencia'], 'trayectoria': vuelo['trayectoria']})
+    with open(os.path.join(destino, f'grabacion_{n}.json'), 'w', encoding='utf-8') as f:
+        json.dump(estados, f)
+    with open(os.path.join(destino, f'grabacion_{n}.bin'), 'wb') as f, \
+            contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(frames):
+            # Un tick más largo que el real para que el movimiento se note en la reproducción
+            for _ in range(5):
+                simulador.tick_escalar(len(almacen))
+                simulador.tick_actual += 1
+            # Solo los campos del frame: sin materializar la trayectoria de cada vuelo
+            presentes = [(num, {c: getattr(almacen[i], c) for c in CAMPOS})
+                         for num, i in zip(nums, ids) if i in almacen]
+            datos = empaquetar_frame([num for num, _ in presentes], [v for _, v in presentes], [])
+            f.write(struct.pack('<I', len(datos)))
+            f.write(datos)
+    return len(ids)
+
+
+def main():
+    argumentos = sys.argv[1:]
+    frames, puerto = 20, 8765
+    if '--frames' in argumentos:
+        i = argumentos.index('--frames')
+        frames = int(argumentos[i + 1])
+        del argumentos[i:i + 2]
+    if '--puerto' in argumentos:
+        i = argumentos.index('--puerto')
+        puerto = int(argumentos[i + 1])
+        del argumentos[i:i + 2]
+    tamanos = [int(a) for a in argumentos] or [1000, 10000, 50000]
+
+    destino = tempfile.mkdtemp(prefix='bench_capa_vuelos_')
+    try:
+        for n in tamanos:
+            grabados = grabar(n, frames, destino)
+            megas = os.path.getsize(os.path.join(destino, f'grabacion_{n}.bin')) / 2 ** 20
+            print(f"🎞️  {grabados:,} vuelos x {frames} frames grabados ({megas:.1f} MB)")
+        shutil.copy(os.path.join(DIRECTORIO, 'benchmarks', 'bench_capa_vuelos.html'),
+                    os.path.join(destino, 'index.html'))
+        shutil.copy(os.path.join(DIRECTORIO, 'static', 'capa_vuelos.js'), destino)
+        with open(os.path.join(destino, 'tamanos.json'), 'w') as f:
+            json.dump(tamanos, f)
+
+        manejador = functools.partial(http.server.SimpleHTTPRequestHandler, directory=destino)
+        servidor = http.server.ThreadingHTTPServer(('', puerto), manejador)
+        print(f"🌐 Abrir http://localhost:{puerto}/ (Ctrl+C para terminar)")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        servidor.server_close()
+    finally:
+        shutil.rmtree(destino, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
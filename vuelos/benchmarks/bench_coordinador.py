@@ -0,0 +1,109 @@
+"""
+BENCHMARK - NÚCLEOS DEL COORDINADOR (M1)
+Levanta el coordinador con hilos o con asyncio en un proceso aparte, conecta
+un productor (simulador) y N suscriptores, y mide mensajes/segundo recibidos
+por el coordinador y entregas/segundo a los suscriptores
+
+Uso: python benchmarks/bench_coordinador.py [suscriptores ...]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import subprocess
+
+DIRECTORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUERTO = 5655
+MENSAJES = 100000
+
+
+def lanzar_coordinador(modo, puerto):
+    clase = 'CoordinadorAsync' if modo == 'asyncio' else 'Coordinador'
+    modulo = 'coordinador_async' if modo == 'asyncio' else 'm1_coordinador'
+    codigo = (f"import sys; sys.path.insert(0, {DIRECTORIO!r}); "
+              f"from {modulo} import {clase}; {clase}(port={puerto}).iniciar()")
+    proceso = subprocess.Popen([sys.executable, '-c', codigo],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(('localhost', puerto), timeout=0.1).close()
+            return proceso
+        except OSError:
+            time.sleep(0.05)
+    proceso.kill()
+    raise RuntimeError(f"El coordinador ({modo}) no arrancó")
+
+
+def conectar(puerto, nombre, tipo):
+    s = socket.create_connection(('localhost', puerto))
+    s.send(json.dumps({'nombre': nombre, 'tipo': tipo, 'version': '1.0'}).encode('utf-8'))
+    return s
+
+
+def suscriptor(s, conteo, i, listo):
+    """Cuenta líneas recibidas hasta ver el vuelo_completado final"""
+    while True:
+        data = s.recv(1 << 20)
+        if not data:
+            break
+        conteo[i] += data.count(b'\n')
+        if b'vuelo_completado' in data:
+            break
+    listo.set()
+
+
+def medir(modo, suscriptores, puerto):
+    proceso = lanzar_coordinador(modo, puerto)
+    try:
+        conteo = [0] * suscriptores
+        listos = []
+        for i in range(suscriptores):
+            s = conectar(puerto, f'suscriptor_{i}', 'visualizador')
+            listo = threading.Event()
+            listos.append(listo)
+            threading.Thread(target=suscriptor, args=(s, conteo, i, listo), daemon=True).start()
+        productor = conectar(puerto, 'm2_simulador', 'simulador')
+        productor.recv(1024)
+        time.sleep(0.5)
+        conteo[:] = [0] * suscriptores
+
+        linea = json.dumps({
+            'tipo': 'vuelo_update', 'delta': True,
+            'vuelo': {'id': 'AV1234', 'lat_actual': 4.70, 'lon_actual': -74.14, 'progreso': 0.5,
+                      'combustible': 12000.0, 'distancia_restante': 850.25,
+                      'eta': '2025-01-01T12:00:00', 'punto': [4.70, -74.14]}
+        }).encode('utf-8') + b'\n'
+        bloque = linea * 1000
+
+        inicio = time.perf_counter()
+        for _ in range(MENSAJES // 1000):
+            productor.sendall(bloque)
+        productor.sendall(json.dumps({'tipo': 'vuelo_completado', 'vuelo': {'id': 'FIN'}}).encode('utf-8') + b'\n')
+        for listo in listos:
+            listo.wait(120)
+        transcurrido = time.perf_counter() - inicio
+        productor.close()
+        return MENSAJES / transcurrido, sum(conteo) / transcurrido
+    finally:
+        proceso.kill()
+        proceso.wait()
+
+
+def main():
+    tamanos = [int(x) for x in sys.argv[1:]] or [1, 10, 100]
+    print(f"{'suscriptores':>12} | {'núcleo':>7} | {'recibidos/s':>12} | {'entregas/s':>11}")
+    print("-" * 52)
+    puerto = PUERTO
+    for n in tamanos:
+        for modo in ('hilos', 'asyncio'):
+            recibidos, entregas = medir(modo, n, puerto)
+            puerto += 1
+            print(f"{n:>12} | {modo:>7} | {recibidos:>12,.0f} | {entregas:>11,.0f}")
+    print("(las entregas pueden ser menos que recibidos × suscriptores: "
+          "las colas llenas descartan los vuelo_update más antiguos)")
+
+
+if __name__ == "__main__":
+    main()
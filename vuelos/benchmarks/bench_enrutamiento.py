@@ -0,0 +1,82 @@
+"""
+BENCHMARK - COSTO DE ENRUTAMIENTO EN M1
+Mide, sin sockets, cuánto cuesta decodificar y enrutar un vuelo_update (o un
+frame) con 1, 10 y 100 suscriptores: reenviando la línea original tal cual
+frente a volver a serializar el mensaje para cada suscriptor
+
+Uso: python benchmarks/bench_enrutamiento.py [suscriptores ...]
+"""
+import io
+import os
+import sys
+import json
+import time
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m1_coordinador import Coordinador
+from cola_salida import ColaSalida
+
+
+class CoordinadorReserializando(Coordinador):
+    """Comportamiento anterior: json.dumps del mismo mensaje por cada suscriptor"""
+
+    def broadcast(self, mensaje, excluir=None, crudo=None):
+        with self.lock:
+            clientes = list(self.clientes_activos)
+        for nombre in clientes:
+            if nombre != excluir:
+                self.enviar_a_modulo(nombre, mensaje)
+
+
+def preparar(clase, suscriptores):
+    coordinador = clase()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(suscriptores):
+            coordinador.registrar_cliente(f'suscriptor_{i}', 'visualizador', None, None,
+                                          ColaSalida(maximo=10 ** 9))
+    return coordinador
+
+
+def medir(clase, suscriptores, linea, repeticiones):
+    coordinador = preparar(clase, suscriptores)
+    colas = [info['cola'] for info in coordinador.clientes.values()]
+    inicio = time.perf_counter()
+    for i in range(repeticiones):
+        mensaje = json.loads(linea)
+        coordinador.procesar_mensaje('m2_simulador', mensaje, {'json': linea})
+        if i % 1000 == 999:
+            for cola in colas:
+                cola.vaciar()
+    return (time.perf_counter() - inicio) / repeticiones * 1e6
+
+
+def main():
+    tamanos = [int(x) for x in sys.argv[1:]] or [1, 10, 100]
+    delta = {
+        'tipo': 'vuelo_update', 'delta': True,
+        'vuelo': {'id': 'AV1234', 'lat_actual': 4.70, 'lon_actual': -74.14, 'progreso': 0.5,
+                  'combustible': 12000.0, 'distancia_restante': 850.25,
+                  'eta': '2025-01-01T12:00:00', 'hora_llegada_estimada': '2025-01-01T12:00:00',
+                  'punto': [4.70, -74.14]}
+    }
+    mensajes = {
+        'vuelo_update': delta,
+        'frame (500)': {'tipo': 'frame', 'tick': 1, 'parte': 0, 'partes': 1,
+                        'vuelos_activos': 500, 'mensajes': [delta] * 500},
+    }
+
+    print(f"{'mensaje':>13} | {'suscriptores':>12} | {'reserializar µs':>15} | {'paso directo µs':>15} | mejora")
+    print("-" * 78)
+    for nombre, mensaje in mensajes.items():
+        linea = (json.dumps(mensaje) + '\n').encode('utf-8')
+        for n in tamanos:
+            repeticiones = max(20, 200000 // (n * len(linea) // 100 + 1))
+            antes = medir(CoordinadorReserializando, n, linea, repeticiones)
+            despues = medir(Coordinador, n, linea, repeticiones)
+            print(f"{nombre:>13} | {n:>12} | {antes:>15.1f} | {despues:>15.1f} | {antes / despues:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
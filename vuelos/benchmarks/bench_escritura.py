@@ -0,0 +1,85 @@
+"""
+BENCHMARK - ESCRITURA DE LA BASE DE DATOS
+Compara el guardado anterior (abrir, escribir una línea y fsync por registro)
+con el escritor de commit en grupo en cada modo de durabilidad. Reporta los
+registros/s logrados (hasta que todo quedó escrito y sincronizado) y fsyncs/s
+
+Uso: python benchmarks/bench_escritura.py [registros] [directorio]
+     (el directorio debe estar en el disco a medir; por defecto ./data)
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from escritor_grupal import MODO_REGISTROS, MODO_SO, MODO_TIEMPO, EscritorGrupal
+
+REGISTRO = {
+    'id': 'AV1234', 'origen': {'code': 'BOG', 'lat': 4.70, 'lon': -74.14},
+    'destino': {'code': 'MDE', 'lat': 6.16, 'lon': -75.42}, 'lat_actual': 5.1, 'lon_actual': -74.6,
+    'progreso': 0.42, 'velocidad': 820.0, 'altitud': 10500, 'combustible': 8000.0,
+    'distancia_total': 215.3, 'distancia_restante': 124.9, 'estado': 'en_vuelo',
+    'trayectoria': [[4.70 + i * 0.01, -74.14 - i * 0.01] for i in range(20)],
+}
+
+
+def linea(i):
+    registro = dict(REGISTRO, id=f"FL{i:06d}", timestamp_unix=time.time())
+    return json.dumps(registro, ensure_ascii=False) + '\n'
+
+
+def guardar_anterior(ruta, n):
+    """Comportamiento anterior de guardar_vuelo"""
+    for i in range(n):
+        with open(ruta, 'a', encoding='utf-8') as f:
+            f.write(linea(i))
+            f.flush()
+            os.fsync(f.fileno())
+    return n
+
+
+def guardar_grupal(ruta, n, **modo):
+    escritor = EscritorGrupal(ruta, **modo)
+    for i in range(n):
+        escritor.escribir(linea(i).encode('utf-8'))
+    escritor.cerrar()
+    return escritor.fsyncs
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    base = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.getcwd(), 'data')
+    os.makedirs(base, exist_ok=True)
+    casos = [
+        ('anterior (fsync/registro)', None),
+        ('registros N=1 (por lote)', dict(modo=MODO_REGISTROS, cada_n=1)),
+        ('registros N=1000', dict(modo=MODO_REGISTROS, cada_n=1000)),
+        ('tiempo 10 ms', dict(modo=MODO_TIEMPO, cada_ms=10)),
+        ('tiempo 100 ms', dict(modo=MODO_TIEMPO, cada_ms=100)),
+        ('so (sin fsync)', dict(modo=MODO_SO)),
+    ]
+
+    print(f"{n:,} registros en {base}")
+    print(f"{'modo':>26} | {'registros/s':>12} | {'fsyncs':>7} | {'fsyncs/s':>9}")
+    print("-" * 64)
+    for nombre, modo in casos:
+        with tempfile.NamedTemporaryFile(dir=base, suffix='.jsonl', delete=False) as tmp:
+            ruta = tmp.name
+        try:
+            # El guardado anterior se mide sobre una parte: es el caso lento
+            cantidad = min(n, 2000) if modo is None else n
+            inicio = time.perf_counter()
+            fsyncs = guardar_anterior(ruta, cantidad) if modo is None else guardar_grupal(ruta, cantidad, **modo)
+            segundos = time.perf_counter() - inicio
+            with open(ruta, 'rb') as f:
+                assert sum(1 for _ in f) == cantidad
+        finally:
+            os.remove(ruta)
+        print(f"{nombre:>26} | {cantidad / segundos:>12,.0f} | {fsyncs:>7,} | {fsyncs / segundos:>9,.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+BENCHMARK - FRAMES BINARIOS DE M4
+Compara el frame_vuelos JSON (campos de frame por vuelo) con el frame binario
+en columnas sobre vuelos reales del simulador: bytes por vuelo, tiempo de
+empaquetar en el servidor y error de posición de float32
+
+Uso: python benchmarks/bench_frame_binario.py [vuelos]
+"""
+import io
+import os
+import sys
+import json
+import math
+import time
+import random
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m2_simulador import SimuladorVuelos
+from indice_espacial import CAMPOS_FRAME
+from frame_binario import desempaquetar_frame, empaquetar_frame
+
+REPETICIONES = 20
+
+
+def vuelos_simulados(n):
+    random.seed(7)
+    simulador = SimuladorVuelos()
+    simulador.enviar_mensaje = lambda mensaje: None
+    for i in range(n):
+        vuelo = simulador.generar_vuelo()
+        vuelo.id = f"FL{i:06d}"
+        vuelo.combustible = vuelo.distancia_total * 10
+        simulador.agregar_vuelo_activo(vuelo)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(5):
+            simulador.tick_escalar(len(simulador.vuelos_activos))
+            simulador.tick_actual += 1
+    almacen = simulador.vuelos_activos
+    return [almacen.a_dict(registro) for registro in almacen.values()]
+
+
+def medir(funcion):
+    inicio = time.perf_counter()
+    for _ in range(REPETICIONES):
+        resultado = funcion()
+    return resultado, (time.perf_counter() - inicio) / REPETICIONES
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    vuelos = vuelos_simulados(n)
+    nums = list(range(len(vuelos)))
+    n = len(vuelos)
+
+    def frame_json():
+        entradas = [{'id': v['id'], **{c: v[c] for c in CAMPOS_FRAME if c in v}} for v in vuelos]
+        return json.dumps({'vuelos': entradas, 'fuera': []}).encode('utf-8')
+
+    datos_json, segundos_json = medir(frame_json)
+    datos_binario, segundos_binario = medir(lambda: empaquetar_frame(nums, vuelos, []))
+
+    columnas, _ = desempaquetar_frame(datos_binario)
+    error_m = max(
+        6371000 * math.radians(math.hypot(lat - v['lat_actual'],
+                                          (lon - v['lon_actual']) * math.cos(math.radians(lat))))
+        for v, lat, lon in zip(vuelos, columnas['lat_actual'], columnas['lon_actual'])
+    )
+
+    print(f"{n:,} vuelos por frame")
+    print(f"{'formato':>10} | {'bytes/vuelo':>11} | {'KB/frame':>9} | {'µs/vuelo':>9}")
+    print("-" * 50)
+    for nombre, datos, segundos in (('JSON', datos_json, segundos_json),
+                                    ('binario', datos_binario, segundos_binario)):
+        print(f"{nombre:>10} | {len(datos) / n:>11.1f} | {len(datos) / 1024:>9.1f} | "
+              f"{segundos / n * 1e6:>9.2f}")
+    print(f"   {len(datos_json) / len(datos_binario):.1f}x menos bytes; "
+          f"error máximo de posición float32: {error_m:.2f} m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+BENCHMARK - GEODESIA (geo.py)
+Primero verifica la precisión sobre pares de puntos al azar:
+- geo contra los métodos anteriores del simulador (haversine, rumbo)
+- identidades: el destino a rumbo y distancia de p hacia q cae en q; los
+  puntos de Slerp están sobre la ruta (distancia transversal ~0) y a t·d del
+  origen
+- versiones NumPy contra las escalares
+y falla si algún error supera la tolerancia (1 mm, 1e-6°).
+Después mide operaciones/segundo: métodos anteriores (grados a radianes en
+cada llamada), geo escalar, geo con radianes precalculados y geo NumPy
+
+Uso: python benchmarks/bench_geo.py [pares]
+"""
+import os
+import sys
+import math
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geo
+from geo import np
+
+R = geo.RADIO_TIERRA
+TOLERANCIAS = {'(m)': 1e-3, '(°)': 1e-6}  # Por la unidad al final del nombre del error
+
+
+class Anterior:
+    """Métodos copiados en SimuladorVuelos/VisualizadorMapa antes de geo.py"""
+
+    def haversine(self, lat1, lon1, lat2, lon2):
+        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+        dlat = lat2 - lat1
+        dlon = lon2 - lon1
+        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
+        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+        return R * c
+
+    def calcular_bearing(self, lat1, lon1, lat2, lon2):
+        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+        dlon = lon2 - lon1
+        x = math.sin(dlon) * math.cos(lat2)
+        y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
+        return (math.degrees(math.atan2(x, y)) + 360) % 360
+
+
+def diferencia_angular(a, b):
+    return abs((a - b + 180) % 360 - 180)
+
+
+def verificar(pares):
+    anterior = Anterior()
+    errores = {}
+
+    def registrar(nombre, valor):
+        errores[nombre] = max(errores.get(nombre, 0.0), valor)
+
+    for lat1, lon1, lat2, lon2 in pares:
+        d = geo.haversine(lat1, lon1, lat2, lon2)
+        theta = geo.rumbo(lat1, lon1, lat2, lon2)
+        registrar('haversine vs anterior (m)', abs(d - anterior.haversine(lat1, lon1, lat2, lon2)) * 1000)
+        registrar('rumbo vs anterior (°)', diferencia_angular(theta, anterior.calcular_bearing(lat1, lon1, lat2, lon2)))
+        lat, lon = geo.punto_destino(lat1, lon1, theta, d)
+        registrar('destino(rumbo, d) vs q (m)', geo.haversine(lat, lon, lat2, lon2) * 1000)
+        for t in (0.25, 0.5, 0.75):
+            lat, lon = geo.slerp(lat1, lon1, lat2, lon2, t)
+            registrar('transversal de slerp (m)', abs(geo.distancia_transversal(lat, lon, lat1, lon1, lat2, lon2)) * 1000)
+            registrar('|p-slerp(t)| - t·d (m)', abs(geo.haversine(lat1, lon1, lat, lon) - t * d) * 1000)
+
+    if np is not None:
+        lat1, lon1, lat2, lon2 = (np.radians(np.array(c)) for c in zip(*pares))
+        d = geo.haversine_np(lat1, lon1, lat2, lon2)
+        theta = geo.rumbo_np(lat1, lon1, lat2, lon2)
+        escalares = [(geo.haversine(*p), geo.rumbo(*p)) for p in pares]
+        registrar('haversine_np vs escalar (m)', max(abs(a - b[0]) for a, b in zip(d, escalares)) * 1000)
+        registrar('rumbo_np vs escalar (°)', max(diferencia_angular(math.degrees(a), b[1]) for a, b in zip(theta, escalares)))
+        lat, lon = geo.punto_destino_np(lat1, lon1, theta, d)
+        registrar('destino_np vs q (m)', float(np.max(geo.haversine_np(lat, lon, lat2, lon2))) * 1000)
+        omega = geo.angulo_central_np(lat1, lon1, lat2, lon2)
+        lat, lon = geo.slerp_np(geo.vectores_np(lat1, lon1), geo.vectores_np(lat2, lon2),
+                                omega, np.sin(omega), np.full(len(pares), 0.5))
+        registrar('transversal_np de slerp_np (m)',
+                  float(np.max(np.abs(geo.distancia_transversal_np(lat, lon, lat1, lon1, lat2, lon2)))) * 1000)
+    return errores
+
+
+def medir(funcion, n):
+    inicio = time.perf_counter()
+    funcion()
+    return n / (time.perf_counter() - inicio)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    random.seed(7)
+    pares = [(random.uniform(-60, 70), random.uniform(-180, 180),
+              random.uniform(-60, 70), random.uniform(-180, 180)) for _ in range(n)]
+
+    print("Precisión (máximo sobre 5.000 pares):")
+    for nombre, error in verificar(pares[:5000]).items():
+        print(f"   {nombre:>32}: {error:.3g}")
+        assert error < TOLERANCIAS[nombre[-3:]], (nombre, error)
+
+    anterior = Anterior()
+    radianes = [tuple(map(math.radians, p)) for p in pares]
+    filas = [
+        ('haversine anterior', lambda: [anterior.haversine(*p) for p in pares]),
+        ('haversine geo', lambda: [geo.haversine(*p) for p in pares]),
+        ('haversine geo (rad)', lambda: [geo.haversine_rad(*p) for p in radianes]),
+        ('rumbo anterior', lambda: [anterior.calcular_bearing(*p) for p in pares]),
+        ('rumbo geo', lambda: [geo.rumbo(*p) for p in pares]),
+        ('slerp geo', lambda: [geo.slerp(*p, 0.5) for p in pares]),
+        ('transversal geo', lambda: [geo.distancia_transversal(p[0], p[1], *p) for p in pares]),
+        ('destino geo', lambda: [geo.punto_destino(p[0], p[1], p[2], 1000.0) for p in pares]),
+    ]
+    if np is not None:
+        lat1, lon1, lat2, lon2 = (np.array(c) for c in zip(*radianes))
+        omega = geo.angulo_central_np(lat1, lon1, lat2, lon2)
+        p0, p1, sin_omega = geo.vectores_np(lat1, lon1), geo.vectores_np(lat2, lon2), np.sin(omega)
+        t = np.full(n, 0.5)
+        filas += [
+            ('haversine NumPy', lambda: geo.haversine_np(lat1, lon1, lat2, lon2)),
+            ('rumbo NumPy', lambda: geo.rumbo_np(lat1, lon1, lat2, lon2)),
+            ('slerp NumPy', lambda: geo.slerp_np(p0, p1, omega, sin_omega, t)),
+            ('transversal NumPy', lambda: geo.distancia_transversal_np(lat1, lon1, lat1, lon1, lat2, lon2)),
+            ('destino NumPy', lambda: geo.punto_destino_np(lat1, lon1, lat2, np.full(n, 1000.0))),
+        ]
+
+    print(f"\nThroughput ({n:,} pares)")
+    print(f"{'operación':>22} | {'Mops/s':>8}")
+    print("-" * 34)
+    for nombre, funcion in filas:
+        print(f"{nombre:>22} | {medir(funcion, n) / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+BENCHMARK - LECTOR DE FLUJO
+Reproduce por un socketpair un flujo capturado de ~100 MB y compara el lector
+anterior (str creciente + split('\\n', 1) por línea) con el lector compartido
+(recv_into en un bytearray preasignado + memoryview por mensaje).
+Se mide con lecturas de 8 KB (flujo al día) y de 1 MB (receptor atrasado que
+encuentra miles de mensajes acumulados en cada recv)
+
+Uso: python benchmarks/bench_lector.py [MB] [archivo_captura]
+     (si el archivo existe se reproduce; si no, se captura y se guarda ahí)
+"""
+import io
+import os
+import sys
+import time
+import json
+import random
+import socket
+import threading
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m2_simulador import SimuladorVuelos
+from protocolo import FORMATO_JSON, Decodificador, codificar
+
+VUELOS = 2000
+# El lector anterior es cuadrático: con lecturas grandes solo se reproduce este prefijo
+MB_MAXIMO_ANTERIOR = 8
+
+
+class SimuladorCaptura(SimuladorVuelos):
+    """Simulador sin socket que guarda los mensajes que enviaría"""
+
+    def __init__(self):
+        super().__init__()
+        self.mensajes = []
+
+    def enviar_mensaje(self, mensaje):
+        self.mensajes.append(mensaje)
+
+
+def capturar(megabytes):
+    """Líneas JSON reales: vuelo_update sueltos (como antes de los frames) y frames"""
+    random.seed(7)
+    simulador = SimuladorCaptura()
+    for i in range(VUELOS):
+        vuelo = simulador.generar_vuelo()
+        vuelo.id = f"FL{i:06d}"
+        vuelo.combustible = vuelo.distancia_total * 10
+        simulador.agregar_vuelo_activo(vuelo)
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulador.tick_escalar(len(simulador.vuelos_activos))
+    frames = [m for m in simulador.mensajes if m['tipo'] == 'frame']
+    lineas = [codificar(m, FORMATO_JSON) for f in frames for m in f['mensajes']]
+    lineas += [codificar(f, FORMATO_JSON) for f in frames]
+    bloque = b''.join(lineas)
+    repeticiones = max(1, megabytes * 2 ** 20 // len(bloque))
+    return bloque * repeticiones, len(lineas) * repeticiones
+
+
+def enviar(sock, flujo):
+    try:
+        sock.sendall(flujo)
+    finally:
+        sock.shutdown(socket.SHUT_WR)
+
+
+def lector_anterior(sock, trozo):
+    buffer = ""
+    total = 0
+    while True:
+        data = sock.recv(trozo)
+        if not data:
+            return total
+        buffer += data.decode('utf-8')
+        while '\n' in buffer:
+            linea, buffer = buffer.split('\n', 1)
+            if linea.strip():
+                json.loads(linea)
+                total += 1
+
+
+def lector_compartido(sock, trozo):
+    decodificador = Decodificador(FORMATO_JSON, tamano=trozo)
+    total = 0
+    while True:
+        mensajes = decodificador.leer(sock)
+        if mensajes is None:
+            return total
+        total += len(mensajes)
+
+
+def reproducir(lector, flujo, trozo):
+    receptor, emisor = socket.socketpair()
+    # Buffers del kernel mayores que la lectura: cada recv encuentra `trozo` bytes acumulados
+    receptor.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * trozo)
+    emisor.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * trozo)
+    hilo = threading.Thread(target=enviar, args=(emisor, flujo), daemon=True)
+    inicio = time.perf_counter()
+    hilo.start()
+    total = lector(receptor, trozo)
+    segundos = time.perf_counter() - inicio
+    hilo.join()
+    receptor.close()
+    emisor.close()
+    return segundos, total
+
+
+def main():
+    megabytes = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    archivo = sys.argv[2] if len(sys.argv) > 2 else None
+
+    if archivo and os.path.exists(archivo):
+        with open(archivo, 'rb') as f:
+            flujo = f.read()
+        mensajes = flujo.count(b'\n')
+    else:
+        flujo, mensajes = capturar(megabytes)
+        if archivo:
+            with open(archivo, 'wb') as f:
+                f.write(flujo)
+    prefijo = flujo[:flujo.rfind(b'\n', 0, MB_MAXIMO_ANTERIOR * 2 ** 20) + 1]
+
+    print(f"Flujo: {len(flujo) / 2 ** 20:.1f} MB, {mensajes:,} mensajes")
+    print(f"{'lector':>10} | {'recv':>6} | {'MB':>6} | {'MB/s':>8} | {'mensajes/s':>11}")
+    print("-" * 54)
+    for trozo in (8192, 2 ** 20):
+        etiqueta = f"{trozo // 1024} KB" if trozo < 2 ** 20 else "1 MB"
+        for nombre, lector in (('anterior', lector_anterior), ('compartido', lector_compartido)):
+            datos = prefijo if nombre == 'anterior' and trozo >= 2 ** 20 else flujo
+            segundos, total = reproducir(lector, datos, trozo)
+            assert total == datos.count(b'\n'), (nombre, total)
+            mb = len(datos) / 2 ** 20
+            print(f"{nombre:>10} | {etiqueta:>6} | {mb:>6.1f} | {mb / segundos:>8.1f} | {total / segundos:>11,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+BENCHMARK - MEMORIA POR VUELO (M2)
+Compara con tracemalloc la huella de los vuelos como diccionarios (formato
+original de generar_vuelo) frente a los registros compactos del almacén
+
+Uso: python benchmarks/bench_memoria_vuelos.py [n1 n2 ...]
+"""
+import copy
+import gc
+import os
+import sys
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m2_simulador import SimuladorVuelos
+
+
+def medir(construir):
+    """Bytes retenidos por la estructura que devuelve construir()"""
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    estructura = construir()
+    gc.collect()
+    despues = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return despues - antes, estructura
+
+
+def main():
+    tamanos = [int(x) for x in sys.argv[1:]] or [10000, 50000]
+    simulador = SimuladorVuelos()
+    almacen = simulador.vuelos_activos
+
+    print(f"{'vuelos':>8} | {'dicts (MB)':>11} | {'registros (MB)':>14} | {'B/vuelo dict':>12} | {'B/vuelo reg':>11} | ahorro")
+    print("-" * 80)
+    for n in tamanos:
+        random.seed(7)
+        registros_base = [simulador.generar_vuelo() for _ in range(n)]
+
+        # Formato original: un dict de ~20 claves con dicts anidados y cadenas ISO propias
+        bytes_dicts, dicts = medir(lambda: {
+            f"FL{i:06d}": copy.deepcopy(almacen.a_dict(r)) for i, r in enumerate(registros_base)
+        })
+        del dicts
+
+        # Registros con __slots__ que referencian las tablas compartidas
+        random.seed(7)
+        bytes_registros, registros = medir(lambda: {
+            f"FL{i:06d}": simulador.generar_vuelo() for i in range(n)
+        })
+        del registros
+
+        ahorro = 1 - bytes_registros / bytes_dicts
+        print(f"{n:>8} | {bytes_dicts / 1e6:>11.2f} | {bytes_registros / 1e6:>14.2f} | "
+              f"{bytes_dicts / n:>12.0f} | {bytes_registros / n:>11.0f} | {ahorro:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+BENCHMARK - MOTOR DE SIMULACIÓN (M2)
+Compara ticks/segundo del motor escalar y del motor vectorizado (NumPy)
+con 1k, 10k y 50k vuelos activos, emitiendo los frames en cada formato del
+protocolo (JSON y, si está msgpack, binario con registros de posición)
+
+Uso: python benchmarks/bench_motor.py [n1 n2 ...]
+"""
+import io
+import os
+import sys
+import time
+import random
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m2_simulador import SimuladorVuelos
+from motor_vectorizado import np
+from protocolo import FORMATO_JSON, formatos_soportados
+
+
+class SimuladorBenchmark(SimuladorVuelos):
+    """Simulador sin socket: los mensajes se cuentan en vez de enviarse"""
+
+    def __init__(self, modo):
+        os.environ['MOTOR_SIMULACION'] = modo
+        super().__init__()
+        self.mensajes = 0
+
+    def enviar_mensaje(self, mensaje):
+        self.mensajes += 1
+
+
+def poblar(simulador, n):
+    random.seed(42)
+    for i in range(n):
+        vuelo = simulador.generar_vuelo()
+        vuelo.id = f"FL{i:06d}"  # IDs únicos para no colisionar
+        vuelo.combustible = vuelo.distancia_total * 10
+        simulador.agregar_vuelo_activo(vuelo)
+
+
+def medir(modo, n, formato=FORMATO_JSON, duracion=3.0):
+    simulador = SimuladorBenchmark('escalar' if modo == 'escalar' else 'vectorizado')
+    simulador.formato = formato
+    poblar(simulador, n)
+    if modo == 'escalar':
+        tick = simulador.tick_escalar
+    elif modo == 'vectorizado':
+        tick = simulador.tick_vectorizado
+    else:
+        # Solo la pasada NumPy, sin armar el frame ni emitir mensajes
+        def tick(_):
+            simulador.motor.avanzar(simulador.DT, simulador.FACTOR_TIEMPO, simulador.clima_global)
+    ticks = 0
+    # Silenciar los logs de llegada/emergencia del simulador durante la medición
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        while time.perf_counter() - inicio < duracion:
+            tick(len(simulador.vuelos_activos))
+            simulador.tick_actual += 1  # Como el loop: los keyframes se reparten entre ticks
+            ticks += 1
+        transcurrido = time.perf_counter() - inicio
+    return ticks / transcurrido
+
+
+def main():
+    tamanos = [int(x) for x in sys.argv[1:]] or [1000, 10000, 50000]
+    formatos = formatos_soportados()
+    casos = [('escalar', f) for f in formatos]
+    if np is not None:
+        casos += [('vectorizado', f) for f in formatos] + [('solo_motor', '-')]
+    objetivo = 1 / 0.2  # DT = 200 ms
+
+    print(f"{'vuelos':>8} | {'modo':>12} | {'formato':>8} | {'ticks/s':>9} | {'ms/tick':>8} | tiempo real")
+    print("-" * 71)
+    for n in tamanos:
+        for modo, formato in casos:
+            tps = medir(modo, n, formato if formato != '-' else FORMATO_JSON)
+            estado = "✅" if tps >= objetivo else "❌"
+            print(f"{n:>8} | {modo:>12} | {formato:>8} | {tps:>9.2f} | {1000 / tps:>8.1f} | {estado}")
+    if np is None:
+        print("⚠️  NumPy no está instalado: solo se midió el motor escalar")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+BENCHMARK - SIMULACIÓN PARTICIONADA (M2)
+Mide updates de vuelo por segundo que salen del proceso padre (frames ya
+combinados y serializados) con la misma flota repartida en 1, 2, 4, ...
+particiones que avanzan sin pausa entre ticks, y la aceleración respecto de
+una partición. La aceleración ideal es min(particiones, núcleos). La CPU del
+padre (recibir lotes, unir frames, enviar) es la parte que no se reparte:
+con una fracción p de un núcleo, el padre satura cerca de updates/s ÷ p
+
+Uso: python benchmarks/bench_particiones.py [vuelos] [particiones ...] [--segundos S] [--formato json|msgpack]
+"""
+import io
+import os
+import sys
+import time
+import threading
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocolo import REGISTRO_POSICION, formatos_soportados
+from simulador_particionado import SimuladorParticion, SimuladorParticionado, cuota, particion_de
+
+
+class ParticionBenchmark(SimuladorParticion):
+    """IDs únicos (los aleatorios FL1000-FL9999 se repiten con flotas grandes)"""
+
+    contador = 0
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        sys.stdout = open(os.devnull, 'w')  # Silenciar los logs de la partición (su propio proceso)
+
+    def nuevo_id(self):
+        while True:
+            self.contador += 1
+            vuelo_id = f"FL{self.contador:07d}"
+            if particion_de(vuelo_id, self.particiones) == self.indice:
+                return vuelo_id
+
+
+class ParticionadoBenchmark(SimuladorParticionado):
+    """Padre sin coordinador: cuenta updates y bytes en vez de enviarlos"""
+
+    PARTICION = ParticionBenchmark
+
+    def __init__(self, particiones, formato):
+        super().__init__(particiones, espera=0)
+        self.formato = formato
+        self.updates = 0
+        self.bytes = 0
+
+    def enviar_combinado(self, sueltos, trozos):
+        self.updates += sum(t[0] + len(t[2]) // REGISTRO_POSICION.size for t in trozos)
+        super().enviar_combinado(sueltos, trozos)
+
+    def enviar_crudo(self, datos):
+        self.bytes += len(datos)
+
+
+def medir(particiones, vuelos, segundos, formato):
+    simulador = ParticionadoBenchmark(particiones, formato)
+    simulador.max_vuelos = vuelos
+    # Silenciar los logs del padre (las particiones silencian los suyos al crearse)
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulador.iniciar_particiones()
+        for indice in range(particiones):
+            simulador.enviar_a_particion(indice, {'tipo': 'reset_estado',
+                                                  'vuelos': cuota(vuelos, indice, particiones)})
+        hilo = threading.Thread(target=simulador.loop_simulacion, daemon=True)
+        hilo.start()
+        # Esperar a que todas las particiones tengan su flota antes de medir
+        limite = time.time() + 120
+        while sum(simulador.activos) < vuelos * 0.95 and time.time() < limite:
+            time.sleep(0.1)
+        time.sleep(1)
+        updates, datos = simulador.updates, simulador.bytes
+        inicio, cpu = time.perf_counter(), time.process_time()
+        time.sleep(segundos)
+        transcurrido, cpu = time.perf_counter() - inicio, time.process_time() - cpu
+        updates, datos = simulador.updates - updates, simulador.bytes - datos
+        simulador.detener()
+        hilo.join(timeout=5)
+    return updates / transcurrido, datos / transcurrido, cpu / transcurrido
+
+
+def main():
+    argumentos = sys.argv[1:]
+    segundos, formato = 5.0, formatos_soportados()[0]
+    if '--segundos' in argumentos:
+        i = argumentos.index('--segundos')
+        segundos = float(argumentos[i + 1])
+        del argumentos[i:i + 2]
+    if '--formato' in argumentos:
+        i = argumentos.index('--formato')
+        formato = argumentos[i + 1]
+        del argumentos[i:i + 2]
+    vuelos = int(argumentos[0]) if argumentos else 20000
+    nucleos = os.cpu_count() or 1
+    lista = [int(a) for a in argumentos[1:]] or sorted({1, 2, 4, nucleos})
+
+    print(f"{vuelos:,} vuelos, {nucleos} núcleos, formato {formato}, "
+          f"motor {os.getenv('MOTOR_SIMULACION', 'escalar')}")
+    print(f"{'particiones':>11} | {'updates/s':>10} | {'MB/s':>6} | {'aceleración':>11} | {'ideal':>5} | {'CPU padre':>9}")
+    print("-" * 70)
+    base = None
+    for particiones in lista:
+        por_segundo, bytes_por_segundo, cpu_padre = medir(particiones, vuelos, segundos, formato)
+        base = base or por_segundo
+        print(f"{particiones:>11} | {por_segundo:>10,.0f} | {bytes_por_segundo / 2 ** 20:>6.1f} | "
+              f"{por_segundo / base:>10.2f}x | {min(particiones, nucleos):>4}x | {cpu_padre:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+BENCHMARK - POSICIÓN POR PROGRESO (M2)
+Compara el paso por tick de antes (Slerp desde los grados de origen y
+destino, recalculando vectores, acos y sin(Ω), y luego Haversine hasta el
+destino para la distancia restante) con el actual (constantes de la ruta
+cacheadas al crear el vuelo y distancia restante = (1 - t) · distancia_total):
+- diferencia de posición y distancia restante entre ambos
+- llamadas a funciones de math por vuelo (contadas con cProfile; las
+  math.radians que hace map() dentro del camino anterior no aparecen) y µs
+  por vuelo
+- las mismas llamadas por vuelo en tick_escalar completo
+
+Uso: python benchmarks/bench_posicion.py [vuelos] [ticks]
+"""
+import io
+import os
+import sys
+import math
+import time
+import pstats
+import random
+import cProfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geo
+from m2_simulador import SimuladorVuelos
+
+
+def slerp_anterior(lat1, lon1, lat2, lon2, t):
+    """SimuladorVuelos.slerp antes de la tabla de rutas"""
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    x1 = math.cos(lat1) * math.cos(lon1)
+    y1 = math.cos(lat1) * math.sin(lon1)
+    z1 = math.sin(lat1)
+    x2 = math.cos(lat2) * math.cos(lon2)
+    y2 = math.cos(lat2) * math.sin(lon2)
+    z2 = math.sin(lat2)
+    dot = x1*x2 + y1*y2 + z1*z2
+    omega = math.acos(max(-1, min(1, dot)))
+    if omega < 0.001:
+        x = x1 + t * (x2 - x1)
+        y = y1 + t * (y2 - y1)
+        z = z1 + t * (z2 - z1)
+    else:
+        sin_omega = math.sin(omega)
+        a = math.sin((1-t) * omega) / sin_omega
+        b = math.sin(t * omega) / sin_omega
+        x = a * x1 + b * x2
+        y = a * y1 + b * y2
+        z = a * z1 + b * z2
+    lat = math.atan2(z, math.sqrt(x*x + y*y))
+    lon = math.atan2(y, x)
+    return math.degrees(lat), math.degrees(lon)
+
+
+def haversine_anterior(lat1, lon1, lat2, lon2):
+    """SimuladorVuelos.haversine antes de geo.py"""
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return geo.RADIO_TIERRA * c
+
+
+def paso_anterior(vuelos, tabla):
+    for v in vuelos:
+        lat, lon = slerp_anterior(tabla.lat[v.origen], tabla.lon[v.origen],
+                                  tabla.lat[v.destino], tabla.lon[v.destino], v.progreso)
+        v.distancia_restante = haversine_anterior(lat, lon, tabla.lat[v.destino], tabla.lon[v.destino])
+        v.lat_actual, v.lon_actual = lat, lon
+
+
+def paso_actual(vuelos, tabla):
+    for v in vuelos:
+        v.lat_actual, v.lon_actual = v.ruta.posicion(v.progreso)
+        v.distancia_restante = (1 - v.progreso) * v.distancia_total
+
+
+def llamadas_math(funcion):
+    """Llamadas a funciones de math hechas por funcion(), por nombre"""
+    perfil = cProfile.Profile()
+    perfil.runcall(funcion)
+    llamadas = {}
+    for (_, _, nombre), (_, total, *_) in pstats.Stats(perfil).stats.items():
+        if nombre.startswith('<built-in method math.'):
+            llamadas[nombre[len('<built-in method math.'):-1]] = total
+    return llamadas
+
+
+def resumen(llamadas, n):
+    total = sum(llamadas.values()) / n
+    detalle = ', '.join(f"{k} {v / n:.1f}" for k, v in sorted(llamadas.items()))
+    return f"{total:5.1f} ({detalle})"
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(42)
+    os.environ['MOTOR_SIMULACION'] = 'escalar'
+    simulador = SimuladorVuelos()
+    simulador.enviar_mensaje = lambda mensaje: None
+    for i in range(n):
+        vuelo = simulador.generar_vuelo()
+        vuelo.id = f"FL{i:06d}"
+        vuelo.combustible = vuelo.distancia_total * 10
+        vuelo.progreso = random.random()
+        simulador.agregar_vuelo_activo(vuelo)
+    tabla = simulador.vuelos_activos.aeropuertos
+    vuelos = list(simulador.vuelos_activos.values())
+
+    # Precisión: el mismo progreso por ambos caminos
+    paso_anterior(vuelos, tabla)
+    anteriores = [(v.lat_actual, v.lon_actual, v.distancia_restante) for v in vuelos]
+    paso_actual(vuelos, tabla)
+    error_posicion = max(geo.haversine(lat, lon, v.lat_actual, v.lon_actual)
+                         for (lat, lon, _), v in zip(anteriores, vuelos)) * 1000
+    error_restante = max(abs(d - v.distancia_restante) for (_, _, d), v in zip(anteriores, vuelos)) * 1000
+    print(f"Precisión sobre {n:,} vuelos: posición {error_posicion:.3g} m, "
+          f"distancia restante {error_restante:.3g} m (distancia_total redondeada a 10 m)")
+
+    print(f"\n{'paso':>10} | {'µs/vuelo':>9} | llamadas a math por vuelo")
+    print("-" * 80)
+    for nombre, paso in (('anterior', paso_anterior), ('actual', paso_actual)):
+        inicio = time.perf_counter()
+        for _ in range(ticks):
+            paso(vuelos, tabla)
+        microsegundos = (time.perf_counter() - inicio) / (ticks * n) * 1e6
+        print(f"{nombre:>10} | {microsegundos:>9.2f} | {resumen(llamadas_math(lambda: paso(vuelos, tabla)), n)}")
+
+    # El tick completo del motor escalar (viento, combustible, ETA, trayectoria)
+    with contextlib.redirect_stdout(io.StringIO()):
+        activos = len(simulador.vuelos_activos)
+        llamadas = llamadas_math(lambda: simulador.tick_escalar(activos))
+    print(f"\ntick_escalar: {resumen(llamadas, activos)} llamadas a math por vuelo")
+
+
+if __name__ == "__main__":
+    main()
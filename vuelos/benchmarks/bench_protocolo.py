@@ -0,0 +1,107 @@
+"""
+BENCHMARK - PROTOCOLO DE MENSAJES
+Compara JSON por líneas con el protocolo binario negociado (longitud + msgpack,
+con las posiciones en registros fijos) sobre los frames reales de un tick del
+simulador: tamaño por actualización, codificación, y separación + decodificación
+del flujo recibido (incluido el parseo anterior con str.split)
+
+Uso: python benchmarks/bench_protocolo.py [vuelos]
+"""
+import io
+import os
+import sys
+import time
+import json
+import random
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from m2_simulador import SimuladorVuelos
+from protocolo import (FORMATO_JSON, FORMATO_MSGPACK, Decodificador, codificar,
+                       mensajes_de_frame, msgpack)
+
+TICKS = 20
+TROZO_RECV = 8192
+
+
+class SimuladorCaptura(SimuladorVuelos):
+    """Simulador sin socket que guarda los mensajes de cada tick"""
+
+    def __init__(self, formato):
+        super().__init__()
+        self.formato = formato
+        self.mensajes = []
+
+    def enviar_mensaje(self, mensaje):
+        self.mensajes.append(mensaje)
+
+
+def capturar(formato, n):
+    random.seed(7)
+    simulador = SimuladorCaptura(formato)
+    for i in range(n):
+        vuelo = simulador.generar_vuelo()
+        vuelo.id = f"FL{i:06d}"
+        vuelo.combustible = vuelo.distancia_total * 10
+        simulador.agregar_vuelo_activo(vuelo)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(TICKS):
+            simulador.tick_escalar(len(simulador.vuelos_activos))
+            simulador.tick_actual += 1
+    return [m for m in simulador.mensajes if m['tipo'] == 'frame']
+
+
+def parsear_anterior(flujo):
+    """Parseo original: str creciente + split('\\n', 1) por línea"""
+    buffer = ""
+    total = 0
+    for i in range(0, len(flujo), TROZO_RECV):
+        buffer += flujo[i:i + TROZO_RECV].decode('utf-8')
+        while '\n' in buffer:
+            linea, buffer = buffer.split('\n', 1)
+            if linea.strip():
+                total += len(json.loads(linea).get('mensajes') or [])
+    return total
+
+
+def parsear(flujo, formato):
+    decodificador = Decodificador(formato)
+    total = 0
+    for i in range(0, len(flujo), TROZO_RECV):
+        for mensaje, _ in decodificador.alimentar(flujo[i:i + TROZO_RECV]):
+            total += len(mensajes_de_frame(mensaje))
+    return total
+
+
+def cronometrar(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    formatos = [FORMATO_JSON] + ([FORMATO_MSGPACK] if msgpack is not None else [])
+    actualizaciones = n * TICKS
+
+    print(f"{n} vuelos × {TICKS} ticks = {actualizaciones:,} vuelo_update")
+    print(f"{'formato':>16} | {'bytes/upd':>9} | {'codificar upd/s':>15} | {'parsear upd/s':>13}")
+    print("-" * 64)
+    for formato in formatos:
+        frames = capturar(formato, n)
+        t_codificar, codificados = cronometrar(lambda: [codificar(f, formato) for f in frames])
+        flujo = b''.join(codificados)
+        t_parsear, total = cronometrar(parsear, flujo, formato)
+        assert total == actualizaciones, (total, actualizaciones)
+        print(f"{formato:>16} | {len(flujo) / actualizaciones:>9.1f} | "
+              f"{actualizaciones / t_codificar:>15,.0f} | {actualizaciones / t_parsear:>13,.0f}")
+        if formato == FORMATO_JSON:
+            t_anterior, _ = cronometrar(parsear_anterior, flujo)
+            print(f"{'json (str.split)':>16} | {'':>9} | {'':>15} | {actualizaciones / t_anterior:>13,.0f}")
+    if msgpack is None:
+        print("⚠️  msgpack no está instalado: solo se midió JSON por líneas")
+
+
+if __name__ == "__main__":
+    main()
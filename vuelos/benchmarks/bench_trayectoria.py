@@ -0,0 +1,90 @@
+"""
+BENCHMARK - TRAYECTORIA ACOTADA
+Compara la lista anterior (append por tick y recorte con [-1000:]) con el
+buffer circular que simplifica al agregar: costo por punto, puntos que quedan
+y memoria por vuelo después de T ticks sobre rutas de círculo máximo
+
+Uso: python benchmarks/bench_trayectoria.py [vuelos] [ticks]
+"""
+import gc
+import os
+import sys
+import time
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rutas import TablaRutas
+from trayectoria import Trayectoria
+
+
+class ListaAnterior:
+    """Comportamiento anterior de vuelo.trayectoria"""
+
+    def __init__(self):
+        self.puntos = []
+
+    def agregar(self, lat, lon):
+        self.puntos.append([lat, lon])
+        if len(self.puntos) > 1000:
+            self.puntos = self.puntos[-1000:]
+
+    def __len__(self):
+        return len(self.puntos)
+
+
+class SinTrayectoria:
+    """Referencia: solo el recorrido de las posiciones"""
+
+    def agregar(self, lat, lon):
+        pass
+
+
+def simular(crear, posiciones):
+    trayectorias = [crear() for _ in posiciones[0]]
+    inicio = time.perf_counter()
+    for tick in posiciones:
+        for (lat, lon), trayectoria in zip(tick, trayectorias):
+            trayectoria.agregar(lat, lon)
+    return time.perf_counter() - inicio, trayectorias
+
+
+def memoria(crear, posiciones):
+    """(puntos por vuelo, bytes por vuelo) al terminar"""
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    _, trayectorias = simular(crear, posiciones)
+    gc.collect()
+    usados = tracemalloc.get_traced_memory()[0] - antes
+    tracemalloc.stop()
+    return sum(len(t) for t in trayectorias) / len(trayectorias), usados / len(trayectorias)
+
+
+def main():
+    vuelos = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    random.seed(7)
+    tabla = TablaRutas(6371.0)
+    rutas = [
+        tabla.obtener(random.uniform(-4, 12), random.uniform(-79, -67),
+                      random.uniform(-35, 50), random.uniform(-120, -40))
+        for _ in range(vuelos)
+    ]
+    posiciones = [[ruta.posicion(k / (ticks - 1)) for ruta in rutas] for k in range(ticks)]
+    # El recorrido de las posiciones se descuenta para medir solo la trayectoria
+    base, _ = simular(SinTrayectoria, posiciones)
+
+    print(f"{vuelos:,} vuelos x {ticks:,} ticks")
+    print(f"{'trayectoria':>22} | {'µs/punto':>9} | {'puntos/vuelo':>12} | {'KB/vuelo':>9}")
+    print("-" * 62)
+    for nombre, crear in (('lista [-1000:]', ListaAnterior), ('buffer simplificado', Trayectoria)):
+        segundos, _ = simular(crear, posiciones)
+        puntos, bytes_vuelo = memoria(crear, posiciones)
+        print(f"{nombre:>22} | {(segundos - base) / (vuelos * ticks) * 1e6:>9.3f} | "
+              f"{puntos:>12,.1f} | {bytes_vuelo / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
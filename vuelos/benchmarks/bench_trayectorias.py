@@ -0,0 +1,94 @@
+"""
+BENCHMARK - ARCHIVO DE TRAYECTORIAS
+Compara guardar las trayectorias de vuelos completados como pares JSON (como
+iban dentro de cada registro) con el archivo columnar de int32 en microgrados
+con delta: bytes en disco y tiempo de cargar todas las trayectorias (json.loads
+contra memmap + cumsum de NumPy). Informa también el error máximo de redondeo
+
+Uso: python benchmarks/bench_trayectorias.py [vuelos] [puntos] [directorio]
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archivo_trayectorias import MICROGRADOS, ArchivoTrayectorias, np
+
+
+def trayectoria(puntos):
+    """Arco entre dos puntos al azar de Colombia con el paso de un tick del simulador"""
+    lat0, lon0 = random.uniform(-4, 12), random.uniform(-79, -67)
+    lat1, lon1 = random.uniform(-4, 12), random.uniform(-79, -67)
+    return [
+        [lat0 + (lat1 - lat0) * k / puntos + 0.01 * math.sin(k / 50),
+         lon0 + (lon1 - lon0) * k / puntos]
+        for k in range(puntos)
+    ]
+
+
+def main():
+    vuelos = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    puntos = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    base = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.getcwd(), 'data')
+    os.makedirs(base, exist_ok=True)
+    directorio = tempfile.mkdtemp(dir=base, prefix='bench_trayectorias_')
+    try:
+        pistas = {f"FL{i:06d}": trayectoria(puntos) for i in range(vuelos)}
+
+        ruta_json = os.path.join(directorio, 'trayectorias.jsonl')
+        with open(ruta_json, 'w', encoding='utf-8') as f:
+            for vuelo_id, pista in pistas.items():
+                f.write(json.dumps({'id': vuelo_id, 'trayectoria': pista}) + '\n')
+        bytes_json = os.path.getsize(ruta_json)
+
+        archivo = ArchivoTrayectorias(os.path.join(directorio, 'columnar'))
+        inicio = time.perf_counter()
+        referencias = {vuelo_id: archivo.archivar(vuelo_id, pista) for vuelo_id, pista in pistas.items()}
+        archivo.datos.vaciar()  # Hasta que los lotes encolados llegan al archivo
+        archivo.indice.vaciar()
+        segundos_archivar = time.perf_counter() - inicio
+        bytes_columnar = archivo.tamano()
+
+        error = max(
+            abs(a - b)
+            for vuelo_id in list(pistas)[:50]
+            for p, q in zip(pistas[vuelo_id], archivo.leer(referencias[vuelo_id]))
+            for a, b in zip(p, q)
+        )
+
+        inicio = time.perf_counter()
+        with open(ruta_json, encoding='utf-8') as f:
+            total_json = sum(len(json.loads(linea)['trayectoria']) for linea in f)
+        segundos_json = time.perf_counter() - inicio
+
+        print(f"{vuelos:,} vuelos x {puntos:,} puntos")
+        print(f"   JSON:     {bytes_json / 2 ** 20:8.1f} MB, carga {segundos_json * 1000:8.1f} ms")
+        linea = f"   Columnar: {bytes_columnar / 2 ** 20:8.1f} MB ({bytes_json / bytes_columnar:.1f}x menos)"
+        if np is not None:
+            inicio = time.perf_counter()
+            indice, valores = archivo.cargar_columnas()
+            total = 0
+            for offset, n in zip(indice['offset'], indice['puntos']):
+                lats = np.cumsum(valores[offset:offset + n]) / MICROGRADOS
+                lons = np.cumsum(valores[offset + n:offset + 2 * n]) / MICROGRADOS
+                assert len(lats) == len(lons)
+                total += len(lats)
+            assert total == total_json
+            linea += f", carga memmap {(time.perf_counter() - inicio) * 1000:8.1f} ms"
+        print(linea)
+        print(f"   Archivar: {vuelos / segundos_archivar:,.0f} vuelos/s (FSYNC_MODO={archivo.datos.modo}, "
+              f"{archivo.datos.fsyncs + archivo.indice.fsyncs:,} fsyncs), "
+              f"error máximo {error * 1e6:.2f} microgrados")
+        archivo.cerrar()
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+BENCHMARK - VISTAS DE LOS NAVEGADORES (M4)
+Alimenta el visualizador con N vuelos y T ticks de deltas y cuenta, por cada
+cliente (vista mundial, continental y de ciudad), los eventos y bytes JSON que
+recibe con el filtrado por vista y los frames por cliente, frente a la
+difusión de antes (un evento por update a todos). Informa también el costo
+de difundir por update en el servidor
+
+Uso: python benchmarks/bench_vistas.py [vuelos] [ticks]
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rutas import TablaRutas
+from m4_mapa import VisualizadorMapa
+
+CLIENTES = (
+    # nombre, (sur, oeste, norte, este, zoom)
+    ('mundo z2', (-60, -180, 75, 180, 2)),
+    ('Sudamérica z4', (-35, -82, 13, -34, 4)),
+    ('Bogotá z8', (4.0, -75.0, 5.5, -73.0, 8)),
+)
+
+
+class VisualizadorBenchmark(VisualizadorMapa):
+    """Cuenta lo que se emitiría a cada cliente en vez de emitirlo"""
+
+    def __init__(self):
+        super().__init__()
+        self.eventos = {}
+        self.bytes = {}
+
+    def emitir(self, evento, contenido, sid):
+        self.eventos[sid] = self.eventos.get(sid, 0) + 1
+        self.bytes[sid] = self.bytes.get(sid, 0) + len(json.dumps(contenido))
+
+
+def vuelo(i, ruta):
+    lat, lon = ruta.posicion(0.0)
+    return {
+        'id': f"FL{i:06d}", 'activo': True, 'progreso': 0.0, 'velocidad': 800,
+        'origen': {'lat': lat, 'lon': lon}, 'destino': {'lat': 0.0, 'lon': 0.0},
+        'lat_actual': lat, 'lon_actual': lon, 'trayectoria': [[lat, lon]],
+    }
+
+
+def main():
+    vuelos = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    random.seed(7)
+    tabla = TablaRutas(6371.0)
+    rutas = []
+    for i in range(vuelos):
+        if i % 2:  # La mitad nacional, la otra mitad por el mundo
+            extremos = (random.uniform(-4, 12), random.uniform(-79, -67),
+                        random.uniform(-4, 12), random.uniform(-79, -67))
+        else:
+            extremos = (random.uniform(-50, 65), random.uniform(-180, 180),
+                        random.uniform(-50, 65), random.uniform(-180, 180))
+        rutas.append(tabla.obtener(*extremos))
+
+    mapa = VisualizadorBenchmark()
+    for nombre, limites in CLIENTES:
+        mapa.registrar_cliente(nombre)
+        mapa.cambiar_vista(nombre, *limites)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, ruta in enumerate(rutas):
+            mapa.procesar_mensaje({'tipo': 'vuelo_nuevo', 'vuelo': vuelo(i, ruta)})
+
+    # Difusión a todos (antes): cada delta viaja a cada cliente
+    bytes_difusion = 0
+    updates = 0
+    inicio = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        t = tick / (ticks * 4)
+        for i, ruta in enumerate(rutas):
+            lat, lon = ruta.posicion(t)
+            delta = {'id': f"FL{i:06d}", 'progreso': t, 'lat_actual': lat, 'lon_actual': lon}
+            bytes_difusion += len(json.dumps(delta))
+            updates += 1
+            mapa.procesar_mensaje({'tipo': 'vuelo_update', 'delta': True,
+                                   'vuelo': dict(delta, punto=[lat, lon])})
+        # Un frame por tick; un poco más tarde, como time.sleep, que nunca despierta antes
+        mapa.vaciar_pendientes(tick * mapa.periodo_frame * 1.001)
+    segundos = time.perf_counter() - inicio
+
+    print(f"{vuelos:,} vuelos x {ticks} ticks ({updates:,} updates), "
+          f"difundir: {segundos / updates * 1e6:.1f} µs/update")
+    print(f"{'cliente':>15} | {'eventos':>9} | {'antes':>9} | {'KB':>9} | {'KB antes':>9} | {'ahorro':>7}")
+    print("-" * 73)
+    for nombre, _ in CLIENTES:
+        kb = mapa.bytes.get(nombre, 0) / 1024
+        kb_difusion = bytes_difusion / 1024
+        print(f"{nombre:>15} | {mapa.eventos.get(nombre, 0):>9,} | {updates:>9,} | {kb:>9,.0f} | "
+              f"{kb_difusion:>9,.0f} | {kb_difusion / max(kb, 1e-9):>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
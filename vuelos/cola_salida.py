@@ -0,0 +1,105 @@
+"""
+COLA DE SALIDA POR CLIENTE (M1)
+Cola acotada que desacopla el enrutamiento del envío por socket: cada cliente
+tiene un escritor propio, de modo que un consumidor lento solo se atrasa a sí
+mismo. Al llenarse se aplica la política de desborde del tipo de mensaje.
+Los mensajes se encolan ya codificados (bytes de una línea JSON), de modo que
+un broadcast se serializa una sola vez para todos los clientes
+"""
+import threading
+from collections import deque
+
+# Políticas de desborde por tipo de mensaje
+DESCARTAR_ANTIGUO = 'descartar_antiguo'  # Se pierde el mensaje descartable más viejo
+NUNCA_DESCARTAR = 'nunca_descartar'      # Se encola aunque la cola supere el límite
+
+# Las posiciones se reemplazan con el siguiente tick (y los keyframes reparan
+# cualquier delta perdido); altas, guardados y llegadas no se pueden perder
+POLITICAS_DESBORDE = {
+    'vuelo_update': DESCARTAR_ANTIGUO,
+    'frame': DESCARTAR_ANTIGUO,
+    'vuelo_nuevo': NUNCA_DESCARTAR,
+    'guardar_vuelo': NUNCA_DESCARTAR,
+    'vuelo_completado': NUNCA_DESCARTAR,
+}
+
+
+def politica_de(tipo, politicas=POLITICAS_DESBORDE):
+    """Política de desborde de un tipo de mensaje (por defecto no se descarta)"""
+    return politicas.get(tipo, NUNCA_DESCARTAR)
+
+
+class ColaSalida:
+    """Cola FIFO acotada con política de desborde por mensaje y métricas de profundidad"""
+
+    def __init__(self, maximo=1000, politicas=POLITICAS_DESBORDE):
+        self.maximo = maximo
+        self.politicas = politicas
+        self.elementos = deque()  # (descartable, datos)
+        self.cond = threading.Condition()
+        self.cerrada = False
+        # Métricas
+        self.encolados = 0
+        self.descartados = 0
+        self.profundidad_maxima = 0
+
+    def __len__(self):
+        return len(self.elementos)
+
+    def poner(self, datos, tipo=None):
+        """Encola un mensaje codificado; devuelve False si fue descartado"""
+        descartable = politica_de(tipo, self.politicas) == DESCARTAR_ANTIGUO
+        with self.cond:
+            if self.cerrada:
+                return False
+            if len(self.elementos) >= self.maximo and descartable:
+                if not self._descartar_antiguo():
+                    # Solo quedan mensajes que no se pueden perder: se pierde el nuevo
+                    self.descartados += 1
+                    return False
+            self.elementos.append((descartable, datos))
+            self.encolados += 1
+            if len(self.elementos) > self.profundidad_maxima:
+                self.profundidad_maxima = len(self.elementos)
+            self.cond.notify()
+            return True
+
+    def _descartar_antiguo(self):
+        """Quita el mensaje descartable más antiguo (normalmente el primero)"""
+        for i, (descartable, _) in enumerate(self.elementos):
+            if descartable:
+                del self.elementos[i]
+                self.descartados += 1
+                return True
+        return False
+
+    def sacar(self, timeout=None):
+        """Espera el siguiente mensaje; None si se agotó el timeout o la cola se cerró"""
+        with self.cond:
+            if not self.elementos and not self.cerrada:
+                self.cond.wait(timeout)
+            if not self.elementos:
+                return None
+            return self.elementos.popleft()[1]
+
+    def vaciar(self):
+        """Retira y devuelve los mensajes pendientes"""
+        with self.cond:
+            pendientes = [datos for _, datos in self.elementos]
+            self.elementos.clear()
+            return pendientes
+
+    def cerrar(self):
+        """Despierta al escritor para que termine"""
+        with self.cond:
+            self.cerrada = True
+            self.cond.notify_all()
+
+    def metricas(self):
+        with self.cond:
+            return {
+                'profundidad': len(self.elementos),
+                'profundidad_maxima': self.profundidad_maxima,
+                'encolados': self.encolados,
+                'descartados': self.descartados,
+            }
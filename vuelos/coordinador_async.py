@@ -0,0 +1,139 @@
+"""
+M1 - NÚCLEO ASYNCIO DEL COORDINADOR
+Misma negociación JSON y mismo enrutamiento (procesar_mensaje) que el
+coordinador con hilos, pero todas las conexiones se atienden en un único bucle
+de eventos con streams de asyncio: sin un hilo por cliente ni accept con timeout
+
+Uso: python m1_coordinador.py --asyncio   (o COORDINADOR_MODO=asyncio)
+"""
+import asyncio
+import json
+
+from m1_coordinador import Coordinador
+from cola_salida import ColaSalida
+from protocolo import Decodificador, elegir_formato
+
+
+class ColaSalidaAsync(ColaSalida):
+    """Cola de salida que despierta a su escritor asyncio con un Event"""
+
+    def __init__(self, maximo=1000):
+        super().__init__(maximo)
+        self.evento = asyncio.Event()
+
+    def poner(self, datos, tipo=None):
+        encolado = super().poner(datos, tipo)
+        if encolado:
+            self.evento.set()
+        return encolado
+
+    def cerrar(self):
+        super().cerrar()
+        self.evento.set()
+
+
+class CoordinadorAsync(Coordinador):
+    """Coordinador sobre asyncio: lectores y escritores son corrutinas del mismo bucle"""
+
+    def __init__(self, host='0.0.0.0', port=5555):
+        super().__init__(host, port)
+        self.tareas = set()  # Referencias a los escritores para que no se recolecten
+
+    def iniciar(self):
+        """Inicia el servidor coordinador"""
+        asyncio.run(self.servir())
+
+    async def servir(self):
+        servidor = await asyncio.start_server(self.manejar_cliente, self.host, self.port, reuse_address=True)
+
+        print(f"🛰️  [M1-COORDINADOR] Servidor asyncio iniciado en {self.host}:{self.port}")
+        print("="*60)
+
+        monitor = asyncio.create_task(self.monitor_estado())
+        async with servidor:
+            while self.running:
+                await asyncio.sleep(1.0)
+        monitor.cancel()
+
+    async def manejar_cliente(self, reader, writer):
+        """Maneja la comunicación con un cliente conectado"""
+        direccion = writer.get_extra_info('peername')
+        print(f"✅ Nueva conexión desde {direccion}")
+        nombre_cliente = None
+        cola = None
+
+        try:
+            data = (await reader.read(1024)).decode('utf-8')
+            info = json.loads(data)
+            nombre_cliente = info.get('nombre', f'cliente_{direccion[1]}')
+            tipo = info.get('tipo', 'desconocido')
+            formato = elegir_formato(info.get('formatos'))
+
+            cola = ColaSalidaAsync(self.COLA_SALIDA_MAX)
+            self.registrar_cliente(nombre_cliente, tipo, direccion, writer, cola, info.get('temas'), formato)
+            tarea = asyncio.create_task(self.escritor_cliente(nombre_cliente, writer, cola, formato))
+            self.tareas.add(tarea)
+            tarea.add_done_callback(self.tareas.discard)
+            self.anunciar_cliente(nombre_cliente, tipo)
+
+            # Los streams de asyncio no exponen recv_into: cada lectura se copia
+            # una vez al buffer preasignado del lector
+            decodificador = Decodificador(formato)
+            while self.running:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                for mensaje, crudo in decodificador.alimentar(data):
+                    self.mensajes_recibidos += 1
+                    self.procesar_mensaje(nombre_cliente, mensaje, {formato: crudo})
+
+        except Exception as e:
+            print(f"❌ Error con {nombre_cliente}: {e}")
+        finally:
+            self.desconectar_cliente(nombre_cliente, cola)
+
+    async def escritor_cliente(self, nombre_cliente, writer, cola, formato):
+        """Drena la cola de salida de un cliente: todo lo pendiente en una sola escritura"""
+        enviados = []
+        confirmacion = True  # Lo primero en la cola es la confirmación del handshake
+        try:
+            while self.running:
+                await cola.evento.wait()
+                cola.evento.clear()
+                enviados = cola.vaciar()
+                if not enviados:
+                    if cola.cerrada:
+                        break
+                    continue
+                writer.write(b''.join(enviados))
+                await writer.drain()
+                self.mensajes_enviados += len(enviados)
+                enviados = []
+                confirmacion = False
+        except Exception as e:
+            print(f"❌ Error enviando a {nombre_cliente}: {e}")
+            self.desconectar_cliente(nombre_cliente, cola)
+            pendientes = enviados + cola.vaciar()
+            if confirmacion:
+                # La confirmación va en JSON aunque se haya negociado msgpack: no es un mensaje a respaldar
+                pendientes = pendientes[1:]
+            self.respaldar_pendientes(nombre_cliente, pendientes, formato)
+
+    def cerrar_conexion(self, writer):
+        """Cierra el transporte: el lector de esa conexión recibe fin de stream"""
+        writer.close()
+
+    async def monitor_estado(self):
+        """Monitorea y reporta el estado del sistema"""
+        while self.running:
+            await asyncio.sleep(30)
+            self.reportar_estado()
+
+
+if __name__ == "__main__":
+    coordinador = CoordinadorAsync()
+    try:
+        coordinador.iniciar()
+    except KeyboardInterrupt:
+        print("\n👋 Cerrando coordinador...")
+        coordinador.running = False
@@ -0,0 +1,160 @@
+"""
+ESCRITOR CON COMMIT EN GRUPO (M3)
+Mantiene abierto el archivo JSONL y escribe desde un hilo propio: los registros
+que se encolan mientras el disco está ocupado se escriben juntos en un solo
+write y se sincronizan con un solo fsync por lote.
+Modos de durabilidad:
+- 'registros': fsync en cuanto hay N registros sin sincronizar (N=1: uno por lote)
+- 'tiempo':    fsync como mucho cada T ms si hay registros sin sincronizar
+- 'so':        sin fsync; el sistema operativo decide cuándo bajan a disco
+"""
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+MODO_REGISTROS = 'registros'
+MODO_TIEMPO = 'tiempo'
+MODO_SO = 'so'
+MODOS_DURABILIDAD = (MODO_REGISTROS, MODO_TIEMPO, MODO_SO)
+
+
+class EscritorGrupal:
+    """Escritor de líneas en modo append con cola, lotes y fsync agrupado"""
+
+    def __init__(self, ruta, modo=MODO_REGISTROS, cada_n=1, cada_ms=100):
+        if modo not in MODOS_DURABILIDAD:
+            raise ValueError(f"Modo de durabilidad desconocido: {modo}")
+        self.ruta = ruta
+        self.modo = modo
+        self.cada_n = max(1, cada_n)
+        self.cada_s = max(1, cada_ms) / 1000.0
+        self.archivo = open(ruta, 'ab')
+        self.tamano = self.archivo.tell()  # Fin del archivo contando lo que está en cola
+        self.pendientes = deque()
+        self.cond = threading.Condition()
+        self.lock_archivo = threading.Lock()  # Un lote o una reescritura a la vez
+        self.running = True
+        self.sin_sincronizar = 0
+        self.ultimo_fsync = time.monotonic()
+        # Métricas
+        self.registros = 0
+        self.lotes = 0
+        self.fsyncs = 0
+        self.hilo = threading.Thread(target=self._escribir_lotes, daemon=True)
+        self.hilo.start()
+
+    @classmethod
+    def desde_entorno(cls, ruta):
+        """Configura la durabilidad con FSYNC_MODO, FSYNC_CADA_N y FSYNC_CADA_MS"""
+        return cls(
+            ruta,
+            modo=os.getenv('FSYNC_MODO', MODO_REGISTROS).strip().lower(),
+            cada_n=int(os.getenv('FSYNC_CADA_N', '1')),
+            cada_ms=int(os.getenv('FSYNC_CADA_MS', '100')),
+        )
+
+    def escribir(self, linea):
+        """
+        Encola una línea codificada (bytes terminados en '\\n'); no espera al disco.
+        Devuelve el offset en el que quedará la línea dentro del archivo
+        """
+        with self.cond:
+            offset = self.tamano
+            self.tamano += len(linea)
+            self.pendientes.append(linea)
+            self.cond.notify()
+            return offset
+
+    def _escribir_lotes(self):
+        while self.running:
+            with self.cond:
+                if not self.pendientes:
+                    # En modo 'tiempo' hay que despertar para el fsync diferido
+                    diferido = self.sin_sincronizar and self.modo == MODO_TIEMPO
+                    self.cond.wait(self.cada_s if diferido else None)
+            try:
+                with self.lock_archivo:
+                    self._escribir_pendientes()
+                    self._sincronizar_si_toca()
+            except Exception as e:
+                print(f"❌ Error escribiendo lote: {e}")
+
+    def _escribir_pendientes(self):
+        """Escribe todo lo encolado en un solo write (con lock_archivo tomado)"""
+        with self.cond:
+            lote = list(self.pendientes)
+            self.pendientes.clear()
+        if not lote:
+            return
+        self.archivo.write(b''.join(lote))
+        self.archivo.flush()
+        self.registros += len(lote)
+        self.lotes += 1
+        self.sin_sincronizar += len(lote)
+
+    def _sincronizar_si_toca(self):
+        if not self.sin_sincronizar or self.modo == MODO_SO:
+            return
+        if self.modo == MODO_REGISTROS and self.sin_sincronizar < self.cada_n:
+            return
+        if self.modo == MODO_TIEMPO and time.monotonic() - self.ultimo_fsync < self.cada_s:
+            return
+        self._sincronizar()
+
+    def _sincronizar(self):
+        os.fsync(self.archivo.fileno())
+        self.fsyncs += 1
+        self.sin_sincronizar = 0
+        self.ultimo_fsync = time.monotonic()
+
+    def vaciar(self):
+        """Escribe ya lo encolado (para que una lectura del archivo lo vea)"""
+        with self.lock_archivo:
+            self._escribir_pendientes()
+
+    @contextmanager
+    def pausado(self, descartar=False):
+        """
+        Detiene la escritura mientras otro código reescribe, trunca o reemplaza
+        el archivo (quien lo hace debe impedir que se encolen líneas nuevas).
+        Antes escribe lo encolado, o lo descarta si descartar=True; al terminar
+        vuelve a abrir la ruta por si el archivo fue reemplazado
+        """
+        with self.lock_archivo:
+            if descartar:
+                with self.cond:
+                    self.pendientes.clear()
+            else:
+                self._escribir_pendientes()
+            try:
+                yield
+            finally:
+                self.sin_sincronizar = 0  # La reescritura hace su propio fsync
+                self.archivo.close()
+                self.archivo = open(self.ruta, 'ab')
+                with self.cond:
+                    self.tamano = self.archivo.tell()
+
+    def cerrar(self):
+        """Escribe y sincroniza lo pendiente y cierra el archivo"""
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        self.hilo.join(timeout=5)
+        with self.lock_archivo:
+            self._escribir_pendientes()
+            if self.sin_sincronizar and self.modo != MODO_SO:
+                self._sincronizar()
+            self.archivo.close()
+
+    def metricas(self):
+        with self.cond:
+            return {
+                'modo': self.modo,
+                'pendientes': len(self.pendientes),
+                'registros': self.registros,
+                'lotes': self.lotes,
+                'fsyncs': self.fsyncs,
+            }
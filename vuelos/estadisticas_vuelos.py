@@ -0,0 +1,84 @@
+"""
+ESTADÍSTICAS INCREMENTALES (M3)
+Agregados que se actualizan con cada registro guardado en vez de releer el
+archivo: total de registros, suma de distancias y de velocidades, y conteo de
+rutas con las k más frecuentes mantenidas aparte, de modo que consultar las
+estadísticas cuesta O(1) sin importar el tamaño del historial
+"""
+
+
+class TopK:
+    """
+    Las k claves con mayor conteo. Los conteos solo crecen, así que basta con
+    comparar cada clave que sube contra la menor de las k actuales
+    """
+
+    def __init__(self, k=5):
+        self.k = k
+        self.conteos = {}
+        self.top = {}  # clave -> conteo, como mucho k entradas
+
+    def incrementar(self, clave, cantidad=1):
+        conteo = self.conteos.get(clave, 0) + cantidad
+        self.conteos[clave] = conteo
+        if clave in self.top or len(self.top) < self.k:
+            self.top[clave] = conteo
+            return
+        menor = min(self.top, key=self.top.get)
+        if conteo > self.top[menor]:
+            del self.top[menor]
+            self.top[clave] = conteo
+
+    def mayores(self):
+        """[(clave, conteo)] de mayor a menor"""
+        return sorted(self.top.items(), key=lambda x: x[1], reverse=True)
+
+
+class EstadisticasVuelos:
+    """Agregados de los registros del log, mismos campos que antes calculaba obtener_estadisticas"""
+
+    def __init__(self, k_rutas=5):
+        self.k_rutas = k_rutas
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.total_vuelos = 0
+        self.distancia_total = 0
+        self.velocidad_total = 0
+        self.rutas = TopK(self.k_rutas)
+
+    def agregar(self, vuelo):
+        """Suma un registro guardado (un vuelo o una actualización suya)"""
+        self.total_vuelos += 1
+        self.distancia_total += vuelo.get('distancia_total', 0)
+        self.velocidad_total += vuelo.get('velocidad', 0)
+        try:
+            self.rutas.incrementar(f"{vuelo['origen']['code']}-{vuelo['destino']['code']}")
+        except (KeyError, TypeError):
+            pass
+
+    def combinar(self, datos):
+        """Suma los agregados guardados con a_dict() (p. ej. los de un segmento sellado)"""
+        self.total_vuelos += datos['total_vuelos']
+        self.distancia_total += datos['distancia_total']
+        self.velocidad_total += datos['velocidad_total']
+        for ruta, conteo in datos['rutas'].items():
+            self.rutas.incrementar(ruta, conteo)
+
+    def a_dict(self):
+        """Agregados completos (con el conteo de todas las rutas) para persistirlos"""
+        return {
+            'total_vuelos': self.total_vuelos,
+            'distancia_total': self.distancia_total,
+            'velocidad_total': self.velocidad_total,
+            'rutas': dict(self.rutas.conteos),
+        }
+
+    def resumen(self):
+        total = self.total_vuelos
+        return {
+            'total_vuelos': total,
+            'distancia_total': round(self.distancia_total, 2),
+            'promedio_velocidad': round(self.velocidad_total / total if total > 0 else 0, 2),
+            'rutas_populares': self.rutas.mayores()
+        }
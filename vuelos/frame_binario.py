@@ -0,0 +1,86 @@
+"""
+FRAMES BINARIOS HACIA EL NAVEGADOR (M4)
+Un frame_vuelos en JSON repite los nombres de campo por vuelo y el navegador
+arma un objeto por cada uno. El frame binario lleva las mismas columnas como
+arreglos tipados, listos para envolver con Int32Array/Float32Array/Uint8Array
+sin crear objetos por vuelo. Todo little-endian, alineado a 4 bytes:
+
+    cabecera   uint32 x 2      vuelos (n), fuera (m)
+    num        int32   x n     número del vuelo ('num' en su nuevo_vuelo)
+    lat, lon   float32 x n     posición actual en grados
+    rumbo      float32 x n     grados
+    progreso   float32 x n     0..1
+    altitud, velocidad, combustible, distancia_restante   float32 x n
+    eta        int32   x n     segundos desde epoch (0 si no hay)
+    fuera      int32   x m     números de los vuelos que salieron de la vista
+    estado     uint8   x n     bit 0 activo, bit 1 emergencia
+
+Son 41 bytes por vuelo más 4 por salida y 8 de cabecera. float32 guarda la
+posición con menos de 2 m de error
+"""
+import sys
+import struct
+from array import array
+from datetime import datetime
+
+CABECERA = struct.Struct('<II')
+COLUMNAS_REALES = ('lat_actual', 'lon_actual', 'rumbo', 'progreso',
+                   'altitud', 'velocidad', 'combustible', 'distancia_restante')
+ACTIVO = 1
+EMERGENCIA = 2
+BYTES_VUELO = 4 + 4 * len(COLUMNAS_REALES) + 4 + 1
+
+
+def segundos_eta(vuelo):
+    """hora_llegada_estimada (ISO) como segundos desde epoch, 0 si falta"""
+    eta = vuelo.get('hora_llegada_estimada') or vuelo.get('eta')
+    if not eta:
+        return 0
+    try:
+        return int(datetime.fromisoformat(eta).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+def _bytes(columna):
+    if sys.byteorder != 'little':
+        columna.byteswap()
+    return columna.tobytes()
+
+
+def empaquetar_frame(nums, vuelos, fuera):
+    """
+    Frame binario de los vuelos (dicts de estado completo, con sus números en
+    nums) y los números de los que salieron de la vista
+    """
+    partes = [CABECERA.pack(len(vuelos), len(fuera)), _bytes(array('i', nums))]
+    for campo in COLUMNAS_REALES:
+        partes.append(_bytes(array('f', [float(v.get(campo) or 0.0) for v in vuelos])))
+    partes.append(_bytes(array('i', [segundos_eta(v) for v in vuelos])))
+    partes.append(_bytes(array('i', fuera)))
+    partes.append(bytes(
+        (ACTIVO if v.get('activo') else 0) | (EMERGENCIA if v.get('emergencia') else 0)
+        for v in vuelos
+    ))
+    return b''.join(partes)
+
+
+def desempaquetar_frame(datos):
+    """(columnas, fuera): dict campo -> array por vuelo y array de números que salieron"""
+    n, m = CABECERA.unpack_from(datos)
+    posicion = CABECERA.size
+    columnas = {}
+    for campo, tipo in (('num', 'i'),) + tuple((c, 'f') for c in COLUMNAS_REALES) + (('eta', 'i'),):
+        columna = array(tipo)
+        columna.frombytes(datos[posicion:posicion + 4 * n])
+        posicion += 4 * n
+        if sys.byteorder != 'little':
+            columna.byteswap()
+        columnas[campo] = columna
+    fuera = array('i')
+    fuera.frombytes(datos[posicion:posicion + 4 * m])
+    if sys.byteorder != 'little':
+        fuera.byteswap()
+    posicion += 4 * m
+    columnas['estado'] = array('B', datos[posicion:posicion + n])
+    return columnas, fuera
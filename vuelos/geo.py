@@ -0,0 +1,177 @@
+"""
+GEODESIA COMPARTIDA (M2 y M4)
+Haversine, rumbo inicial, Slerp, distancia transversal a una ruta y punto de
+destino sobre la esfera, en un solo lugar (antes copiados en el simulador y en
+el mapa, convirtiendo grados a radianes en cada llamada).
+- Versiones escalares: reciben y devuelven grados; las variantes *_rad
+  reciben radianes ya convertidos (p. ej. los de TablaAeropuertos)
+- Versiones NumPy (*_np): por lotes, todo en radianes, para el motor
+  vectorizado; NumPy es opcional
+Las distancias salen en las unidades de `radio` (km por defecto)
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:  # Solo las funciones *_np necesitan NumPy
+    np = None
+
+RADIO_TIERRA = 6371.0  # km
+CERCANOS = 0.001       # Ángulo central (rad) por debajo del cual Slerp interpola lineal
+
+
+# ---------- Escalares ----------
+
+def vector_unitario(lat, lon):
+    """(x, y, z) del punto en la esfera unitaria"""
+    lat, lon = math.radians(lat), math.radians(lon)
+    cos_lat = math.cos(lat)
+    return (cos_lat * math.cos(lon), cos_lat * math.sin(lon), math.sin(lat))
+
+
+def angulo_central_rad(lat1, lon1, lat2, lon2):
+    """Ω = 2 · arctan2(√a, √(1-a)), a = sin²(Δφ/2) + cos(φ₁)cos(φ₂)sin²(Δλ/2)"""
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * math.atan2(math.sqrt(a), math.sqrt(max(0.0, 1 - a)))
+
+
+def haversine_rad(lat1, lon1, lat2, lon2, radio=RADIO_TIERRA):
+    return radio * angulo_central_rad(lat1, lon1, lat2, lon2)
+
+
+def haversine(lat1, lon1, lat2, lon2, radio=RADIO_TIERRA):
+    """Distancia ortodrómica entre dos puntos en grados"""
+    return radio * angulo_central_rad(math.radians(lat1), math.radians(lon1),
+                                      math.radians(lat2), math.radians(lon2))
+
+
+def rumbo_rad(lat1, lon1, lat2, lon2):
+    """θ = arctan2(sin(Δλ)cos(φ₂), cos(φ₁)sin(φ₂) - sin(φ₁)cos(φ₂)cos(Δλ)), en (-π, π]"""
+    dlon = lon2 - lon1
+    cos_lat2 = math.cos(lat2)
+    x = math.sin(dlon) * cos_lat2
+    y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * cos_lat2 * math.cos(dlon)
+    return math.atan2(x, y)
+
+
+def rumbo(lat1, lon1, lat2, lon2):
+    """Rumbo inicial de 1 hacia 2 en grados [0, 360)"""
+    theta = rumbo_rad(math.radians(lat1), math.radians(lon1), math.radians(lat2), math.radians(lon2))
+    return (math.degrees(theta) + 360) % 360
+
+
+def slerp_vectores(p0, p1, omega, sin_omega, t):
+    """
+    P(t) = sin((1-t)Ω)/sinΩ · P₀ + sin(tΩ)/sinΩ · P₁ con las constantes ya
+    calculadas de la ruta; devuelve (lat, lon) en grados
+    """
+    if omega < CERCANOS:  # Puntos muy cercanos: interpolación lineal
+        a = 1 - t
+        b = t
+    else:
+        a = math.sin((1 - t) * omega) / sin_omega
+        b = math.sin(t * omega) / sin_omega
+    x = a * p0[0] + b * p1[0]
+    y = a * p0[1] + b * p1[1]
+    z = a * p0[2] + b * p1[2]
+    return math.degrees(math.atan2(z, math.sqrt(x * x + y * y))), math.degrees(math.atan2(y, x))
+
+
+def slerp(lat1, lon1, lat2, lon2, t):
+    """Posición en la fracción t de la ortodrómica de 1 a 2 (sin caché: ver TablaRutas)"""
+    omega = angulo_central_rad(math.radians(lat1), math.radians(lon1), math.radians(lat2), math.radians(lon2))
+    return slerp_vectores(vector_unitario(lat1, lon1), vector_unitario(lat2, lon2), omega, math.sin(omega), t)
+
+
+def distancia_transversal(lat, lon, lat1, lon1, lat2, lon2, radio=RADIO_TIERRA):
+    """
+    Distancia del punto a la ortodrómica de 1 a 2, positiva a la derecha del
+    sentido de avance: d = asin(sin(δ₁₃) · sin(θ₁₃ - θ₁₂)) · R
+    """
+    lat, lon = math.radians(lat), math.radians(lon)
+    lat1, lon1 = math.radians(lat1), math.radians(lon1)
+    lat2, lon2 = math.radians(lat2), math.radians(lon2)
+    delta13 = angulo_central_rad(lat1, lon1, lat, lon)
+    diferencia = rumbo_rad(lat1, lon1, lat, lon) - rumbo_rad(lat1, lon1, lat2, lon2)
+    return radio * math.asin(max(-1.0, min(1.0, math.sin(delta13) * math.sin(diferencia))))
+
+
+def punto_destino(lat, lon, rumbo_grados, distancia, radio=RADIO_TIERRA):
+    """
+    Punto a `distancia` de (lat, lon) siguiendo el rumbo inicial dado:
+    φ₂ = asin(sinφ₁cosδ + cosφ₁sinδcosθ), λ₂ = λ₁ + atan2(sinθ sinδ cosφ₁, cosδ - sinφ₁sinφ₂)
+    """
+    lat, lon, theta = math.radians(lat), math.radians(lon), math.radians(rumbo_grados)
+    delta = distancia / radio
+    sin_lat, cos_lat = math.sin(lat), math.cos(lat)
+    sin_delta, cos_delta = math.sin(delta), math.cos(delta)
+    sin_lat2 = max(-1.0, min(1.0, sin_lat * cos_delta + cos_lat * sin_delta * math.cos(theta)))
+    lat2 = math.asin(sin_lat2)
+    lon2 = lon + math.atan2(math.sin(theta) * sin_delta * cos_lat, cos_delta - sin_lat * sin_lat2)
+    return math.degrees(lat2), (math.degrees(lon2) + 540) % 360 - 180
+
+
+# ---------- NumPy por lotes (radianes) ----------
+
+def _requiere_numpy():
+    if np is None:
+        raise ImportError("Las funciones *_np de geo requieren NumPy (pip install numpy)")
+
+
+def vectores_np(lat, lon):
+    """Arreglo (n, 3) de vectores unitarios"""
+    _requiere_numpy()
+    cos_lat = np.cos(lat)
+    return np.stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)), axis=-1)
+
+
+def angulo_central_np(lat1, lon1, lat2, lon2, cos_lat2=None):
+    """Ω por lotes; cos_lat2 se puede pasar precalculado (destinos fijos)"""
+    _requiere_numpy()
+    if cos_lat2 is None:
+        cos_lat2 = np.cos(lat2)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * cos_lat2 * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * np.arctan2(np.sqrt(a), np.sqrt(np.maximum(0.0, 1 - a)))
+
+
+def haversine_np(lat1, lon1, lat2, lon2, radio=RADIO_TIERRA, cos_lat2=None):
+    return radio * angulo_central_np(lat1, lon1, lat2, lon2, cos_lat2)
+
+
+def rumbo_np(lat1, lon1, lat2, lon2):
+    """Rumbo inicial por lotes en radianes [0, 2π)"""
+    _requiere_numpy()
+    dlon = lon2 - lon1
+    cos_lat2 = np.cos(lat2)
+    x = np.sin(dlon) * cos_lat2
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * cos_lat2 * np.cos(dlon)
+    return np.mod(np.arctan2(x, y), 2 * np.pi)
+
+
+def slerp_np(p0, p1, omega, sin_omega, t):
+    """Slerp por lotes con las constantes de cada ruta: (lat, lon) en radianes"""
+    _requiere_numpy()
+    cercanos = omega < CERCANOS
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(cercanos, 1.0 - t, np.sin((1.0 - t) * omega) / sin_omega)
+        b = np.where(cercanos, t, np.sin(t * omega) / sin_omega)
+    p = a[:, None] * p0 + b[:, None] * p1
+    return np.arctan2(p[:, 2], np.hypot(p[:, 0], p[:, 1])), np.arctan2(p[:, 1], p[:, 0])
+
+
+def distancia_transversal_np(lat, lon, lat1, lon1, lat2, lon2, radio=RADIO_TIERRA):
+    _requiere_numpy()
+    delta13 = angulo_central_np(lat1, lon1, lat, lon)
+    diferencia = rumbo_np(lat1, lon1, lat, lon) - rumbo_np(lat1, lon1, lat2, lon2)
+    return radio * np.arcsin(np.clip(np.sin(delta13) * np.sin(diferencia), -1.0, 1.0))
+
+
+def punto_destino_np(lat, lon, theta, distancia, radio=RADIO_TIERRA):
+    """Punto de destino por lotes: (lat, lon) en radianes, lon en [-π, π)"""
+    _requiere_numpy()
+    delta = distancia / radio
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_delta, cos_delta = np.sin(delta), np.cos(delta)
+    sin_lat2 = np.clip(sin_lat * cos_delta + cos_lat * sin_delta * np.cos(theta), -1.0, 1.0)
+    lon2 = lon + np.arctan2(np.sin(theta) * sin_delta * cos_lat, cos_delta - sin_lat * sin_lat2)
+    return np.arcsin(sin_lat2), np.mod(lon2 + np.pi, 2 * np.pi) - np.pi
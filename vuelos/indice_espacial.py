@@ -0,0 +1,156 @@
+"""
+ÍNDICE ESPACIAL Y VISTAS DE CLIENTES (M4)
+El mapa ya no manda cada vuelo a todos los navegadores: cada cliente informa
+los límites y el zoom de su mapa Leaflet, y recibe solo los vuelos dentro de
+esa vista (más un margen), con actualizaciones más espaciadas cuanto más
+alejado está el zoom.
+- IndiceEspacial: grilla de celdas de N grados con las posiciones actuales;
+  mover un vuelo es O(1) y consultar una vista recorre solo sus celdas
+- VistaCliente: rectángulo con margen (cruza el antimeridiano si hace falta),
+  intervalo de envío según el zoom, los vuelos que el cliente ya conoce y los
+  cambios sucios del próximo frame (solo posición, progreso y estado)
+"""
+import math
+
+TAMANO_CELDA = 5.0  # grados
+MARGEN = 0.25       # fracción del ancho/alto de la vista agregada a cada lado
+# (zoom mínimo, segundos entre envíos por vuelo); por debajo del último, el último
+INTERVALOS_ZOOM = ((6, 0.0), (4, 0.5), (0, 1.0))
+# Campos que viajan en los frames; el resto llega con nuevo_vuelo/vuelos_iniciales
+CAMPOS_FRAME = ('lat_actual', 'lon_actual', 'progreso', 'rumbo', 'altitud', 'velocidad',
+                'combustible', 'distancia_restante', 'hora_llegada_estimada',
+                'emergencia', 'activo')
+
+
+class IndiceEspacial:
+    """Grilla uniforme lat/lon -> ids de vuelo"""
+
+    def __init__(self, tamano_celda=TAMANO_CELDA):
+        self.tamano_celda = tamano_celda
+        self.columnas = int(math.ceil(360 / tamano_celda))
+        self.celdas = {}     # (fila, columna) -> set de ids
+        self.posiciones = {}  # id -> (lat, lon, celda)
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    def _celda(self, lat, lon):
+        fila = int((min(max(lat, -90.0), 90.0) + 90) // self.tamano_celda)
+        columna = int(((lon + 180) % 360) // self.tamano_celda)
+        return fila, columna
+
+    def mover(self, vuelo_id, lat, lon):
+        celda = self._celda(lat, lon)
+        anterior = self.posiciones.get(vuelo_id)
+        if anterior is None or anterior[2] != celda:
+            if anterior is not None:
+                self._sacar(vuelo_id, anterior[2])
+            self.celdas.setdefault(celda, set()).add(vuelo_id)
+        self.posiciones[vuelo_id] = (lat, lon, celda)
+
+    def _sacar(self, vuelo_id, celda):
+        ids = self.celdas.get(celda)
+        if ids is not None:
+            ids.discard(vuelo_id)
+            if not ids:
+                del self.celdas[celda]
+
+    def quitar(self, vuelo_id):
+        anterior = self.posiciones.pop(vuelo_id, None)
+        if anterior is not None:
+            self._sacar(vuelo_id, anterior[2])
+
+    def limpiar(self):
+        self.celdas = {}
+        self.posiciones = {}
+
+    def consultar(self, vista):
+        """Ids de los vuelos dentro de la vista (rectángulo ya expandido)"""
+        if vista.todo:
+            return set(self.posiciones)
+        fila_min, _ = self._celda(vista.sur, 0)
+        fila_max, _ = self._celda(vista.norte, 0)
+        columnas = int(vista.ancho // self.tamano_celda) + 2
+        _, columna_inicio = self._celda(0, vista.oeste)
+        encontrados = set()
+        for fila in range(fila_min, fila_max + 1):
+            for k in range(min(columnas, self.columnas)):
+                ids = self.celdas.get((fila, (columna_inicio + k) % self.columnas))
+                if ids:
+                    encontrados.update(i for i in ids if vista.contiene(*self.posiciones[i][:2]))
+        return encontrados
+
+
+class VistaCliente:
+    """Región del mapa de un navegador y estado de lo que ya se le envió"""
+
+    def __init__(self):
+        self.visibles = set()  # Vuelos cuyo estado completo tiene el cliente
+        self.pendientes = {}   # id -> cambios acumulados aún no enviados
+        self.fuera = set()     # Vuelos que salieron de la vista desde el último frame
+        self.binario = False   # El cliente decodifica frames binarios (frame_binario.py)
+        self.ultimo_envio = 0.0
+        self.actualizar(-90, -180, 90, 180, None)  # Sin vista informada: todo, sin espaciar
+
+    def actualizar(self, sur, oeste, norte, este, zoom):
+        alto = norte - sur
+        ancho = este - oeste
+        self.sur = max(-90.0, sur - alto * MARGEN)
+        self.norte = min(90.0, norte + alto * MARGEN)
+        self.ancho = ancho * (1 + 2 * MARGEN)
+        self.oeste = ((oeste - ancho * MARGEN) + 180) % 360 - 180
+        self.todo = self.ancho >= 360 and self.sur <= -90 and self.norte >= 90
+        self.zoom = zoom
+        self.intervalo = 0.0
+        if zoom is not None:
+            for zoom_minimo, intervalo in INTERVALOS_ZOOM:
+                if zoom >= zoom_minimo:
+                    self.intervalo = intervalo
+                    break
+            else:
+                self.intervalo = INTERVALOS_ZOOM[-1][1]
+
+    def contiene(self, lat, lon):
+        if self.todo:
+            return True
+        if not self.sur <= lat <= self.norte:
+            return False
+        return self.ancho >= 360 or (lon - self.oeste) % 360 <= self.ancho
+
+    def entra(self, vuelo_id):
+        """El cliente recibe el estado completo del vuelo: nada pendiente de él"""
+        self.visibles.add(vuelo_id)
+        self.pendientes.pop(vuelo_id, None)
+        self.fuera.discard(vuelo_id)
+
+    def sale(self, vuelo_id):
+        self.visibles.discard(vuelo_id)
+        self.pendientes.pop(vuelo_id, None)
+        self.fuera.add(vuelo_id)
+
+    def olvidar(self):
+        self.visibles.clear()
+        self.pendientes.clear()
+        self.fuera.clear()
+
+    def marcar(self, vuelo_id, datos):
+        """Fusiona los campos de frame de un cambio con lo pendiente del vuelo"""
+        pendiente = self.pendientes.get(vuelo_id)
+        if pendiente is None:
+            pendiente = self.pendientes[vuelo_id] = {'id': vuelo_id}
+        for campo in CAMPOS_FRAME:
+            if campo in datos:
+                pendiente[campo] = datos[campo]
+
+    def tomar_frame(self, ahora, periodo):
+        """
+        El frame del cliente si hay algo sucio y ya pasó su intervalo (el
+        mayor entre el período de frames y el de su zoom), o None
+        """
+        if not (self.pendientes or self.fuera) or ahora - self.ultimo_envio < max(periodo, self.intervalo):
+            return None
+        frame = {'vuelos': list(self.pendientes.values()), 'fuera': list(self.fuera)}
+        self.pendientes = {}
+        self.fuera = set()
+        self.ultimo_envio = ahora
+        return frame
@@ -0,0 +1,495 @@
+"""
+LOG SEGMENTADO DE VUELOS (M3)
+Los registros se agregan a un segmento activo (JSONL) que rota al llegar a un
+tamaño fijo. Al sellarse, el segmento se sincroniza y se escribe junto a él su
+índice (id -> offset, parches y agregados de estadísticas); el manifiesto, que
+se reemplaza de forma atómica, lista los segmentos sellados y el activo.
+Al arrancar solo se relee el segmento activo.
+Una compactación en segundo plano fusiona los segmentos sellados por id de
+vuelo (último registro con sus parches integrados) en un segmento nuevo, sin
+tocar el activo ni frenar la ingesta
+"""
+import os
+import json
+import threading
+
+from almacenamiento import Almacenamiento
+from escritor_grupal import EscritorGrupal
+from estadisticas_vuelos import EstadisticasVuelos
+
+# Las actualizaciones de hora de llegada se agregan como parches en vez de
+# reescribir registros; json.dumps conserva el orden, así se reconocen por el prefijo
+PREFIJO_PARCHE = b'{"registro": "parche"'
+
+MANIFIESTO = 'manifiesto.json'
+SUFIJO_TEMPORAL = '.tmp'
+
+
+def campos_parche(parche):
+    return {k: v for k, v in parche.items() if k not in ('registro', 'id')}
+
+
+def sincronizar(ruta):
+    """fsync de un archivo o directorio por su ruta"""
+    fd = os.open(ruta, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def escribir_temporal(ruta, datos):
+    """Escribe y sincroniza el temporal de una ruta sin reemplazarla; devuelve su ruta"""
+    temporal = ruta + SUFIJO_TEMPORAL
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    return temporal
+
+
+def escribir_atomico(ruta, datos):
+    """Escribe a un temporal, lo sincroniza y lo renombra sobre la ruta"""
+    os.replace(escribir_temporal(ruta, datos), ruta)
+    sincronizar(os.path.dirname(ruta))
+
+
+def contenido_indice(indice, parches, estadisticas):
+    """Lo que se persiste como índice de un segmento sellado"""
+    return {'indice': indice, 'parches': parches, 'estadisticas': estadisticas.a_dict()}
+
+
+def indexar_segmento(ruta):
+    """
+    Recorre un segmento y devuelve su índice local: (indice {id: offset del
+    último registro}, parches {id: [(offset, campos)]} posteriores a ese
+    registro, agregados de estadísticas)
+    """
+    indice = {}
+    parches = {}
+    estadisticas = EstadisticasVuelos()
+    offset = 0
+    with open(ruta, 'rb') as f:
+        for linea in f:
+            actual = offset
+            offset += len(linea)
+            if not linea.strip():
+                continue
+            try:
+                if linea.startswith(PREFIJO_PARCHE):
+                    parche = json.loads(linea)
+                    parches.setdefault(parche['id'], []).append((actual, campos_parche(parche)))
+                else:
+                    vuelo = json.loads(linea)
+                    indice[vuelo.get('id')] = actual
+                    parches.pop(vuelo.get('id'), None)
+                    estadisticas.agregar(vuelo)
+            except Exception:
+                pass  # Línea incompleta (p. ej. cortada por una caída)
+    return indice, parches, estadisticas
+
+
+class SegmentoActivo:
+    """Segmento abierto para escritura con su índice local (se persiste al sellarlo)"""
+
+    def __init__(self, numero, ruta, escritor, indice=None, parches=None, estadisticas=None):
+        self.numero = numero
+        self.ruta = ruta
+        self.escritor = escritor
+        self.indice = indice or {}
+        self.parches = parches or {}
+        self.estadisticas = estadisticas or EstadisticasVuelos()
+
+
+class LogSegmentado(Almacenamiento):
+    """Almacén de registros de vuelo en segmentos JSONL con manifiesto e índice en memoria"""
+
+    def __init__(self, directorio, tamano_segmento=64 * 2 ** 20, compactar_segmentos=4,
+                 crear_escritor=EscritorGrupal.desde_entorno, importar=None):
+        self.directorio = directorio
+        self.ubicacion = directorio
+        self.tamano_segmento = tamano_segmento
+        self.compactar_segmentos = max(2, compactar_segmentos)
+        self.crear_escritor = crear_escritor
+        self.lock = threading.Lock()
+        self.compactando = threading.Lock()
+        self.generacion = 0  # Cambia con cada reinicio (invalida compactaciones en curso)
+        # Estado global: ubicaciones (segmento, offset)
+        self.indice = {}   # id -> (segmento, offset) del último registro completo
+        self.parches = {}  # id -> [(segmento, offset, campos)] posteriores a ese registro
+        self.estadisticas = EstadisticasVuelos()
+        self.sellados = []  # Números de segmento sellados, del más viejo al más nuevo
+        self.sellando = {}  # número -> SegmentoActivo ya rotado cuyo cierre sigue en curso
+        self.siguiente = 1
+        self.activo = None
+        self.metricas_cerradas = {'registros': 0, 'lotes': 0, 'fsyncs': 0}
+        os.makedirs(directorio, exist_ok=True)
+        self.abrir(importar)
+
+    @classmethod
+    def desde_entorno(cls, directorio, importar=None):
+        """Configura el tamaño de segmento y el umbral de compactación por entorno"""
+        return cls(
+            directorio,
+            tamano_segmento=int(float(os.getenv('TAMANO_SEGMENTO_MB', '64')) * 2 ** 20),
+            compactar_segmentos=int(os.getenv('COMPACTAR_SEGMENTOS', '4')),
+            importar=importar,
+        )
+
+    # ---------- Archivos ----------
+
+    def ruta_segmento(self, numero):
+        return os.path.join(self.directorio, f'segmento_{numero:06d}.jsonl')
+
+    def ruta_indice(self, numero):
+        return os.path.join(self.directorio, f'segmento_{numero:06d}.indice.json')
+
+    def guardar_manifiesto(self):
+        escribir_atomico(os.path.join(self.directorio, MANIFIESTO), {
+            'sellados': self.sellados,
+            'activo': self.activo.numero,
+            'siguiente': self.siguiente,
+        })
+
+    def abrir(self, importar=None):
+        """
+        Carga el manifiesto y los índices sellados; solo relee el segmento activo.
+        importar: archivo JSONL de un solo archivo (formato anterior) que se adopta
+        como segmento activo si todavía no hay manifiesto
+        """
+        ruta_manifiesto = os.path.join(self.directorio, MANIFIESTO)
+        activo = None
+        if os.path.exists(ruta_manifiesto):
+            with open(ruta_manifiesto, 'r', encoding='utf-8') as f:
+                manifiesto = json.load(f)
+            self.sellados = manifiesto['sellados']
+            activo = manifiesto['activo']
+            self.siguiente = manifiesto['siguiente']
+        elif importar and os.path.exists(importar):
+            activo = self.nuevo_numero()
+            os.replace(importar, self.ruta_segmento(activo))
+        self.limpiar_huerfanos(activo)
+
+        for numero in self.sellados:
+            indice, parches, estadisticas = self.cargar_indice(numero)
+            self.combinar(numero, indice, parches)
+            self.estadisticas.combinar(estadisticas)
+
+        if activo is None:
+            self.abrir_activo(self.nuevo_numero())
+            self.guardar_manifiesto()
+            return
+        ruta = self.ruta_segmento(activo)
+        self.recortar_linea_incompleta(ruta)
+        indice, parches, estadisticas = indexar_segmento(ruta)
+        self.combinar(activo, indice, parches)
+        self.estadisticas.combinar(estadisticas.a_dict())
+        self.activo = SegmentoActivo(activo, ruta, self.crear_escritor(ruta), indice, parches, estadisticas)
+        self.guardar_manifiesto()
+
+    def limpiar_huerfanos(self, activo):
+        """Borra temporales y segmentos que el manifiesto no menciona (p. ej. tras una caída)"""
+        conocidos = set(self.sellados) | {activo}
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(SUFIJO_TEMPORAL):
+                os.remove(os.path.join(self.directorio, nombre))
+            elif nombre.startswith('segmento_'):
+                try:
+                    numero = int(nombre[len('segmento_'):].split('.')[0])
+                except ValueError:
+                    continue
+                if numero not in conocidos:
+                    os.remove(os.path.join(self.directorio, nombre))
+
+    @staticmethod
+    def recortar_linea_incompleta(ruta):
+        """Descarta una última línea a medio escribir para no pegarle la siguiente"""
+        if not os.path.exists(ruta):
+            return
+        with open(ruta, 'rb+') as f:
+            tamano = f.seek(0, os.SEEK_END)
+            if tamano == 0:
+                return
+            f.seek(tamano - 1)
+            if f.read(1) == b'\n':
+                return
+            bloque = min(tamano, 1 << 20)
+            while True:
+                f.seek(tamano - bloque)
+                fin = f.read(bloque).rfind(b'\n')
+                if fin != -1 or bloque == tamano:
+                    break
+                bloque = min(tamano, bloque * 2)
+            f.truncate(tamano - bloque + fin + 1 if fin != -1 else 0)
+
+    def cargar_indice(self, numero):
+        """
+        Índice persistido de un segmento sellado (se reconstruye si falta):
+        (indice, parches, agregados de estadísticas como dict)
+        """
+        try:
+            with open(self.ruta_indice(numero), 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            indice, parches, estadisticas = indexar_segmento(self.ruta_segmento(numero))
+            self.guardar_indice(numero, indice, parches, estadisticas)
+            return indice, parches, estadisticas.a_dict()
+        parches = {vuelo_id: [tuple(p) for p in lista] for vuelo_id, lista in datos['parches'].items()}
+        return datos['indice'], parches, datos['estadisticas']
+
+    def guardar_indice(self, numero, indice, parches, estadisticas):
+        escribir_atomico(self.ruta_indice(numero), contenido_indice(indice, parches, estadisticas))
+
+    def combinar(self, numero, indice, parches):
+        """Agrega el índice local de un segmento (en orden) al índice global"""
+        for vuelo_id, offset in indice.items():
+            self.indice[vuelo_id] = (numero, offset)
+            self.parches.pop(vuelo_id, None)
+        for vuelo_id, lista in parches.items():
+            self.parches.setdefault(vuelo_id, []).extend((numero, o, c) for o, c in lista)
+
+    def nuevo_numero(self):
+        numero = self.siguiente
+        self.siguiente += 1
+        return numero
+
+    def abrir_activo(self, numero):
+        ruta = self.ruta_segmento(numero)
+        self.activo = SegmentoActivo(numero, ruta, self.crear_escritor(ruta))
+
+    # ---------- Escritura ----------
+
+    def __len__(self):
+        return self.estadisticas.total_vuelos
+
+    def guardar(self, registro):
+        """Agrega un registro completo de vuelo al segmento activo"""
+        linea = (json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8')
+        vuelo_id = registro['id']
+        with self.lock:
+            activo = self.activo
+            offset = activo.escritor.escribir(linea)
+            # Los parches anteriores ya no aplican al registro nuevo
+            self.indice[vuelo_id] = (activo.numero, offset)
+            self.parches.pop(vuelo_id, None)
+            activo.indice[vuelo_id] = offset
+            activo.parches.pop(vuelo_id, None)
+            self.estadisticas.agregar(registro)
+            activo.estadisticas.agregar(registro)
+            rotado = self._rotar_si_toca()
+        if rotado:
+            self._sellar(*rotado)
+
+    def agregar_parche(self, vuelo_id, campos):
+        """Agrega un parche de campos para un vuelo existente; False si el vuelo no existe"""
+        linea = (json.dumps({'registro': 'parche', 'id': vuelo_id, **campos}, ensure_ascii=False) + '\n').encode('utf-8')
+        with self.lock:
+            if vuelo_id not in self.indice:
+                return False
+            activo = self.activo
+            offset = activo.escritor.escribir(linea)
+            self.parches.setdefault(vuelo_id, []).append((activo.numero, offset, campos))
+            activo.parches.setdefault(vuelo_id, []).append((offset, campos))
+            rotado = self._rotar_si_toca()
+        if rotado:
+            self._sellar(*rotado)
+        return True
+
+    def _rotar_si_toca(self):
+        """
+        Si el segmento activo llegó al tamaño, abre uno nuevo y lo anota en el
+        manifiesto (con self.lock tomado). Devuelve (segmento, generación) para
+        sellarlo con _sellar() después de soltar el lock, o None
+        """
+        if self.activo.escritor.tamano < self.tamano_segmento:
+            return None
+        activo = self.activo
+        # Queda como sellado en el manifiesto: si hay una caída antes de escribir
+        # su índice, cargar_indice() lo reconstruye recorriendo el segmento
+        self.sellados.append(activo.numero)
+        self.sellando[activo.numero] = activo
+        self.abrir_activo(self.nuevo_numero())
+        self.guardar_manifiesto()
+        return activo, self.generacion
+
+    def _sellar(self, activo, generacion):
+        """Cierra un segmento ya rotado y escribe su índice, sin frenar la ingesta"""
+        temporal = None
+        try:
+            # 1) Todo el segmento en disco, aunque FSYNC_MODO sea 'so'
+            activo.escritor.cerrar()
+            sincronizar(activo.ruta)
+            # 2) Su índice junto a él; se publica solo si la base no se reinició
+            temporal = escribir_temporal(self.ruta_indice(activo.numero),
+                                         contenido_indice(activo.indice, activo.parches, activo.estadisticas))
+            with self.lock:
+                self.sellando.pop(activo.numero, None)
+                if generacion != self.generacion:
+                    return
+                os.replace(temporal, self.ruta_indice(activo.numero))
+                temporal = None
+                for clave, valor in activo.escritor.metricas().items():
+                    if clave in self.metricas_cerradas:
+                        self.metricas_cerradas[clave] += valor
+                compactar = len(self.sellados) - len(self.sellando) >= self.compactar_segmentos
+            sincronizar(self.directorio)
+            if compactar and not self.compactando.locked():
+                threading.Thread(target=self.compactar, daemon=True).start()
+        except Exception as e:
+            if generacion == self.generacion:  # Si no, reiniciar() ya borró el segmento
+                print(f"❌ Error sellando segmento {activo.numero}: {e}")
+        finally:
+            if temporal and os.path.exists(temporal):
+                os.remove(temporal)
+
+    # ---------- Lectura ----------
+
+    def obtener(self, vuelo_id):
+        """Estado actual de un vuelo: su último registro más los parches posteriores"""
+        with self.lock:
+            ubicacion = self.indice.get(vuelo_id)
+            if ubicacion is None:
+                return None
+            numero, offset = ubicacion
+            campos = [c for _, _, c in self.parches.get(vuelo_id, ())]
+            if numero == self.activo.numero:
+                self.activo.escritor.vaciar()
+            elif numero in self.sellando:
+                self.sellando[numero].escritor.vaciar()
+            with open(self.ruta_segmento(numero), 'rb') as f:
+                f.seek(offset)
+                vuelo = json.loads(f.readline())
+        for c in campos:
+            vuelo.update(c)
+        return vuelo
+
+    def resumen_estadisticas(self):
+        with self.lock:
+            return self.estadisticas.resumen()
+
+    def metricas(self):
+        """Métricas de escritura acumuladas de todos los segmentos escritos"""
+        with self.lock:
+            metricas = self.activo.escritor.metricas()
+            for clave, valor in self.metricas_cerradas.items():
+                metricas[clave] += valor
+            metricas['segmentos'] = len(self.sellados) + 1
+            return metricas
+
+    # ---------- Compactación ----------
+
+    def compactar(self):
+        """
+        Fusiona todos los segmentos sellados en uno nuevo con el último registro
+        de cada vuelo y sus parches integrados. Los sellados no cambian, así que
+        se leen sin frenar la ingesta; al final se reemplazan en el manifiesto
+        """
+        if not self.compactando.acquire(blocking=False):
+            return
+        temporal = temporal_indice = None
+        try:
+            with self.lock:
+                # Los que aún se están sellando no tienen el índice persistido
+                entrada = [s for s in self.sellados if s not in self.sellando]
+                generacion = self.generacion
+                if len(entrada) < 2:
+                    return
+                numero = self.nuevo_numero()
+
+            # Último registro de cada vuelo dentro de la entrada y parches posteriores,
+            # a partir de los índices persistidos (sin recorrer los segmentos)
+            ultimos = {}
+            parches = {}
+            estadisticas = EstadisticasVuelos()
+            for segmento in entrada:
+                indice, parches_segmento, agregados = self.cargar_indice(segmento)
+                for vuelo_id, offset in indice.items():
+                    ultimos[vuelo_id] = (segmento, offset)
+                    parches.pop(vuelo_id, None)
+                for vuelo_id, lista in parches_segmento.items():
+                    parches.setdefault(vuelo_id, []).extend(c for _, c in lista)
+                estadisticas.combinar(agregados)
+
+            # Se copian en el orden original; solo se reserializan los que tienen parches
+            por_segmento = {}
+            for vuelo_id, (segmento, offset) in ultimos.items():
+                por_segmento.setdefault(segmento, []).append((offset, vuelo_id))
+            nuevo_indice = {}
+            temporal = self.ruta_segmento(numero) + SUFIJO_TEMPORAL
+            with open(temporal, 'wb') as salida:
+                for segmento in entrada:
+                    with open(self.ruta_segmento(segmento), 'rb') as f:
+                        for offset, vuelo_id in sorted(por_segmento.get(segmento, ())):
+                            f.seek(offset)
+                            linea = f.readline()
+                            if parches.get(vuelo_id):
+                                vuelo = json.loads(linea)
+                                for c in parches[vuelo_id]:
+                                    vuelo.update(c)
+                                linea = (json.dumps(vuelo, ensure_ascii=False) + '\n').encode('utf-8')
+                            nuevo_indice[vuelo_id] = salida.tell()
+                            salida.write(linea)
+                salida.flush()
+                os.fsync(salida.fileno())
+            temporal_indice = escribir_temporal(self.ruta_indice(numero),
+                                                contenido_indice(nuevo_indice, {}, estadisticas))
+
+            with self.lock:
+                # Antes de publicar nada: si la base se reinició, los temporales se descartan
+                if generacion != self.generacion:
+                    return
+                os.replace(temporal_indice, self.ruta_indice(numero))
+                temporal_indice = None
+                os.replace(temporal, self.ruta_segmento(numero))
+                temporal = None
+                sincronizar(self.directorio)
+                fusionados = set(entrada)
+                self.sellados = [numero] + [s for s in self.sellados if s not in fusionados]
+                self.guardar_manifiesto()
+                for vuelo_id, (segmento, _) in list(self.indice.items()):
+                    if segmento in fusionados:
+                        self.indice[vuelo_id] = (numero, nuevo_indice[vuelo_id])
+                for vuelo_id in list(self.parches):
+                    lista = [p for p in self.parches[vuelo_id] if p[0] not in fusionados]
+                    if lista:
+                        self.parches[vuelo_id] = lista
+                    else:
+                        del self.parches[vuelo_id]
+            for segmento in entrada:
+                os.remove(self.ruta_segmento(segmento))
+                os.remove(self.ruta_indice(segmento))
+            print(f"🧹 Compactación: {len(entrada)} segmentos → 1 ({len(nuevo_indice)} vuelos)")
+        except Exception as e:
+            print(f"❌ Error en compactación: {e}")
+        finally:
+            for ruta in (temporal, temporal_indice):
+                if ruta and os.path.exists(ruta):
+                    os.remove(ruta)
+            self.compactando.release()
+
+    # ---------- Ciclo de vida ----------
+
+    def reiniciar(self):
+        """Borra todos los segmentos y empieza un log vacío"""
+        with self.lock:
+            # Lo que aún estaba en cola pertenece al estado anterior y se descarta
+            with self.activo.escritor.pausado(descartar=True):
+                pass
+            self.activo.escritor.cerrar()
+            for numero in self.sellados + [self.activo.numero]:
+                for ruta in (self.ruta_segmento(numero), self.ruta_indice(numero)):
+                    if os.path.exists(ruta):
+                        os.remove(ruta)
+            self.sellados = []
+            self.sellando = {}  # Sus _sellar() en curso ven la generación nueva y no publican nada
+            self.indice = {}
+            self.parches = {}
+            self.estadisticas.reiniciar()
+            self.generacion += 1
+            self.abrir_activo(self.nuevo_numero())
+            self.guardar_manifiesto()
+
+    def cerrar(self):
+        # Espera una compactación en curso (y evita que empiece otra): borra archivos al terminar
+        with self.compactando, self.lock:
+            self.activo.escritor.cerrar()
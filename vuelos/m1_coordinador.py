@@ -6,14 +6,24 @@ import socket
 import threading
 import json
 import time
+import os
+import sys
 from datetime import datetime
 
+import protocolo
+from cola_salida import ColaSalida, NUNCA_DESCARTAR, politica_de
+from protocolo import FORMATO_JSON, Decodificador, elegir_formato
+
+# Tema comodín: los clientes que no declaran temas en el handshake reciben todo
+TODOS_LOS_TEMAS = '*'
+
 class Coordinador:
     def __init__(self, host='0.0.0.0', port=5555):
         self.host = host
         self.port = port
         self.clientes = {}
         self.clientes_activos = []
+        self.suscriptores = {}  # tema -> nombres de clientes suscritos
         self.lock = threading.Lock()
         self.round_robin_index = 0
         self.running = True
@@ -24,6 +34,8 @@ class Coordinador:
         self.mensajes_por_segundo = 0
         self.ultimo_conteo = time.time()
         self.buffer_db = []
+        # Cada cliente tiene una cola de salida acotada drenada por su propio escritor
+        self.COLA_SALIDA_MAX = int(os.getenv('COLA_SALIDA_MAX', '1000'))
 
     def iniciar(self):
         """Inicia el servidor coordinador"""
@@ -63,80 +75,124 @@ class Coordinador:
     def manejar_cliente(self, cliente_socket, direccion):
         """Maneja la comunicación con un cliente conectado"""
         nombre_cliente = None
+        cola = None
         
         try:
             data = cliente_socket.recv(1024).decode('utf-8')
             info = json.loads(data)
             nombre_cliente = info.get('nombre', f'cliente_{direccion[1]}')
             tipo = info.get('tipo', 'desconocido')
+            formato = elegir_formato(info.get('formatos'))
             
-            with self.lock:
-                self.clientes[nombre_cliente] = {
-                    'socket': cliente_socket,
-                    'tipo': tipo,
-                    'direccion': direccion,
-                    'conectado_desde': datetime.now().isoformat()
-                }
-                self.clientes_activos.append(nombre_cliente)
-            
-            print(f"🔗 [{nombre_cliente}] registrado como '{tipo}'")
-            
-            respuesta = {
-                'status': 'OK',
-                'mensaje': f'Bienvenido {nombre_cliente}',
-                'timestamp': time.time()
-            }
-            cliente_socket.send((json.dumps(respuesta) + '\n').encode('utf-8'))
-            try:
-                cliente_socket.send((json.dumps({'tipo': 'reset_estado'}) + '\n').encode('utf-8'))
-            except:
-                pass
-            if tipo == 'simulador':
-                try:
-                    self.broadcast({'tipo': 'simulador_online'})
-                except:
-                    pass
-            if tipo == 'visualizador':
-                try:
-                    self.enviar_a_modulo('m2_simulador', {'tipo': 'comando', 'accion': 'resync'})
-                except:
-                    pass
+            cola = ColaSalida(self.COLA_SALIDA_MAX)
+            self.registrar_cliente(nombre_cliente, tipo, direccion, cliente_socket, cola,
+                                   info.get('temas'), formato)
+            threading.Thread(
+                target=self.escritor_cliente,
+                args=(nombre_cliente, cliente_socket, cola, formato),
+                daemon=True
+            ).start()
+            self.anunciar_cliente(nombre_cliente, tipo)
             
-            buffer = ""
+            decodificador = Decodificador(formato)
             while self.running:
-                data = cliente_socket.recv(8192)
-                if not data:
+                mensajes = decodificador.leer(cliente_socket)
+                if mensajes is None:
                     break
                 
-                buffer += data.decode('utf-8')
-                
-                # Procesar todos los mensajes completos en el buffer
-                while '\n' in buffer:
-                    linea, buffer = buffer.split('\n', 1)
-                    if linea.strip():
-                        try:
-                            mensaje = json.loads(linea)
-                            self.mensajes_recibidos += 1
-                            self.procesar_mensaje(nombre_cliente, mensaje)
-                        except json.JSONDecodeError:
-                            print(f"⚠️  JSON inválido de {nombre_cliente}: {linea[:100]}")
+                # Procesar todos los mensajes completos recibidos
+                for mensaje, crudo in mensajes:
+                    self.mensajes_recibidos += 1
+                    # Los bytes originales se reenvían tal cual si el mensaje no se modifica
+                    self.procesar_mensaje(nombre_cliente, mensaje, {formato: crudo})
                     
         except Exception as e:
             print(f"❌ Error con {nombre_cliente}: {e}")
         finally:
-            self.desconectar_cliente(nombre_cliente)
+            self.desconectar_cliente(nombre_cliente, cola)
+    
+    def registrar_cliente(self, nombre_cliente, tipo, direccion, conexion, cola, temas=None,
+                          formato=FORMATO_JSON):
+        """
+        Registra un cliente con su cola de salida.
+        temas: tipos de mensaje de broadcast que consume (None = todos)
+        formato: formato de mensajes negociado en el handshake
+        """
+        # La confirmación (siempre JSON) y el reset van primero en la cola, antes que cualquier broadcast
+        cola.poner(self.codificar({
+            'status': 'OK',
+            'mensaje': f'Bienvenido {nombre_cliente}',
+            'formato': formato,
+            'timestamp': time.time()
+        }))
+        cola.poner(self.codificar({'tipo': 'reset_estado'}, formato))
+        
+        with self.lock:
+            anterior = self.clientes.get(nombre_cliente)
+            if anterior:
+                # Reconexión con el mismo nombre: la conexión vieja se cierra (su lector
+                # termina y, al no ser ya su cola, no toca este registro)
+                anterior['cola'].cerrar()
+                self.cerrar_conexion(anterior['socket'])
+                self._quitar_suscripciones(nombre_cliente)
+            self.clientes[nombre_cliente] = {
+                'socket': conexion,
+                'tipo': tipo,
+                'direccion': direccion,
+                'conectado_desde': datetime.now().isoformat(),
+                'cola': cola,
+                'temas': temas,
+                'formato': formato
+            }
+            if nombre_cliente not in self.clientes_activos:
+                self.clientes_activos.append(nombre_cliente)
+            for tema in (temas if temas is not None else [TODOS_LOS_TEMAS]):
+                self.suscriptores.setdefault(tema, set()).add(nombre_cliente)
+        
+        print(f"🔗 [{nombre_cliente}] registrado como '{tipo}' ({formato})"
+              f" | temas: {', '.join(temas) if temas is not None else 'todos'}")
+    
+    def _quitar_suscripciones(self, nombre_cliente):
+        """Quita al cliente de todos los temas (llamar con self.lock tomado)"""
+        for nombres in self.suscriptores.values():
+            nombres.discard(nombre_cliente)
+    
+    def anunciar_cliente(self, nombre_cliente, tipo):
+        """Avisa a los demás módulos de la llegada de un cliente"""
+        if tipo == 'simulador':
+            try:
+                self.broadcast({'tipo': 'simulador_online'})
+            except:
+                pass
+        if tipo in ('visualizador', 'base_datos'):
+            # Los vuelo_update son deltas: quien se une tarde necesita el estado completo
+            try:
+                self.enviar_a_modulo('m2_simulador', {'tipo': 'comando', 'accion': 'resync'})
+            except:
+                pass
     
-    def procesar_mensaje(self, origen, mensaje):
-        """Procesa y enruta mensajes según el tipo"""
+    def procesar_mensaje(self, origen, mensaje, crudo=None):
+        """
+        Procesa y enruta mensajes según el tipo.
+        crudo: {formato: bytes originales del mensaje (memoryview del lector)};
+        los que se reenvían sin cambios no se vuelven a serializar para los
+        clientes de ese formato
+        """
         tipo = mensaje.get('tipo')
         
         if tipo == 'vuelo_update':
             if 'vuelos_activos' in mensaje:
                 self.vuelos_activos = mensaje['vuelos_activos']
-            self.broadcast(mensaje, excluir=origen)
+            self.broadcast(mensaje, excluir=origen, crudo=crudo)
+            
+        elif tipo == 'frame':
+            # Todos los vuelo_update de un tick del simulador en un solo mensaje
+            if 'vuelos_activos' in mensaje:
+                self.vuelos_activos = mensaje['vuelos_activos']
+            self.broadcast(mensaje, excluir=origen, crudo=crudo)
             
         elif tipo == 'vuelo_nuevo':
-            self.broadcast(mensaje, excluir=origen)
+            self.broadcast(mensaje, excluir=origen, crudo=crudo)
             # También guardar en BD cuando despega
             self.enviar_a_modulo('m3_base_datos', {
                 'tipo': 'guardar_vuelo',
@@ -147,11 +203,11 @@ class Coordinador:
             self.ejecutar_comando(mensaje)
             
         elif tipo == 'guardar_vuelo':
-            self.enviar_a_modulo('m3_base_datos', mensaje)
+            self.enviar_a_modulo('m3_base_datos', mensaje, crudo)
             
         elif tipo == 'vuelo_completado':
-            self.enviar_a_modulo('m3_base_datos', mensaje)
-            self.broadcast(mensaje, excluir=origen)
+            self.enviar_a_modulo('m3_base_datos', mensaje, crudo)
+            self.broadcast(mensaje, excluir=origen, crudo=crudo)
             
         elif tipo == 'ping':
             self.enviar_a_modulo(origen, {'tipo': 'pong', 'timestamp': time.time()})
@@ -159,52 +215,105 @@ class Coordinador:
         elif tipo == 'comando_atc':
             # Reenviar comando ATC al simulador
             print(f"🎮 Comando ATC recibido para {mensaje.get('vuelo_id')}: {mensaje.get('accion')}")
-            self.enviar_a_modulo('m2_simulador', mensaje)
+            self.enviar_a_modulo('m2_simulador', mensaje, crudo)
         
         elif tipo == 'crear_vuelo_manual':
-            self.enviar_a_modulo('m2_simulador', mensaje)
+            self.enviar_a_modulo('m2_simulador', mensaje, crudo)
             
         elif tipo == 'solicitar_estadisticas':
             # Reenviar solicitud a base de datos
             self.enviar_a_modulo('m3_base_datos', {'tipo': 'obtener_estadisticas', 'origen': origen})
             
         elif tipo == 'estadisticas':
-            # Reenviar respuesta de estadísticas al solicitante (mapa)
-            self.enviar_a_modulo('m4_mapa', mensaje)
+            # Reenviar respuesta de estadísticas a quien las consume (mapa)
+            self.broadcast(mensaje, excluir=origen, crudo=crudo)
+    
+    def codificar(self, mensaje, formato=FORMATO_JSON):
+        """Serializa un mensaje en el formato de un cliente"""
+        return protocolo.codificar(mensaje, formato)
     
-    def broadcast(self, mensaje, excluir=None):
-        """Envía mensaje a todos los clientes activos"""
+    def broadcast(self, mensaje, excluir=None, crudo=None):
+        """
+        Envía el mensaje a los clientes suscritos a su tipo y a los que no
+        declararon temas (serializado a lo sumo una vez por formato)
+        """
+        tipo = mensaje.get('tipo')
         with self.lock:
-            clientes = list(self.clientes_activos)
+            destinos = [
+                (self.clientes[nombre]['cola'], self.clientes[nombre]['formato'])
+                for grupo in (self.suscriptores.get(tipo, ()), self.suscriptores.get(TODOS_LOS_TEMAS, ()))
+                for nombre in grupo
+                if nombre != excluir and nombre in self.clientes
+            ]
+        if not destinos:
+            return
         
-        for nombre in clientes:
-            if nombre != excluir:
-                self.enviar_a_modulo(nombre, mensaje)
+        # bytes() copia el memoryview del lector una sola vez, antes de la siguiente lectura
+        codificados = {formato: bytes(datos) for formato, datos in crudo.items()} if crudo else {}
+        for cola, formato in destinos:
+            datos = codificados.get(formato)
+            if datos is None:
+                datos = codificados[formato] = self.codificar(mensaje, formato)
+            cola.poner(datos, tipo)
     
-    def enviar_a_modulo(self, nombre_modulo, mensaje):
-        """Envía mensaje a un módulo específico"""
+    def enviar_a_modulo(self, nombre_modulo, mensaje, crudo=None):
+        """Encola un mensaje para un módulo específico (lo envía su escritor)"""
+        with self.lock:
+            if nombre_modulo not in self.clientes:
+                return False
+            cola = self.clientes[nombre_modulo]['cola']
+            formato = self.clientes[nombre_modulo]['formato']
+        
+        datos = crudo.get(formato) if crudo else None
+        if datos is None:
+            datos = self.codificar(mensaje, formato)
+        else:
+            datos = bytes(datos)
+        # Si la cola está llena, la política del tipo de mensaje decide qué se descarta
+        cola.poner(datos, mensaje.get('tipo'))
+        return True
+    
+    def escritor_cliente(self, nombre_cliente, cliente_socket, cola, formato=FORMATO_JSON):
+        """Drena la cola de salida de un cliente hacia su socket"""
+        datos = None
+        confirmacion = True  # Lo primero en la cola es la confirmación del handshake
         try:
-            with self.lock:
-                if nombre_modulo not in self.clientes:
-                    return False
-                
-                cliente_socket = self.clientes[nombre_modulo]['socket']
-            
-            data = (json.dumps(mensaje) + '\n').encode('utf-8')
-            cliente_socket.send(data)
-            self.mensajes_enviados += 1
-            return True
-            
+            while self.running:
+                datos = cola.sacar(timeout=1.0)
+                if datos is None:
+                    if cola.cerrada:
+                        break
+                    continue
+                cliente_socket.sendall(datos)
+                self.mensajes_enviados += 1
+                datos = None
+                confirmacion = False
         except Exception as e:
-            print(f"❌ Error enviando a {nombre_modulo}: {e}")
-            self.desconectar_cliente(nombre_modulo)
-            if nombre_modulo == 'm3_base_datos':
-                try:
-                    self.buffer_db.append(mensaje)
-                    self.enviar_a_modulo('m4_mapa', {'tipo': 'guardar_vuelo_backup', 'payload': mensaje})
-                except:
-                    pass
-            return False
+            print(f"❌ Error enviando a {nombre_cliente}: {e}")
+            self.desconectar_cliente(nombre_cliente, cola)
+            pendientes = ([datos] if datos is not None else []) + cola.vaciar()
+            if confirmacion:
+                # La confirmación va en JSON aunque se haya negociado msgpack: no es un mensaje a respaldar
+                pendientes = pendientes[1:]
+            self.respaldar_pendientes(nombre_cliente, pendientes, formato)
+    
+    def respaldar_pendientes(self, nombre_cliente, pendientes, formato=FORMATO_JSON):
+        """
+        Lo que no llegó a la BD se guarda para reenviarlo y como respaldo en M4.
+        Cada pendiente es un mensaje codificado en el formato del cliente; se
+        decodifican por separado para que uno ilegible no arrastre a los demás
+        """
+        if nombre_cliente != 'm3_base_datos':
+            return
+        for datos in pendientes:
+            mensajes = Decodificador(formato, tamano=len(datos)).alimentar(datos)
+            if not mensajes:
+                print(f"⚠️  Pendiente para {nombre_cliente} no decodificable ({len(datos)} bytes), no se respalda")
+            for pendiente, _ in mensajes:
+                if politica_de(pendiente.get('tipo')) != NUNCA_DESCARTAR:
+                    continue
+                self.buffer_db.append(pendiente)
+                self.enviar_a_modulo('m4_mapa', {'tipo': 'guardar_vuelo_backup', 'payload': pendiente})
     
     def ejecutar_comando(self, mensaje):
         """Ejecuta comandos del panel de control"""
@@ -223,18 +332,31 @@ class Coordinador:
                 'max_vuelos': max_vuelos
             })
     
-    def desconectar_cliente(self, nombre_cliente):
-        """Desconecta y limpia recursos de un cliente"""
+    def cerrar_conexion(self, conexion):
+        """Cierra el socket de un cliente (el shutdown despierta a su lector bloqueado en recv)"""
+        try:
+            conexion.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        conexion.close()
+    
+    def desconectar_cliente(self, nombre_cliente, cola):
+        """
+        Desconecta y limpia recursos de un cliente.
+        cola: la de la conexión que termina; si el nombre ya se registró con
+        otra conexión (reconexión), el registro nuevo no se toca
+        """
         if not nombre_cliente:
             return
             
         with self.lock:
-            if nombre_cliente in self.clientes:
-                try:
-                    self.clientes[nombre_cliente]['socket'].close()
-                except:
-                    pass
-                del self.clientes[nombre_cliente]
+            cliente = self.clientes.get(nombre_cliente)
+            if cliente is None or cliente['cola'] is not cola:
+                return
+            cola.cerrar()
+            self.cerrar_conexion(cliente['socket'])
+            del self.clientes[nombre_cliente]
+            self._quitar_suscripciones(nombre_cliente)
             
             if nombre_cliente in self.clientes_activos:
                 self.clientes_activos.remove(nombre_cliente)
@@ -250,44 +372,60 @@ class Coordinador:
         """Monitorea y reporta el estado del sistema"""
         while self.running:
             time.sleep(30)
+            self.reportar_estado()
+    
+    def reportar_estado(self):
+        """Imprime el estado del sistema y reintenta los envíos pendientes a la BD"""
+        ahora = time.time()
+        tiempo_transcurrido = ahora - self.ultimo_conteo
+        if tiempo_transcurrido > 0:
+            self.mensajes_por_segundo = (self.mensajes_enviados + self.mensajes_recibidos) / tiempo_transcurrido
+        
+        with self.lock:
+            print(f"\n📊 ESTADO DEL SISTEMA")
+            print(f"   Clientes activos: {len(self.clientes_activos)}")
+            print(f"   Vuelos activos: {self.vuelos_activos}")
+            print(f"   Mensajes enviados: {self.mensajes_enviados}")
+            print(f"   Mensajes recibidos: {self.mensajes_recibidos}")
+            print(f"   Mensajes/segundo: {self.mensajes_por_segundo:.2f}")
             
-            ahora = time.time()
-            tiempo_transcurrido = ahora - self.ultimo_conteo
-            if tiempo_transcurrido > 0:
-                self.mensajes_por_segundo = (self.mensajes_enviados + self.mensajes_recibidos) / tiempo_transcurrido
-            
-            with self.lock:
-                print(f"\n📊 ESTADO DEL SISTEMA")
-                print(f"   Clientes activos: {len(self.clientes_activos)}")
-                print(f"   Vuelos activos: {self.vuelos_activos}")
-                print(f"   Mensajes enviados: {self.mensajes_enviados}")
-                print(f"   Mensajes recibidos: {self.mensajes_recibidos}")
-                print(f"   Mensajes/segundo: {self.mensajes_por_segundo:.2f}")
-                
-                if self.clientes_activos:
-                    print(f"   Módulos conectados:")
-                    for nombre in self.clientes_activos:
-                        tipo = self.clientes[nombre]['tipo']
-                        print(f"     • {nombre} ({tipo})")
-                print("="*60)
-            
-            try:
-                if 'm3_base_datos' in self.clientes and self.buffer_db:
-                    pendientes = list(self.buffer_db)
-                    self.buffer_db = []
-                    for msg in pendientes:
-                        ok = self.enviar_a_modulo('m3_base_datos', msg)
-                        if not ok:
-                            self.buffer_db.append(msg)
-                            break
-            except:
-                pass
-            self.mensajes_enviados = 0
-            self.mensajes_recibidos = 0
-            self.ultimo_conteo = ahora
+            if self.clientes_activos:
+                print(f"   Módulos conectados:")
+                for nombre in self.clientes_activos:
+                    tipo = self.clientes[nombre]['tipo']
+                    cola = self.clientes[nombre]['cola'].metricas()
+                    print(f"     • {nombre} ({tipo}) | cola: {cola['profundidad']}/{self.COLA_SALIDA_MAX}"
+                          f" (máx {cola['profundidad_maxima']}) | descartados: {cola['descartados']}")
+            print("="*60)
+        
+        try:
+            if 'm3_base_datos' in self.clientes and self.buffer_db:
+                pendientes = list(self.buffer_db)
+                self.buffer_db = []
+                for msg in pendientes:
+                    ok = self.enviar_a_modulo('m3_base_datos', msg)
+                    if not ok:
+                        self.buffer_db.append(msg)
+                        break
+        except:
+            pass
+        self.mensajes_enviados = 0
+        self.mensajes_recibidos = 0
+        self.ultimo_conteo = ahora
 
 if __name__ == "__main__":
-    coordinador = Coordinador()
+    # Núcleo del coordinador: 'hilos' (un hilo por conexión) o 'asyncio' (un solo bucle de eventos)
+    modo = os.getenv('COORDINADOR_MODO', 'hilos')
+    if '--asyncio' in sys.argv:
+        modo = 'asyncio'
+    elif '--hilos' in sys.argv:
+        modo = 'hilos'
+    
+    if modo == 'asyncio':
+        from coordinador_async import CoordinadorAsync
+        coordinador = CoordinadorAsync()
+    else:
+        coordinador = Coordinador()
     try:
         coordinador.iniciar()
     except KeyboardInterrupt:
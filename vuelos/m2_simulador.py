@@ -5,12 +5,18 @@ Genera vuelos con cálculos de Haversine, Bearing, Slerp y ETA
 import socket
 import json
 import time
-import math
 import random
 import threading
-from datetime import datetime, timedelta
+import signal
 import os
 
+from almacen_vuelos import AlmacenVuelos, RegistroVuelo, IMAGENES_AVION
+from motor_vectorizado import MotorVectorizado
+from rutas import TablaRutas
+import geo
+from protocolo import (FORMATO_JSON, FORMATO_MSGPACK, LARGO_MAXIMO_ID, REGISTRO_POSICION,
+                       Decodificador, codificar, empaquetar_posiciones, negociar)
+
 class SimuladorVuelos:
     def __init__(self, coordinador_host='localhost', coordinador_port=5555):
         hosts_env = os.getenv('COORDINADOR_HOSTS')
@@ -20,18 +26,30 @@ class SimuladorVuelos:
         self.hosts = [h.strip() for h in hosts_env.split(',')] if hosts_env else [host_env.strip() if host_env else coordinador_host]
         self.coordinador_host = self.hosts[0]
         self.socket = None
-        self.vuelos_activos = {}
+        self.formato = FORMATO_JSON  # Formato negociado con el coordinador
+        self.decodificador = Decodificador()
         self.max_vuelos = 50  # Mínimo 50 vuelos al iniciar
+        self.min_vuelos = 50
         self.pausado = False
         self.running = True
         self.lock = threading.Lock()
         
         # Radio de la Tierra en km
-        self.RADIO_TIERRA = 6371.0
+        self.RADIO_TIERRA = geo.RADIO_TIERRA
         
         self.FACTOR_TIEMPO = 60  # 1 real second = 60 simulated seconds
         self.DT = 0.2  # Tick duration in seconds (200ms)
         
+        # Protocolo delta: cada vuelo_update lleva solo los campos que cambiaron y
+        # cada KEYFRAME_TICKS se envía el vuelo completo (escalonado por vuelo)
+        self.KEYFRAME_TICKS = 50  # 10 s con DT = 200 ms
+        self.tick_actual = 0
+        
+        # Todos los vuelo_update de un tick viajan juntos en mensajes 'frame'
+        # (una serialización y un envío por trozo de hasta MAX_UPDATES_POR_FRAME)
+        self.MAX_UPDATES_POR_FRAME = int(os.getenv('MAX_UPDATES_POR_FRAME', '2000'))
+        
+        
         # Variables de entorno para simulación avanzada
         self.clima_global = {
             'viento_velocidad': 0,  # km/h
@@ -139,6 +157,16 @@ class SimuladorVuelos:
             'BAH': (26.2708, 50.6336, 'Baréin'),
         }
         
+        # Vuelos activos como registros compactos que referencian la tabla de aeropuertos
+        self.vuelos_activos = AlmacenVuelos(self.aeropuertos)
+        
+        # Distancia, rumbo y constantes de Slerp de cada par de aeropuertos (se calculan una vez)
+        self.rutas = TablaRutas(self.RADIO_TIERRA).precalcular(self.vuelos_activos.aeropuertos)
+        
+        # Motor de simulación: 'escalar' (registro por registro) o 'vectorizado' (NumPy por lotes)
+        self.modo_motor = os.getenv('MOTOR_SIMULACION', 'escalar').strip().lower()
+        self.motor = MotorVectorizado(self.RADIO_TIERRA, self.vuelos_activos.aeropuertos) if self.modo_motor == 'vectorizado' else None
+        
     def conectar(self):
         while self.running:
             for host in self.hosts:
@@ -148,15 +176,16 @@ class SimuladorVuelos:
                     info = {
                         'nombre': 'm2_simulador',
                         'tipo': 'simulador',
-                        'version': '1.0'
+                        'version': '1.0',
+                        # Temas de broadcast que consume (pausar/reanudar)
+                        'temas': ['comando'],
                     }
-                    self.socket.send(json.dumps(info).encode('utf-8'))
-                    respuesta_raw = self.socket.recv(1024).decode('utf-8')
-                    respuesta_linea = respuesta_raw.split('\n', 1)[0].strip()
-                    confirmacion = json.loads(respuesta_linea)
+                    confirmacion, formato, sobrante = negociar(self.socket, info)
                     if confirmacion['status'] == 'OK':
+                        self.formato = formato
+                        self.decodificador = Decodificador(formato, sobrante)
                         self.coordinador_host = host
-                        print(f"✈️  [M2-SIMULADOR] Conectado al coordinador en {host}:{self.coordinador_port}")
+                        print(f"✈️  [M2-SIMULADOR] Conectado al coordinador en {host}:{self.coordinador_port} ({formato})")
                         return True
                 except Exception as e:
                     print(f"❌ Error conectando a {host}:{self.coordinador_port}: {e}")
@@ -164,309 +193,312 @@ class SimuladorVuelos:
             time.sleep(5)
         return False
     
-    def haversine(self, lat1, lon1, lat2, lon2):
-        """
-        Calcula la distancia entre dos puntos usando la fórmula de Haversine
-        d = 2R * arctan2(√a, √(1-a))
-        donde a = sin²(Δφ/2) + cos(φ₁) * cos(φ₂) * sin²(Δλ/2)
-        """
-        # Convertir a radianes
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-        
-        # Diferencias
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        # Fórmula de Haversine
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        
-        distancia = self.RADIO_TIERRA * c
-        return distancia
-    
-    def calcular_bearing(self, lat1, lon1, lat2, lon2):
-        """
-        Calcula el rumbo inicial entre dos puntos
-        θ = arctan2(sin(Δλ)cos(φ₂), cos(φ₁)sin(φ₂) - sin(φ₁)cos(φ₂)cos(Δλ))
-        """
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-        
-        dlon = lon2 - lon1
-        
-        x = math.sin(dlon) * math.cos(lat2)
-        y = math.cos(lat1) * math.sin(lat2) - math.sin(lat1) * math.cos(lat2) * math.cos(dlon)
-        
-        bearing = math.atan2(x, y)
-        bearing = math.degrees(bearing)
-        bearing = (bearing + 360) % 360
-        
-        return bearing
-    
-    def slerp(self, lat1, lon1, lat2, lon2, t):
-        """
-        Interpolación esférica (Slerp) para calcular posición intermedia
-        P(t) = sin((1-t)Ω)/sinΩ * P₀ + sin(tΩ)/sinΩ * P₁
-        """
-        # Convertir a radianes
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-        
-        # Convertir a coordenadas cartesianas
-        x1 = math.cos(lat1) * math.cos(lon1)
-        y1 = math.cos(lat1) * math.sin(lon1)
-        z1 = math.sin(lat1)
-        
-        x2 = math.cos(lat2) * math.cos(lon2)
-        y2 = math.cos(lat2) * math.sin(lon2)
-        z2 = math.sin(lat2)
-        
-        # Producto punto para calcular ángulo omega
-        dot = x1*x2 + y1*y2 + z1*z2
-        omega = math.acos(max(-1, min(1, dot)))
-        
-        if omega < 0.001:  # Puntos muy cercanos
-            # Interpolación lineal
-            x = x1 + t * (x2 - x1)
-            y = y1 + t * (y2 - y1)
-            z = z1 + t * (z2 - z1)
-        else:
-            # Slerp
-            sin_omega = math.sin(omega)
-            a = math.sin((1-t) * omega) / sin_omega
-            b = math.sin(t * omega) / sin_omega
-            
-            x = a * x1 + b * x2
-            y = a * y1 + b * y2
-            z = a * z1 + b * z2
-        
-        # Convertir de vuelta a lat/lon
-        lat = math.atan2(z, math.sqrt(x*x + y*y))
-        lon = math.atan2(y, x)
-        
-        return math.degrees(lat), math.degrees(lon)
-    
     def calcular_eta(self, distancia_restante, velocidad):
         """
-        Calcula el tiempo estimado de llegada
+        Calcula el tiempo estimado de llegada (timestamp)
         ETA = distancia_restante / velocidad
         """
         if velocidad == 0:
             return None
         
         horas = distancia_restante / velocidad
-        eta = datetime.now() + timedelta(hours=horas)
-        return eta
+        return time.time() + horas * 3600.0
     
     def generar_vuelo(self):
         """Genera un nuevo vuelo con datos realistas"""
         # Seleccionar origen y destino aleatorios
-        aeropuertos = list(self.aeropuertos.keys())
-        origen_code = random.choice(aeropuertos)
-        destino_code = random.choice([a for a in aeropuertos if a != origen_code])
-        
-        origen = self.aeropuertos[origen_code]
-        destino = self.aeropuertos[destino_code]
-        
-        # Calcular distancia y rumbo
-        distancia_total = self.haversine(origen[0], origen[1], destino[0], destino[1])
-        rumbo = self.calcular_bearing(origen[0], origen[1], destino[0], destino[1])
+        codigos = self.vuelos_activos.aeropuertos.codigos
+        origen_code = random.choice(codigos)
+        destino_code = random.choice([a for a in codigos if a != origen_code])
         
         # Velocidad aleatoria entre 700-900 km/h
         velocidad = random.randint(700, 900)
         
-        # Crear ID único
-        vuelo_id = f"FL{random.randint(1000, 9999)}"
-        
-        combustible = distancia_total * 1.2  # 20% reserva
-        
-        # Calcular hora de salida y hora estimada de llegada
-        hora_salida = datetime.now()
-        tiempo_vuelo_horas = distancia_total / velocidad
-        hora_llegada_estimada = hora_salida + timedelta(hours=tiempo_vuelo_horas)
-        
-        # Seleccionar imagen de avión aleatoria (URLs de aviones reales)
-        aviones_imagenes = [
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/9/9a/Boeing_737-800_%28American_Airlines%29.jpg/320px-Boeing_737-800_%28American_Airlines%29.jpg',
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/4/4e/Airbus_A320-211_Airbus_Industries_F-WWBA_%28cn_001%29_%281988%29.jpg/320px-Airbus_A320-211_Airbus_Industries_F-WWBA_%28cn_001%29_%281988%29.jpg',
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/8/8a/Boeing_777-300ER_%28Emirates%29.jpg/320px-Boeing_777-300ER_%28Emirates%29.jpg',
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/0/0a/Airbus_A350-900_%28Qatar_Airways%29.jpg/320px-Airbus_A350-900_%28Qatar_Airways%29.jpg',
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/5/5a/Boeing_787-9_Dreamliner_%28ANA%29.jpg/320px-Boeing_787-9_Dreamliner_%28ANA%29.jpg',
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/3/3a/Airbus_A380-800_%28Emirates%29.jpg/320px-Airbus_A380-800_%28Emirates%29.jpg'
-        ]
-        imagen_avion = random.choice(aviones_imagenes)
-        
-        vuelo = {
-            'id': vuelo_id,
-            'origen': {'code': origen_code, 'nombre': origen[2], 'lat': origen[0], 'lon': origen[1]},
-            'destino': {'code': destino_code, 'nombre': destino[2], 'lat': destino[0], 'lon': destino[1]},
-            'distancia_total': round(distancia_total, 2),
-            'rumbo': round(rumbo, 2),
-            'velocidad': velocidad,
-            'velocidad_base': velocidad,  # Para recordar la original
-            'altitud': random.randint(30000, 40000),  # Pies
-            'progreso': 0.0,  # 0 a 1
-            'lat_actual': origen[0],
-            'lon_actual': origen[1],
-            'activo': True,
-            'emergencia': False,
-            'combustible': round(combustible, 2),
-            'hora_salida': hora_salida.isoformat(),  # Hora de salida
-            'hora_llegada_estimada': hora_llegada_estimada.isoformat(),  # Hora estimada de llegada
-            'inicio': hora_salida.isoformat(),  # Mantener compatibilidad
-            'imagen_avion': imagen_avion,  # Imagen de avión real
-            'trayectoria': [[origen[0], origen[1]]]  # Inicializar con posición de origen
-        }
-        
-        return vuelo
+        return self.generar_vuelo_desde(self.nuevo_id(), origen_code, destino_code, velocidad)
+    
+    def nuevo_id(self):
+        """ID de vuelo aleatorio"""
+        return f"FL{random.randint(1000, 9999)}"
     
     def generar_vuelo_desde(self, vuelo_id, origen_code, destino_code, velocidad):
-        if origen_code not in self.aeropuertos or destino_code not in self.aeropuertos:
+        tabla = self.vuelos_activos.aeropuertos
+        if origen_code not in tabla or destino_code not in tabla:
             return None
-        origen = self.aeropuertos[origen_code]
-        destino = self.aeropuertos[destino_code]
-        distancia_total = self.haversine(origen[0], origen[1], destino[0], destino[1])
-        rumbo = self.calcular_bearing(origen[0], origen[1], destino[0], destino[1])
-        combustible = distancia_total * 1.2
-        hora_salida = datetime.now()
+        origen = tabla.indice[origen_code]
+        destino = tabla.indice[destino_code]
+        lat1, lon1 = tabla.lat[origen], tabla.lon[origen]
+        
+        # Distancia y rumbo precalculados en la tabla de rutas
+        ruta = self.rutas.entre(tabla, origen, destino)
+        distancia_total = ruta.distancia
+        rumbo = ruta.rumbo
+        combustible = distancia_total * 1.2  # 20% reserva
+        
+        # Calcular hora de salida y hora estimada de llegada
+        hora_salida = time.time()
         tiempo_vuelo_horas = distancia_total / max(velocidad, 1)
-        hora_llegada_estimada = hora_salida + timedelta(hours=tiempo_vuelo_horas)
-        aviones_imagenes = [
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/9/9a/Boeing_737-800_%28American_Airlines%29.jpg/320px-Boeing_737-800_%28American_Airlines%29.jpg',
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/4/4e/Airbus_A320-211_Airbus_Industries_F-WWBA_%28cn_001%29_%281988%29.jpg/320px-Airbus_A320-211_Airbus_Industries_F-WWBA_%28cn_001%29.jpg',
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/8/8a/Boeing_777-300ER_%28Emirates%29.jpg/320px-Boeing_777-300ER_%28Emirates%29.jpg',
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/0/0a/Airbus_A350-900_%28Qatar_Airways%29.jpg/320px-Airbus_A350-900_%28Qatar_Airways%29.jpg',
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/5/5a/Boeing_787-9_Dreamliner_%28ANA%29.jpg/320px-Boeing_787-9_Dreamliner_%28ANA%29.jpg',
-            'https://upload.wikimedia.org/wikipedia/commons/thumb/3/3a/Airbus_A380-800_%28Emirates%29.jpg/320px-Airbus_A380-800_%28Emirates%29.jpg'
-        ]
-        imagen_avion = random.choice(aviones_imagenes)
-        vuelo = {
-            'id': vuelo_id,
-            'origen': {'code': origen_code, 'nombre': origen[2], 'lat': origen[0], 'lon': origen[1]},
-            'destino': {'code': destino_code, 'nombre': destino[2], 'lat': destino[0], 'lon': destino[1]},
-            'distancia_total': round(distancia_total, 2),
-            'rumbo': round(rumbo, 2),
-            'velocidad': int(velocidad),
-            'velocidad_base': int(velocidad),
-            'altitud': random.randint(30000, 40000),
-            'progreso': 0.0,
-            'lat_actual': origen[0],
-            'lon_actual': origen[1],
-            'activo': True,
-            'emergencia': False,
-            'combustible': round(combustible, 2),
-            'hora_salida': hora_salida.isoformat(),
-            'hora_llegada_estimada': hora_llegada_estimada.isoformat(),
-            'inicio': hora_salida.isoformat(),
-            'imagen_avion': imagen_avion,
-            'trayectoria': [[origen[0], origen[1]]]
-        }
-        return vuelo
+        
+        return RegistroVuelo(
+            vuelo_id, origen, destino,
+            distancia_total=round(distancia_total, 2),
+            rumbo=round(rumbo, 2),
+            velocidad=int(velocidad),
+            altitud=random.randint(30000, 40000),  # Pies
+            lat=lat1,
+            lon=lon1,
+            combustible=round(combustible, 2),
+            t_salida=hora_salida,
+            t_llegada_estimada=hora_salida + tiempo_vuelo_horas * 3600.0,
+            imagen=random.randrange(len(IMAGENES_AVION)),  # Imagen de avión real
+            ruta=ruta
+        )
     
     def actualizar_vuelo(self, vuelo):
         """Actualiza la posición de un vuelo"""
-        if not vuelo['activo']:
+        if not vuelo.activo:
             return vuelo
         
-        velocidad_real = vuelo['velocidad']
+        velocidad_real = vuelo.velocidad
         
         # Efecto del viento (simplificado)
         if self.clima_global['viento_velocidad'] > 0:
             # Si el viento está a favor (+/- 45 grados del rumbo), aumenta velocidad
-            diferencia_angulo = abs(vuelo['rumbo'] - self.clima_global['viento_direccion'])
+            diferencia_angulo = abs(vuelo.rumbo - self.clima_global['viento_direccion'])
             if diferencia_angulo < 45:
                 velocidad_real += self.clima_global['viento_velocidad'] * 0.5
             elif diferencia_angulo > 135:
                 velocidad_real -= self.clima_global['viento_velocidad'] * 0.5
         
         # Evento aleatorio: Emergencia (1% probabilidad)
-        if not vuelo.get('emergencia') and random.random() < 0.001:
-            vuelo['emergencia'] = True
-            vuelo['velocidad'] = vuelo['velocidad'] * 0.8  # Reducir velocidad
-            vuelo['altitud'] = vuelo['altitud'] - 10000    # Descender
-            print(f"🚨 MAYDAY: Vuelo {vuelo['id']} declara emergencia!")
+        if not vuelo.emergencia and random.random() < 0.001:
+            vuelo.emergencia = True
+            vuelo.velocidad = vuelo.velocidad * 0.8  # Reducir velocidad
+            vuelo.altitud = vuelo.altitud - 10000    # Descender
+            self.vuelos_activos.marcar(vuelo, 'emergencia', 'velocidad', 'altitud')
+            print(f"🚨 MAYDAY: Vuelo {vuelo.id} declara emergencia!")
 
         # Consumo de combustible
         consumo = velocidad_real * (self.DT / 3600.0) * self.FACTOR_TIEMPO  # Litros por tick (simulado)
-        vuelo['combustible'] -= consumo
+        vuelo.combustible -= consumo
         
-        if vuelo['combustible'] <= 0 and vuelo['activo']:
-            print(f"⛽ Vuelo {vuelo['id']} se quedó sin combustible!")
-            vuelo['emergencia'] = True
+        if vuelo.combustible <= 0 and vuelo.activo:
+            print(f"⛽ Vuelo {vuelo.id} se quedó sin combustible!")
+            vuelo.emergencia = True
+            self.vuelos_activos.marcar(vuelo, 'emergencia')
             
         # Distance to cover in this tick (km)
         distancia_tick = velocidad_real * (self.DT / 3600.0) * self.FACTOR_TIEMPO
         
         # Calculate progress increment based on total distance
-        if vuelo['distancia_total'] > 0:
-            incremento = distancia_tick / vuelo['distancia_total']
+        if vuelo.distancia_total > 0:
+            incremento = distancia_tick / vuelo.distancia_total
         else:
             incremento = 1.0  # Should not happen for valid flights
             
-        vuelo['progreso'] += incremento
+        vuelo.progreso += incremento
         
-        if vuelo['progreso'] >= 1.0:
+        if vuelo.progreso >= 1.0:
             # Vuelo completado
-            vuelo['progreso'] = 1.0
-            vuelo['activo'] = False
-            vuelo['lat_actual'] = vuelo['destino']['lat']
-            vuelo['lon_actual'] = vuelo['destino']['lon']
-            hora_llegada_real = datetime.now()
-            vuelo['fin'] = hora_llegada_real.isoformat()
-            vuelo['hora_llegada'] = hora_llegada_real.isoformat()  # Hora real de llegada
-            
-            # Agregar punto final a la trayectoria
-            vuelo['trayectoria'].append([vuelo['destino']['lat'], vuelo['destino']['lon']])
-            
-            print(f"🛬 Vuelo {vuelo['id']} ha llegado a {vuelo['destino']['nombre']}")
+            self.completar_vuelo(vuelo)
             
             # Enviar mensaje de llegada
             self.enviar_mensaje({
                 'tipo': 'vuelo_completado',
-                'vuelo': vuelo
+                'vuelo': self.vuelos_activos.a_dict(vuelo)
             })
         else:
-            lat, lon = self.slerp(
-                vuelo['origen']['lat'], vuelo['origen']['lon'],
-                vuelo['destino']['lat'], vuelo['destino']['lon'],
-                vuelo['progreso']
-            )
+            lat, lon = vuelo.ruta.posicion(vuelo.progreso)
             
-            vuelo['lat_actual'] = lat
-            vuelo['lon_actual'] = lon
+            vuelo.lat_actual = lat
+            vuelo.lon_actual = lon
             
-            # Calcular distancia restante y ETA
-            distancia_restante = self.haversine(
-                lat, lon,
-                vuelo['destino']['lat'], vuelo['destino']['lon']
-            )
+            # Distancia restante y ETA: Slerp avanza a velocidad angular constante,
+            # así que lo que falta es (1 - t) de la ruta, sin otro Haversine
+            distancia_restante = (1 - vuelo.progreso) * vuelo.distancia_total
             eta = self.calcular_eta(distancia_restante, velocidad_real)
             
-            vuelo['distancia_restante'] = round(distancia_restante, 2)
-            vuelo['eta'] = eta.isoformat() if eta else None
-            vuelo['hora_llegada_estimada'] = eta.isoformat() if eta else vuelo.get('hora_llegada_estimada')
+            vuelo.distancia_restante = round(distancia_restante, 2)
+            vuelo.t_eta = eta
+            if eta:
+                vuelo.t_llegada_estimada = eta
             
-            # Actualizar trayectoria (limitar a últimos 1000 puntos para rendimiento)
-            vuelo['trayectoria'].append([lat, lon])
-            if len(vuelo['trayectoria']) > 1000:
-                vuelo['trayectoria'] = vuelo['trayectoria'][-1000:]
+            # Actualizar trayectoria (buffer acotado y simplificado, O(1) por punto)
+            vuelo.trayectoria.agregar(lat, lon)
             
             if random.random() < 0.05:  # Solo 5% de actualizaciones muestran log
-                print(f"📍 {vuelo['id']}: {vuelo['progreso']:.1%} - {vuelo['origen']['code']}→{vuelo['destino']['code']}")
+                print(f"📍 {vuelo.id}: {vuelo.progreso:.1%} - {self.vuelos_activos.nombre_ruta(vuelo)}")
         
         return vuelo
     
+    def completar_vuelo(self, vuelo):
+        """Marca un vuelo como llegado a su destino"""
+        tabla = self.vuelos_activos.aeropuertos
+        vuelo.progreso = 1.0
+        vuelo.activo = False
+        vuelo.lat_actual = tabla.lat[vuelo.destino]
+        vuelo.lon_actual = tabla.lon[vuelo.destino]
+        vuelo.t_llegada = time.time()  # Hora real de llegada
+        
+        # Agregar punto final a la trayectoria
+        vuelo.trayectoria.agregar(vuelo.lat_actual, vuelo.lon_actual)
+        
+        print(f"🛬 Vuelo {vuelo.id} ha llegado a {tabla.nombres[vuelo.destino]}")
+    
+    def agregar_vuelo_activo(self, vuelo):
+        """Registra un vuelo como activo (y en el motor vectorizado si está habilitado)"""
+        self.vuelos_activos.agregar(vuelo)
+        if self.motor is not None:
+            self.motor.agregar(vuelo)
+    
+    def eliminar_vuelo_activo(self, vuelo_id):
+        self.vuelos_activos.eliminar(vuelo_id)
+        if self.motor is not None:
+            self.motor.eliminar(vuelo_id)
+    
+    def es_keyframe(self, vuelo):
+        return (self.tick_actual + hash(vuelo.id)) % self.KEYFRAME_TICKS == 0
+    
+    def agregar_update(self, vuelo, updates, posiciones):
+        """
+        Añade el vuelo_update del vuelo al frame del tick. Con el protocolo binario
+        los deltas que solo traen la posición van como registro fijo en posiciones
+        """
+        if (posiciones is not None and not vuelo.cambios and not self.es_keyframe(vuelo)
+                and len(vuelo.id.encode('utf-8')) <= LARGO_MAXIMO_ID):
+            posiciones.append(self.vuelos_activos.a_posicion(vuelo))
+        else:
+            updates.append(self.mensaje_update(vuelo))
+    
+    def mensaje_update(self, vuelo):
+        """vuelo_update delta; el vuelo completo (keyframe) solo cada KEYFRAME_TICKS"""
+        if self.es_keyframe(vuelo):
+            return {
+                'tipo': 'vuelo_update',
+                'keyframe': True,
+                'vuelo': self.vuelos_activos.a_dict(vuelo)
+            }
+        return {
+            'tipo': 'vuelo_update',
+            'delta': True,
+            'vuelo': self.vuelos_activos.a_delta(vuelo)
+        }
+    
+    def enviar_frame(self, updates, num_activos, posiciones=b''):
+        """
+        Envía los vuelo_update del tick agrupados en mensajes 'frame'
+        (se parten en trozos de MAX_UPDATES_POR_FRAME para acotar su tamaño).
+        posiciones son los registros fijos del protocolo binario ya empaquetados
+        """
+        tam = max(1, self.MAX_UPDATES_POR_FRAME)
+        largo = tam * REGISTRO_POSICION.size
+        cantidad = max(len(updates), len(posiciones) // REGISTRO_POSICION.size)
+        partes = max(1, (cantidad + tam - 1) // tam)
+        for parte in range(partes):
+            frame = {
+                'tipo': 'frame',
+                'tick': self.tick_actual,
+                'parte': parte,
+                'partes': partes,
+                'vuelos_activos': num_activos,
+                'mensajes': updates[parte * tam:(parte + 1) * tam]
+            }
+            trozo = posiciones[parte * largo:(parte + 1) * largo]
+            if trozo:
+                frame['posiciones'] = trozo
+            self.enviar_mensaje(frame)
+    
+    def tick_escalar(self, num_activos):
+        """Avanza los vuelos uno por uno con actualizar_vuelo"""
+        vuelos_a_eliminar = []
+        updates = []
+        posiciones = [] if self.formato == FORMATO_MSGPACK else None
+        for vuelo_id, vuelo in list(self.vuelos_activos.items()):
+            if vuelo.activo:
+                vuelo = self.actualizar_vuelo(vuelo)
+            if not vuelo.activo:
+                # actualizar_vuelo ya envió vuelo_completado: solo se quita, como en el motor vectorizado
+                vuelos_a_eliminar.append(vuelo_id)
+                continue
+            # Solo los cambios del tick (o el keyframe completo), enviados en el frame
+            self.agregar_update(vuelo, updates, posiciones)
+        
+        self.enviar_frame(updates, num_activos, empaquetar_posiciones(posiciones) if posiciones else b'')
+        
+        # Eliminar vuelos completados
+        for vuelo_id in vuelos_a_eliminar:
+            self.eliminar_vuelo_activo(vuelo_id)
+    
+    def tick_vectorizado(self, num_activos):
+        """
+        Avanza todos los vuelos en una pasada del motor vectorizado. Solo se
+        vuelcan a su registro los vuelos que emiten un mensaje completo (keyframe,
+        campos marcados, llegada); los deltas de posición del resto salen en
+        bloque de los arreglos del motor
+        """
+        motor = self.motor
+        emergencias, sin_combustible, completados = motor.avanzar(self.DT, self.FACTOR_TIEMPO, self.clima_global)
+        
+        for i in emergencias.tolist():
+            vuelo = self.vuelos_activos[motor.ids[i]]
+            vuelo.emergencia = True
+            vuelo.velocidad = vuelo.velocidad * 0.8  # Reducir velocidad
+            vuelo.altitud = vuelo.altitud - 10000    # Descender
+            self.vuelos_activos.marcar(vuelo, 'emergencia', 'velocidad', 'altitud')
+            print(f"🚨 MAYDAY: Vuelo {vuelo.id} declara emergencia!")
+        for i in sin_combustible.tolist():
+            vuelo = self.vuelos_activos[motor.ids[i]]
+            vuelo.emergencia = True
+            self.vuelos_activos.marcar(vuelo, 'emergencia')
+            print(f"⛽ Vuelo {motor.ids[i]} se quedó sin combustible!")
+        
+        ahora = time.time()
+        binario = self.formato == FORMATO_MSGPACK
+        completos, solo_posicion = motor.separar(self.tick_actual, self.KEYFRAME_TICKS,
+                                                 self.vuelos_activos.marcados, completados, binario)
+        
+        updates = []
+        for i in completos.tolist():
+            vuelo = motor.materializar(self.vuelos_activos[motor.ids[i]], i, ahora)
+            updates.append(self.mensaje_update(vuelo))
+        if binario:
+            posiciones = motor.posiciones(solo_posicion, ahora)
+        else:
+            updates += motor.deltas(solo_posicion, ahora)
+            posiciones = b''
+        
+        vuelos_a_eliminar = []
+        for i in completados.tolist():
+            vuelo = motor.materializar(self.vuelos_activos[motor.ids[i]], i, ahora)
+            self.completar_vuelo(vuelo)
+            vuelos_a_eliminar.append(vuelo.id)
+            self.enviar_mensaje({
+                'tipo': 'vuelo_completado',
+                'vuelo': self.vuelos_activos.a_dict(vuelo)
+            })
+        
+        self.enviar_frame(updates, num_activos, posiciones)
+        
+        for vuelo_id in vuelos_a_eliminar:
+            self.eliminar_vuelo_activo(vuelo_id)
+    
+    def materializar_todos(self):
+        """Vuelca el estado del motor en todos los registros (antes de serializarlos completos)"""
+        if self.motor is not None:
+            ahora = time.time()
+            for i, vuelo_id in enumerate(self.motor.ids):
+                self.motor.materializar(self.vuelos_activos[vuelo_id], i, ahora)
+    
     def enviar_mensaje(self, mensaje):
         """Envía mensaje al coordinador"""
         try:
-            data = json.dumps(mensaje).encode('utf-8')
-            self.socket.send(data + b'\n')
+            self.socket.sendall(codificar(mensaje, self.formato))
         except Exception as e:
             print(f"❌ Error enviando mensaje: {e}")
             try:
                 if self.running:
                     print("🔄 Reconectando al coordinador...")
                     if self.conectar():
-                        data = json.dumps(mensaje).encode('utf-8')
-                        self.socket.send(data + b'\n')
+                        self.socket.sendall(codificar(mensaje, self.formato))
             except Exception as e2:
                 print(f"❌ Error reintentando envío: {e2}")
     
@@ -476,166 +508,165 @@ class SimuladorVuelos:
         print(f"   Configuración: Máximo {self.max_vuelos} vuelos simultáneos")
         print(f"   Aeropuertos disponibles: {len(self.aeropuertos)} en todo el mundo")
         print(f"   Rango permitido: 50 - 50,000 vuelos")
+        print(f"   Motor de simulación: {'vectorizado (NumPy)' if self.motor is not None else 'escalar'}")
         
-        # Generar vuelos iniciales hasta llegar al mínimo de 50
+        self.generar_iniciales()
+        
+        while self.running:
+            if self.pausado:
+                time.sleep(1)
+                continue
+            
+            self.paso_simulacion()
+            time.sleep(self.DT)
+    
+    def generar_iniciales(self):
+        """Genera vuelos hasta llegar al mínimo (min_vuelos)"""
         with self.lock:
-            vuelos_iniciales = max(0, 50 - len(self.vuelos_activos))
+            vuelos_iniciales = max(0, self.min_vuelos - len(self.vuelos_activos))
             if vuelos_iniciales > 0:
-                print(f"📦 Generando {vuelos_iniciales} vuelos iniciales para alcanzar el mínimo de 50...")
+                print(f"📦 Generando {vuelos_iniciales} vuelos iniciales para alcanzar el mínimo de {self.min_vuelos}...")
                 for _ in range(vuelos_iniciales):
                     nuevo_vuelo = self.generar_vuelo()
-                    self.vuelos_activos[nuevo_vuelo['id']] = nuevo_vuelo
+                    self.agregar_vuelo_activo(nuevo_vuelo)
                     
                     # Enviar vuelo nuevo al mapa
                     self.enviar_mensaje({
                         'tipo': 'vuelo_nuevo',
-                        'vuelo': nuevo_vuelo
+                        'vuelo': self.vuelos_activos.a_dict(nuevo_vuelo)
                     })
                     
                     # Guardar vuelo en base de datos cuando despega
                     pass
                 
                 print(f"✅ {len(self.vuelos_activos)} vuelos activos iniciales generados")
+    
+    def paso_simulacion(self):
+        """Un tick: clima, vuelos nuevos hasta max_vuelos y avance de todos los activos"""
+        self.actualizar_clima()
         
-        while self.running:
-            if self.pausado:
-                time.sleep(1)
-                continue
-            
-            self.actualizar_clima()
-            
-            with self.lock:
-                if len(self.vuelos_activos) < self.max_vuelos:
-                    vuelos_a_generar = min(10, self.max_vuelos - len(self.vuelos_activos))
-                    
-                    for _ in range(vuelos_a_generar):
-                        nuevo_vuelo = self.generar_vuelo()
-                        self.vuelos_activos[nuevo_vuelo['id']] = nuevo_vuelo
-                        
-                        if len(self.vuelos_activos) % 50 == 0 or len(self.vuelos_activos) <= 10:
-                            print(f"✈️  Nuevo vuelo {nuevo_vuelo['id']}: "
-                                  f"{nuevo_vuelo['origen']['code']} → {nuevo_vuelo['destino']['code']} "
-                                  f"({nuevo_vuelo['distancia_total']:.0f} km) | Total activos: {len(self.vuelos_activos)}")
-                        
-                        # Enviar vuelo nuevo al mapa
-                        self.enviar_mensaje({
-                            'tipo': 'vuelo_nuevo',
-                            'vuelo': nuevo_vuelo
-                        })
-                        
-                        # Guardar vuelo en base de datos cuando despega
-                        pass
-                
-                # Actualizar todos los vuelos activos
-                vuelos_a_eliminar = []
-                num_activos = len(self.vuelos_activos)
-                
-                for vuelo_id, vuelo in list(self.vuelos_activos.items()):
-                    if vuelo['activo']:
-                        vuelo = self.actualizar_vuelo(vuelo)
-                        
-                        # Enviar actualización con trayectoria completa
-                        self.enviar_mensaje({
-                            'tipo': 'vuelo_update',
-                            'vuelo': vuelo,
-                            'vuelos_activos': num_activos
-                        })
-                    else:
-                        vuelos_a_eliminar.append(vuelo_id)
-                        
-                        self.enviar_mensaje({
-                            'tipo': 'vuelo_completado',
-                            'vuelo': vuelo
-                        })
+        with self.lock:
+            if len(self.vuelos_activos) < self.max_vuelos:
+                vuelos_a_generar = min(10, self.max_vuelos - len(self.vuelos_activos))
                 
-                # Eliminar vuelos completados
-                for vuelo_id in vuelos_a_eliminar:
-                    del self.vuelos_activos[vuelo_id]
+                for _ in range(vuelos_a_generar):
+                    nuevo_vuelo = self.generar_vuelo()
+                    self.agregar_vuelo_activo(nuevo_vuelo)
+                    
+                    if len(self.vuelos_activos) % 50 == 0 or len(self.vuelos_activos) <= 10:
+                        print(f"✈️  Nuevo vuelo {nuevo_vuelo.id}: "
+                              f"{self.vuelos_activos.nombre_ruta(nuevo_vuelo)} "
+                              f"({nuevo_vuelo.distancia_total:.0f} km) | Total activos: {len(self.vuelos_activos)}")
+                    
+                    # Enviar vuelo nuevo al mapa
+                    self.enviar_mensaje({
+                        'tipo': 'vuelo_nuevo',
+                        'vuelo': self.vuelos_activos.a_dict(nuevo_vuelo)
+                    })
+                    
+                    # Guardar vuelo en base de datos cuando despega
+                    pass
             
-            time.sleep(self.DT)
+            # Actualizar todos los vuelos activos
+            num_activos = len(self.vuelos_activos)
+            if self.motor is not None:
+                self.tick_vectorizado(num_activos)
+            else:
+                self.tick_escalar(num_activos)
+            self.tick_actual += 1
     
     def recibir_comandos(self):
         """Recibe comandos del coordinador"""
-        buffer = ""
         while self.running:
             try:
-                data = self.socket.recv(4096)
-                if not data:
+                mensajes = self.decodificador.leer(self.socket)
+                if mensajes is None:
                     raise ConnectionError("Socket cerrado")
-                buffer += data.decode('utf-8')
-                while '\n' in buffer:
-                    linea, buffer = buffer.split('\n', 1)
-                    if not linea.strip():
-                        continue
-                    mensaje = json.loads(linea)
-                    tipo = mensaje.get('tipo')
-                    if tipo == 'comando':
-                        accion = mensaje.get('accion')
-                        if accion == 'pausar':
-                            self.pausado = True
-                            print("⏸️  Simulación PAUSADA")
-                        elif accion == 'reanudar':
-                            self.pausado = False
-                            print("▶️  Simulación REANUDADA")
-                        elif accion == 'resync':
-                            with self.lock:
-                                for v in list(self.vuelos_activos.values()):
-                                    self.enviar_mensaje({'tipo': 'vuelo_nuevo', 'vuelo': v})
-                    elif tipo == 'comando_atc':
-                        vuelo_id = mensaje.get('vuelo_id')
-                        accion = mensaje.get('accion')
-                        valor = mensaje.get('valor')
-                        with self.lock:
-                            if vuelo_id in self.vuelos_activos:
-                                vuelo = self.vuelos_activos[vuelo_id]
-                                if accion == 'cambiar_altitud':
-                                    vuelo['altitud'] = int(valor)
-                                    print(f"👨‍✈️ ATC: Vuelo {vuelo_id} cambiando altitud a {valor} pies")
-                                elif accion == 'cambiar_velocidad':
-                                    vuelo['velocidad'] = int(valor)
-                                    print(f"👨‍✈️ ATC: Vuelo {vuelo_id} cambiando velocidad a {valor} km/h")
-                                elif accion == 'emergencia':
-                                    vuelo['emergencia'] = True
-                                    print(f"🚨 ATC: Vuelo {vuelo_id} declarado en EMERGENCIA")
-                    elif tipo == 'configuracion':
-                        if 'max_vuelos' in mensaje:
-                            nuevo_max = mensaje['max_vuelos']
-                            if 50 <= nuevo_max <= 50000:
-                                self.max_vuelos = nuevo_max
-                                print(f"⚙️  Máximo de vuelos actualizado: {self.max_vuelos}")
-                                print(f"   Vuelos activos actualmente: {len(self.vuelos_activos)}")
-                            else:
-                                print(f"⚠️  El máximo debe estar entre 50 y 50,000 (recibido: {nuevo_max})")
-                    elif tipo == 'reset_estado':
-                        print("♻️  Reset de estado recibido: limpiando y generando vuelos aleatorios")
-                        with self.lock:
-                            self.vuelos_activos = {}
-                            objetivo = max(50, min(self.max_vuelos, 50000))
-                            vuelos_iniciales = random.randint(50, objetivo)
-                            print(f"   Generando {vuelos_iniciales} vuelos iniciales (rango 50–{objetivo})")
-                            for _ in range(vuelos_iniciales):
-                                nuevo_vuelo = self.generar_vuelo()
-                                self.vuelos_activos[nuevo_vuelo['id']] = nuevo_vuelo
-                                self.enviar_mensaje({'tipo': 'vuelo_nuevo', 'vuelo': nuevo_vuelo})
-                    elif tipo == 'crear_vuelo_manual':
-                        vuelo_id = (mensaje.get('id') or f"FL{random.randint(1000,9999)}").upper()
-                        origen_code = (mensaje.get('origen') or '').upper()
-                        destino_code = (mensaje.get('destino') or '').upper()
-                        velocidad = int(mensaje.get('velocidad') or random.randint(700, 900))
-                        nuevo_vuelo = self.generar_vuelo_desde(vuelo_id, origen_code, destino_code, velocidad)
-                        if nuevo_vuelo:
-                            with self.lock:
-                                self.vuelos_activos[nuevo_vuelo['id']] = nuevo_vuelo
-                            self.enviar_mensaje({'tipo': 'vuelo_nuevo', 'vuelo': nuevo_vuelo})
-                            print(f"✈️  Vuelo manual {nuevo_vuelo['id']} creado: {origen_code} → {destino_code}")
-                        else:
-                            print("⚠️  Códigos IATA inválidos para creación manual")
+                for mensaje, _ in mensajes:
+                    self.procesar_comando(mensaje)
             except Exception as e:
                 print(f"❌ Error recibiendo comandos: {e}")
                 time.sleep(5)
                 if self.running and self.conectar():
                     continue
     
+    def procesar_comando(self, mensaje):
+        """Atiende un mensaje del coordinador (comandos, ATC, configuración)"""
+        tipo = mensaje.get('tipo')
+        if tipo == 'comando':
+            accion = mensaje.get('accion')
+            if accion == 'pausar':
+                self.pausado = True
+                print("⏸️  Simulación PAUSADA")
+            elif accion == 'reanudar':
+                self.pausado = False
+                print("▶️  Simulación REANUDADA")
+            elif accion == 'resync':
+                with self.lock:
+                    self.materializar_todos()
+                    for v in list(self.vuelos_activos.values()):
+                        self.enviar_mensaje({'tipo': 'vuelo_nuevo', 'vuelo': self.vuelos_activos.a_dict(v)})
+        elif tipo == 'comando_atc':
+            vuelo_id = mensaje.get('vuelo_id')
+            accion = mensaje.get('accion')
+            valor = mensaje.get('valor')
+            with self.lock:
+                if vuelo_id in self.vuelos_activos:
+                    vuelo = self.vuelos_activos[vuelo_id]
+                    if accion == 'cambiar_altitud':
+                        vuelo.altitud = int(valor)
+                        self.vuelos_activos.marcar(vuelo, 'altitud')
+                        print(f"👨‍✈️ ATC: Vuelo {vuelo_id} cambiando altitud a {valor} pies")
+                    elif accion == 'cambiar_velocidad':
+                        vuelo.velocidad = int(valor)
+                        self.vuelos_activos.marcar(vuelo, 'velocidad')
+                        print(f"👨‍✈️ ATC: Vuelo {vuelo_id} cambiando velocidad a {valor} km/h")
+                    elif accion == 'emergencia':
+                        vuelo.emergencia = True
+                        self.vuelos_activos.marcar(vuelo, 'emergencia')
+                        print(f"🚨 ATC: Vuelo {vuelo_id} declarado en EMERGENCIA")
+                    if self.motor is not None:
+                        self.motor.sincronizar(vuelo)
+        elif tipo == 'configuracion':
+            if 'max_vuelos' in mensaje:
+                nuevo_max = mensaje['max_vuelos']
+                if 50 <= nuevo_max <= 50000:
+                    self.max_vuelos = nuevo_max
+                    print(f"⚙️  Máximo de vuelos actualizado: {self.max_vuelos}")
+                    print(f"   Vuelos activos actualmente: {len(self.vuelos_activos)}")
+                else:
+                    print(f"⚠️  El máximo debe estar entre 50 y 50,000 (recibido: {nuevo_max})")
+        elif tipo == 'reset_estado':
+            print("♻️  Reset de estado recibido: limpiando y generando vuelos aleatorios")
+            objetivo = max(50, min(self.max_vuelos, 50000))
+            vuelos_iniciales = random.randint(50, objetivo)
+            print(f"   Generando {vuelos_iniciales} vuelos iniciales (rango 50–{objetivo})")
+            self.reiniciar(vuelos_iniciales)
+        elif tipo == 'crear_vuelo_manual':
+            vuelo_id = (mensaje.get('id') or self.nuevo_id()).upper()
+            origen_code = (mensaje.get('origen') or '').upper()
+            destino_code = (mensaje.get('destino') or '').upper()
+            velocidad = int(mensaje.get('velocidad') or random.randint(700, 900))
+            nuevo_vuelo = self.generar_vuelo_desde(vuelo_id, origen_code, destino_code, velocidad)
+            if nuevo_vuelo:
+                with self.lock:
+                    self.agregar_vuelo_activo(nuevo_vuelo)
+                self.enviar_mensaje({'tipo': 'vuelo_nuevo', 'vuelo': self.vuelos_activos.a_dict(nuevo_vuelo)})
+                print(f"✈️  Vuelo manual {nuevo_vuelo.id} creado: {origen_code} → {destino_code}")
+            else:
+                print("⚠️  Códigos IATA inválidos para creación manual")
+    
+    def reiniciar(self, vuelos_iniciales):
+        """Descarta los vuelos activos y genera vuelos_iniciales nuevos"""
+        with self.lock:
+            self.vuelos_activos.limpiar()
+            if self.motor is not None:
+                self.motor.limpiar()
+            for _ in range(vuelos_iniciales):
+                nuevo_vuelo = self.generar_vuelo()
+                self.agregar_vuelo_activo(nuevo_vuelo)
+                self.enviar_mensaje({'tipo': 'vuelo_nuevo', 'vuelo': self.vuelos_activos.a_dict(nuevo_vuelo)})
+    
     def iniciar(self):
         """Inicia el simulador"""
         if not self.conectar():
@@ -656,15 +687,29 @@ class SimuladorVuelos:
             self.running = False
 
     def actualizar_clima(self):
-        """Simula cambios en el clima global"""
+        """Simula cambios en el clima global (devuelve True si cambió)"""
         if random.random() < 0.01:  # 1% probabilidad de cambio
             self.clima_global['viento_velocidad'] = random.randint(0, 100)
             self.clima_global['viento_direccion'] = random.randint(0, 360)
             self.clima_global['tormenta_activa'] = random.random() < 0.1  # 10% prob de tormenta
             
             print(f"🌤️  Cambio de clima: Viento {self.clima_global['viento_velocidad']} km/h, Tormenta: {self.clima_global['tormenta_activa']}")
+            return True
+        return False
 
 if __name__ == "__main__":
-    simulador = SimuladorVuelos()
-    simulador.iniciar()
+    # Con PARTICIONES_SIMULACION > 1 los vuelos se reparten en procesos (un núcleo cada uno)
+    particiones = int(os.getenv('PARTICIONES_SIMULACION', '1'))
+    if particiones > 1:
+        from simulador_particionado import SimuladorParticionado
+        simulador = SimuladorParticionado(particiones)
+        # docker stop manda SIGTERM: cerrar como con Ctrl+C para que corra detener()
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+    else:
+        simulador = SimuladorVuelos()
+    try:
+        simulador.iniciar()
+    finally:
+        if particiones > 1:
+            simulador.detener()
 
@@ -1,6 +1,7 @@
 """
 M3 - BASE DE DATOS
-Almacena todos los vuelos completados en formato JSONL
+Almacena todos los vuelos completados en un log JSONL segmentado o en SQLite
+(ALMACENAMIENTO=jsonl|sqlite)
 """
 import socket
 import json
@@ -9,6 +10,11 @@ import time
 from datetime import datetime
 import threading
 
+from protocolo import FORMATO_JSON, Decodificador, codificar, mensajes_de_frame, negociar
+from almacenamiento import crear_almacenamiento
+from archivo_trayectorias import ArchivoTrayectorias
+from trayectoria import Trayectoria
+
 class BaseDatos:
     def __init__(self, coordinador_host='localhost', coordinador_port=5555):
         host_env = os.getenv('COORDINADOR_HOST')
@@ -16,25 +22,22 @@ class BaseDatos:
         self.coordinador_host = host_env.strip() if host_env else coordinador_host
         self.coordinador_port = int(port_env) if port_env else coordinador_port
         self.socket = None
+        self.formato = FORMATO_JSON  # Formato negociado con el coordinador
+        self.decodificador = Decodificador()
         base_dir = '/data' if os.path.exists('/.dockerenv') else os.path.join(os.getcwd(), 'data')
-        self.archivo_datos = os.path.join(base_dir, 'vuelos_guardados.jsonl')
         self.running = True
         self.lock = threading.Lock()
-        self.vuelos_guardados = 0
-        
-        os.makedirs(os.path.dirname(self.archivo_datos), exist_ok=True)
+        self.estado_vuelos = {}  # Último estado completo por vuelo (para aplicar deltas)
         
-        if not os.path.exists(self.archivo_datos):
-            with open(self.archivo_datos, 'w', encoding='utf-8') as f:
-                pass
-            print(f"📄 Archivo de base de datos creado: {self.archivo_datos}")
-        else:
-            try:
-                with open(self.archivo_datos, 'r', encoding='utf-8') as f:
-                    self.vuelos_guardados = sum(1 for line in f if line.strip())
-                print(f"📊 Vuelos ya registrados: {self.vuelos_guardados}")
-            except:
-                pass
+        # Backend según ALMACENAMIENTO (segmentos JSONL por defecto, o SQLite).
+        # Ambos escriben por lotes con la durabilidad de FSYNC_MODO
+        self.almacen = crear_almacenamiento(base_dir)
+        # Trayectorias de vuelos completados en binario columnar; el registro guarda la referencia
+        self.trayectorias = ArchivoTrayectorias(os.path.join(base_dir, 'trayectorias'))
+        self.vuelos_guardados = len(self.almacen)
+        if self.vuelos_guardados:
+            print(f"📊 Vuelos ya registrados: {self.vuelos_guardados}")
+        self.metricas_previas = (time.time(), 0, 0)  # (instante, registros, fsyncs) del último reporte
         
     def conectar(self):
         """Conecta con el coordinador"""
@@ -47,17 +50,18 @@ class BaseDatos:
                 info = {
                     'nombre': 'm3_base_datos',
                     'tipo': 'base_datos',
-                    'version': '1.0'
+                    'version': '1.0',
+                    # guardar_vuelo, vuelo_completado y obtener_estadisticas le llegan dirigidos
+                    'temas': ['vuelo_update', 'frame'],
                 }
-                self.socket.send(json.dumps(info).encode('utf-8'))
-                
-                # Esperar confirmación
-                respuesta = self.socket.recv(1024).decode('utf-8')
-                confirmacion = json.loads(respuesta)
+                # Enviar identificación y esperar confirmación (negocia el formato)
+                confirmacion, formato, sobrante = negociar(self.socket, info)
                 
                 if confirmacion['status'] == 'OK':
-                    print(f"💾 [M3-BASE_DATOS] Conectado al coordinador")
-                    print(f"   Archivo: {self.archivo_datos}")
+                    self.formato = formato
+                    self.decodificador = Decodificador(formato, sobrante)
+                    print(f"💾 [M3-BASE_DATOS] Conectado al coordinador ({formato})")
+                    print(f"   Almacenamiento: {self.almacen.ubicacion}")
                     return True
                     
             except Exception as e:
@@ -67,28 +71,28 @@ class BaseDatos:
         
         return False
     
-    def guardar_vuelo(self, vuelo):
-        """Guarda un vuelo en el archivo JSONL"""
+    def guardar_vuelo(self, vuelo, anunciar=True):
+        """
+        Guarda un vuelo en el almacenamiento configurado.
+        El registro se encola y se escribe y sincroniza en lote (línea JSONL o UPSERT por id).
+        La trayectoria no se repite en cada registro: se archiva al completarse el vuelo
+        """
         try:
             with self.lock:
                 # Agregar timestamp de guardado
                 registro = {
-                    **vuelo,
+                    **{k: v for k, v in vuelo.items() if k != 'trayectoria'},
                     'guardado_en': datetime.now().isoformat(),
                     'timestamp_unix': time.time()
                 }
                 
-                # Escribir en formato JSONL (una línea JSON por registro)
-                with open(self.archivo_datos, 'a', encoding='utf-8') as f:
-                    f.write(json.dumps(registro, ensure_ascii=False) + '\n')
-                    f.flush()  # Forzar escritura inmediata
-                    os.fsync(f.fileno())  # Sincronizar con disco
-                
+                self.almacen.guardar(registro)
                 self.vuelos_guardados += 1
-                
+            
+            if not anunciar:
+                return True
             print(f"💾 ✅ Vuelo {vuelo['id']} guardado exitosamente (Total: {self.vuelos_guardados})")
             print(f"   {vuelo['origen']['code']} → {vuelo['destino']['code']} | {vuelo['distancia_total']:.0f} km")
-            print(f"   Archivo: {self.archivo_datos}")
             return True
             
         except Exception as e:
@@ -97,171 +101,143 @@ class BaseDatos:
             traceback.print_exc()
             return False
     
-    def actualizar_hora_llegada(self, vuelo_id, hora_llegada):
-        """Actualiza solo la hora de llegada de un vuelo existente"""
+    def aplicar_update(self, mensaje):
+        """Reconstruye el vuelo completo a partir de un vuelo_update (delta o keyframe)"""
+        vuelo = mensaje.get('vuelo')
+        if not vuelo:
+            return None
+        if not mensaje.get('delta'):
+            self.estado_vuelos[vuelo['id']] = vuelo
+            return vuelo
+        estado = self.estado_vuelos.get(vuelo['id'])
+        if estado is None:
+            return None  # Aún no hay estado base: se recupera con el próximo keyframe
+        punto = vuelo.get('punto')
+        estado.update((k, v) for k, v in vuelo.items() if k != 'punto')
+        if punto:
+            trayectoria = estado.get('trayectoria')
+            if not isinstance(trayectoria, Trayectoria):
+                # La lista del keyframe pasa a un buffer acotado que se simplifica al agregar
+                trayectoria = estado['trayectoria'] = Trayectoria.desde_puntos(trayectoria or [])
+            trayectoria.agregar(*punto)
+        return estado
+    
+    def obtener_vuelo(self, vuelo_id):
+        """
+        Estado actual de un vuelo: su último registro más los parches posteriores,
+        con la trayectoria del archivo (completado) o de memoria (en vuelo)
+        """
+        vuelo = self.almacen.obtener(vuelo_id)
+        if vuelo is None:
+            return None
+        referencia = vuelo.get('trayectoria_ref')
+        if referencia:
+            vuelo['trayectoria'] = self.trayectorias.leer(referencia)
+        elif vuelo_id in self.estado_vuelos:
+            vuelo['trayectoria'] = list(self.estado_vuelos[vuelo_id].get('trayectoria') or [])
+        return vuelo
+    
+    def actualizar_hora_llegada(self, vuelo_id, hora_llegada, trayectoria=None):
+        """
+        Actualiza la hora de llegada de un vuelo existente y archiva su trayectoria.
+        Parche al log JSONL (O(1), la compactación lo integra después) o UPDATE
+        por clave primaria en SQLite
+        """
         try:
-            if not os.path.exists(self.archivo_datos):
-                print(f"⚠️  No se puede actualizar: archivo no existe")
-                return False
-            
-            # Leer todas las líneas
-            lineas = []
-            actualizado = False
-            
-            with open(self.archivo_datos, 'r', encoding='utf-8') as f:
-                for linea in f:
-                    if linea.strip():
-                        try:
-                            vuelo = json.loads(linea)
-                            if vuelo.get('id') == vuelo_id:
-                                vuelo['hora_llegada'] = hora_llegada
-                                vuelo['actualizado_en'] = datetime.now().isoformat()
-                                actualizado = True
-                            lineas.append(json.dumps(vuelo, ensure_ascii=False))
-                        except:
-                            lineas.append(linea.strip())
-            
-            # Reescribir archivo con la actualización
-            if actualizado:
-                with open(self.archivo_datos, 'w', encoding='utf-8') as f:
-                    for linea in lineas:
-                        f.write(linea + '\n')
-                    f.flush()
-                    os.fsync(f.fileno())
-                print(f"✅ Hora de llegada actualizada para vuelo {vuelo_id}")
-                return True
-            else:
+            campos = {
+                'hora_llegada': hora_llegada,
+                'actualizado_en': datetime.now().isoformat()
+            }
+            if trayectoria:
+                campos['trayectoria_ref'] = self.trayectorias.archivar(vuelo_id, trayectoria)
+            actualizado = self.almacen.agregar_parche(vuelo_id, campos)
+            if not actualizado:
                 print(f"⚠️  Vuelo {vuelo_id} no encontrado para actualizar")
                 return False
+            print(f"✅ Hora de llegada actualizada para vuelo {vuelo_id}")
+            return True
                 
         except Exception as e:
             print(f"❌ Error actualizando hora de llegada: {e}")
             return False
     
     def obtener_estadisticas(self):
-        """Calcula estadísticas de vuelos guardados"""
+        """Estadísticas de vuelos guardados (agregados incrementales o consultas SQL indexadas)"""
         try:
-            if not os.path.exists(self.archivo_datos):
-                return {
-                    'total_vuelos': 0,
-                    'distancia_total': 0,
-                    'promedio_velocidad': 0
-                }
-            
-            total_vuelos = 0
-            distancia_total = 0
-            velocidad_total = 0
-            rutas = {}
-            
-            with open(self.archivo_datos, 'r', encoding='utf-8') as f:
-                for linea in f:
-                    if linea.strip():
-                        try:
-                            vuelo = json.loads(linea)
-                            total_vuelos += 1
-                            distancia_total += vuelo.get('distancia_total', 0)
-                            velocidad_total += vuelo.get('velocidad', 0)
-                            
-                            # Contar rutas
-                            ruta = f"{vuelo['origen']['code']}-{vuelo['destino']['code']}"
-                            rutas[ruta] = rutas.get(ruta, 0) + 1
-                        except:
-                            pass
-            
-            return {
-                'total_vuelos': total_vuelos,
-                'distancia_total': round(distancia_total, 2),
-                'promedio_velocidad': round(velocidad_total / total_vuelos if total_vuelos > 0 else 0, 2),
-                'rutas_populares': sorted(rutas.items(), key=lambda x: x[1], reverse=True)[:5]
-            }
-            
+            return self.almacen.resumen_estadisticas()
         except Exception as e:
             print(f"❌ Error calculando estadísticas: {e}")
             return None
 
     def compactar_archivo(self):
-        try:
-            if not os.path.exists(self.archivo_datos):
-                return
-            registros = {}
-            with open(self.archivo_datos, 'r', encoding='utf-8') as f:
-                for linea in f:
-                    if linea.strip():
-                        try:
-                            v = json.loads(linea)
-                            vid = v.get('id')
-                            ts = v.get('timestamp_unix') or 0
-                            if vid:
-                                if vid not in registros or ts >= (registros[vid].get('timestamp_unix') or 0):
-                                    registros[vid] = v
-                        except:
-                            pass
-            with open(self.archivo_datos, 'w', encoding='utf-8') as f:
-                for v in registros.values():
-                    f.write(json.dumps(v, ensure_ascii=False) + '\n')
-                f.flush()
-                os.fsync(f.fileno())
-            self.vuelos_guardados = len(registros)
-            print(f"🧹 Compactación realizada: {self.vuelos_guardados} vuelos únicos")
-        except Exception as e:
-            print(f"❌ Error en compactación: {e}")
+        """Mantenimiento del backend (fusión de segmentos JSONL o checkpoint del WAL de SQLite)"""
+        self.almacen.compactar()
+    
+    def procesar_mensaje(self, mensaje):
+        """Procesa un mensaje recibido del coordinador"""
+        tipo = mensaje.get('tipo')
+
+        if tipo == 'guardar_vuelo':
+            # Registrar vuelo cuando aparece (con todos los atributos)
+            vuelo = mensaje.get('vuelo')
+            if vuelo:
+                self.estado_vuelos[vuelo['id']] = vuelo
+                print(f"📥 Registrando nuevo vuelo {vuelo.get('id')} en BD")
+                resultado = self.guardar_vuelo(vuelo)
+                if resultado:
+                    print(f"   ✅ Vuelo registrado exitosamente en BD")
+        elif tipo == 'vuelo_update':
+            # Guardar cada actualización para tener historial en JSONL
+            vuelo = self.aplicar_update(mensaje)
+            if vuelo:
+                self.guardar_vuelo(vuelo, anunciar=False)
+
+        elif tipo == 'vuelo_completado':
+            # Solo actualizar hora de llegada del vuelo existente
+            vuelo = mensaje.get('vuelo')
+            if vuelo:
+                vuelo_id = vuelo.get('id')
+                estado = self.estado_vuelos.pop(vuelo_id, None)
+                if estado is None:
+                    # Una llegada repetida no vuelve a archivar la trayectoria ni a parchear
+                    guardado = self.almacen.obtener(vuelo_id)
+                    if guardado and guardado.get('trayectoria_ref'):
+                        return
+                    estado = {}
+                trayectoria = vuelo.get('trayectoria') or estado.get('trayectoria')
+                hora_llegada = vuelo.get('hora_llegada') or vuelo.get('fin')
+                print(f"📥 Actualizando hora de llegada para vuelo {vuelo_id}")
+                # Hora de llegada en el registro; la trayectoria va al archivo columnar
+                self.actualizar_hora_llegada(vuelo_id, hora_llegada, trayectoria)
+
+        elif tipo == 'obtener_estadisticas':
+            stats = self.obtener_estadisticas()
+            if stats:
+                respuesta = {
+                    'tipo': 'estadisticas',
+                    'datos': stats
+                }
+                # Enviar respuesta al coordinador para que la reenvíe al solicitante
+                self.socket.sendall(codificar(respuesta, self.formato))
+        elif tipo == 'reset_estado':
+            print("♻️  Reset de estado recibido en M3: reiniciando base de datos")
+            self.resetear_base()
+        
+        elif tipo == 'frame':
+            # Frame del simulador: los vuelo_update de un tick agrupados
+            for sub in mensajes_de_frame(mensaje):
+                self.procesar_mensaje(sub)
     
     def recibir_mensajes(self):
         """Recibe mensajes del coordinador"""
-        buffer = ""
         while self.running:
             try:
-                data = self.socket.recv(8192)
-                if not data:
+                mensajes = self.decodificador.leer(self.socket)
+                if mensajes is None:
                     break
                 
-                buffer += data.decode('utf-8')
-                
-                while '\n' in buffer:
-                    linea, buffer = buffer.split('\n', 1)
-                    if linea.strip():
-                        try:
-                            mensaje = json.loads(linea)
-                            tipo = mensaje.get('tipo')
-                            
-                            if tipo == 'guardar_vuelo':
-                                # Registrar vuelo cuando aparece (con todos los atributos)
-                                vuelo = mensaje.get('vuelo')
-                                if vuelo:
-                                    print(f"📥 Registrando nuevo vuelo {vuelo.get('id')} en BD")
-                                    resultado = self.guardar_vuelo(vuelo)
-                                    if resultado:
-                                        print(f"   ✅ Vuelo registrado exitosamente en BD")
-                            elif tipo == 'vuelo_update':
-                                # Guardar cada actualización para tener historial en JSONL
-                                vuelo = mensaje.get('vuelo')
-                                if vuelo:
-                                    self.guardar_vuelo(vuelo)
-                            
-                            elif tipo == 'vuelo_completado':
-                                # Solo actualizar hora de llegada del vuelo existente
-                                vuelo = mensaje.get('vuelo')
-                                if vuelo:
-                                    vuelo_id = vuelo.get('id')
-                                    hora_llegada = vuelo.get('hora_llegada') or vuelo.get('fin')
-                                    print(f"📥 Actualizando hora de llegada para vuelo {vuelo_id}")
-                                    # Actualizar solo la hora de llegada en el archivo
-                                    self.actualizar_hora_llegada(vuelo_id, hora_llegada)
-                            
-                            elif tipo == 'obtener_estadisticas':
-                                stats = self.obtener_estadisticas()
-                                if stats:
-                                    respuesta = {
-                                        'tipo': 'estadisticas',
-                                        'datos': stats
-                                    }
-                                    # Enviar respuesta al coordinador para que la reenvíe al solicitante
-                                    self.socket.send((json.dumps(respuesta) + '\n').encode('utf-8'))
-                            elif tipo == 'reset_estado':
-                                print("♻️  Reset de estado recibido en M3: reiniciando base de datos")
-                                self.resetear_base()
-                        except json.JSONDecodeError as e:
-                            print(f"⚠️  Error JSON: {e}")
+                for mensaje, _ in mensajes:
+                    self.procesar_mensaje(mensaje)
                         
             except Exception as e:
                 print(f"❌ Error recibiendo mensajes: {e}")
@@ -293,8 +269,23 @@ class BaseDatos:
                     print(f"   Rutas más frecuentes:")
                     for ruta, count in stats['rutas_populares']:
                         print(f"     • {ruta}: {count} vuelos")
+                self.reportar_escritura()
+                print(f"   Trayectorias archivadas: {self.trayectorias.tamano() / 2 ** 20:,.1f} MB")
                 print("="*60)
     
+    def reportar_escritura(self):
+        """Registros/s y fsyncs/s logrados por el escritor desde el último reporte"""
+        metricas = self.almacen.metricas()
+        instante, registros, fsyncs = self.metricas_previas
+        ahora = time.time()
+        transcurrido = max(ahora - instante, 1e-9)
+        self.metricas_previas = (ahora, metricas['registros'], metricas['fsyncs'])
+        print(f"   Escritura ({metricas['modo']}): {(metricas['registros'] - registros) / transcurrido:,.0f} registros/s, "
+              f"{(metricas['fsyncs'] - fsyncs) / transcurrido:,.1f} fsyncs/s, "
+              f"{metricas['registros'] / max(metricas['lotes'], 1):.1f} registros/lote, "
+              f"{metricas['pendientes']} en cola"
+              + (f", {metricas['segmentos']} segmentos" if 'segmentos' in metricas else ""))
+    
     def iniciar(self):
         """Inicia la base de datos"""
         if not self.conectar():
@@ -311,15 +302,16 @@ class BaseDatos:
             print("\n👋 Cerrando base de datos...")
             self.running = False
             self.resetear_base()
+            self.almacen.cerrar()
+            self.trayectorias.cerrar()
 
     def resetear_base(self):
         try:
             with self.lock:
-                with open(self.archivo_datos, 'w', encoding='utf-8') as f:
-                    f.write('')
-                    f.flush()
-                    os.fsync(f.fileno())
+                self.almacen.reiniciar()
+                self.trayectorias.reiniciar()
                 self.vuelos_guardados = 0
+                self.estado_vuelos = {}
             print("🗑️ BD reiniciada: 0 vuelos")
         except Exception as e:
             print(f"❌ Error reiniciando BD: {e}")
@@ -6,12 +6,18 @@ import socket
 import json
 import time
 import threading
-from flask import Flask, render_template
+from flask import Flask, render_template, request
 from flask_socketio import SocketIO, emit
 import os
-import math
 from datetime import datetime, timedelta
 
+from rutas import TablaRutas
+import geo
+from trayectoria import Trayectoria
+from indice_espacial import IndiceEspacial, VistaCliente
+from frame_binario import empaquetar_frame
+from protocolo import FORMATO_JSON, Decodificador, codificar, mensajes_de_frame, negociar
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'simulador_trafico_aereo_2025'
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
@@ -25,13 +31,23 @@ class VisualizadorMapa:
         self.hosts = [h.strip() for h in hosts_env.split(',')] if hosts_env else [host_env.strip() if host_env else coordinador_host]
         self.coordinador_host = self.hosts[0]
         self.socket_coord = None
+        self.formato = FORMATO_JSON  # Formato negociado con el coordinador
+        self.decodificador = Decodificador()
         self.running = True
         self.vuelos_activos = {}
+        self.trayectorias = {}  # id -> Trayectoria (acotada y simplificada)
+        self.indice = IndiceEspacial()  # Posiciones actuales por celda
+        self.vistas = {}  # sid del navegador -> VistaCliente
+        self.numeros = {}  # id -> número int32 con el que viaja en los frames binarios
+        self.siguiente_numero = 0
         self.lock = threading.Lock()
         self.simulador_offline = False
         self.FACTOR_TIEMPO = 180
         self.DT = 0.2
+        # Frames por segundo hacia los navegadores (un lote por cliente y frame)
+        self.periodo_frame = 1.0 / max(0.5, float(os.getenv('FPS_MAPA', '5')))
         self.ultima_actualizacion = {}
+        self.rutas = TablaRutas(geo.RADIO_TIERRA)
         
     def conectar(self):
         while self.running:
@@ -42,17 +58,18 @@ class VisualizadorMapa:
                     info = {
                         'nombre': 'm4_mapa',
                         'tipo': 'visualizador',
-                        'version': '1.0'
+                        'version': '1.0',
+                        'temas': ['vuelo_nuevo', 'vuelo_update', 'frame', 'vuelo_completado',
+                                  'estadisticas', 'simulador_online', 'simulador_offline'],
                     }
-                    self.socket_coord.send(json.dumps(info).encode('utf-8'))
-                    respuesta_raw = self.socket_coord.recv(1024).decode('utf-8')
-                    respuesta_linea = respuesta_raw.split('\n', 1)[0].strip()
-                    confirmacion = json.loads(respuesta_linea)
+                    confirmacion, formato, sobrante = negociar(self.socket_coord, info)
                     if confirmacion['status'] == 'OK':
                         with self.lock:
-                            self.vuelos_activos = {}
+                            self.limpiar_estado()
+                        self.formato = formato
+                        self.decodificador = Decodificador(formato, sobrante)
                         self.coordinador_host = host
-                        print(f"🗺️  [M4-MAPA] Conectado al coordinador en {host}:{self.coordinador_port}")
+                        print(f"🗺️  [M4-MAPA] Conectado al coordinador en {host}:{self.coordinador_port} ({formato})")
                         print(f"   Acceso web: http://localhost:5000")
                         return True
                 except Exception as e:
@@ -63,24 +80,15 @@ class VisualizadorMapa:
     
     def recibir_actualizaciones(self):
         """Recibe actualizaciones de vuelos del coordinador"""
-        buffer = ""
         while self.running:
             try:
-                data = self.socket_coord.recv(8192)
-                if not data:
+                mensajes = self.decodificador.leer(self.socket_coord)
+                if mensajes is None:
                     print("⚠️  Conexión cerrada por el coordinador")
                     break
                 
-                buffer += data.decode('utf-8')
-                
-                while '\n' in buffer:
-                    linea, buffer = buffer.split('\n', 1)
-                    if linea.strip():
-                        try:
-                            mensaje = json.loads(linea)
-                            self.procesar_mensaje(mensaje)
-                        except json.JSONDecodeError as e:
-                            print(f"⚠️  Error JSON en línea: {linea[:100]}")
+                for mensaje, _ in mensajes:
+                    self.procesar_mensaje(mensaje)
                         
             except Exception as e:
                 print(f"❌ Error recibiendo actualizaciones: {e}")
@@ -110,20 +118,34 @@ class VisualizadorMapa:
                     if not vuelo.get('lat_actual') or not vuelo.get('lon_actual'):
                         vuelo['lat_actual'] = vuelo['origen']['lat']
                         vuelo['lon_actual'] = vuelo['origen']['lon']
-                    vuelo['trayectoria'] = (vuelo.get('trayectoria') or []) + [[vuelo['lat_actual'], vuelo['lon_actual']]]
+                    self.registrar_trayectoria(vuelo, agregar_actual=True)
                     self.ultima_actualizacion[vuelo['id']] = time.time()
                 print(f"✈️  Nuevo vuelo en mapa: {vuelo['id']}")
-                # Emitir a todos los clientes web
-                socketio.emit('nuevo_vuelo', vuelo, namespace='/')
+                # Emitir a los clientes web que tienen el vuelo en su vista
+                self.difundir(vuelo, vuelo)
         
         elif tipo == 'vuelo_update':
             vuelo = mensaje.get('vuelo')
             if vuelo:
                 vuelo_id = vuelo['id']
                 with self.lock:
-                    if vuelo_id in self.vuelos_activos:
+                    v = self.vuelos_activos.get(vuelo_id)
+                    if mensaje.get('delta'):
+                        # Delta: solo campos cambiados + el nuevo punto de trayectoria
+                        if v is None:
+                            return  # Sin estado base: se recupera con el próximo keyframe
+                        punto = vuelo.pop('punto', None)
+                        v.update(vuelo)
+                        if punto:
+                            trayectoria = self.trayectorias.get(vuelo_id)
+                            if trayectoria is None:
+                                trayectoria = self.registrar_trayectoria(v)
+                            trayectoria.agregar(*punto)
+                        self.ultima_actualizacion[vuelo_id] = time.time()
+                    elif v is not None or mensaje.get('keyframe'):
+                        # Keyframe: estado completo con la trayectoria del simulador
                         self.vuelos_activos[vuelo_id] = vuelo
-                        v = self.vuelos_activos[vuelo_id]
+                        v = vuelo
                         if not v.get('lat_actual') or not v.get('lon_actual'):
                             t = v.get('progreso') or 0.0
                             lat, lon = self.slerp(
@@ -133,10 +155,16 @@ class VisualizadorMapa:
                             )
                             v['lat_actual'] = lat
                             v['lon_actual'] = lon
-                        v['trayectoria'] = (v.get('trayectoria') or []) + [[v['lat_actual'], v['lon_actual']]]
+                        self.registrar_trayectoria(v)
                         self.ultima_actualizacion[vuelo_id] = time.time()
-                # Emitir actualización
-                socketio.emit('actualizar_vuelo', vuelo, namespace='/')
+                # Marcar el vuelo sucio para el próximo frame de quien lo ve
+                if v is not None:
+                    self.difundir(v, vuelo)
+        
+        elif tipo == 'frame':
+            # Frame del simulador: los vuelo_update de un tick agrupados
+            for sub in mensajes_de_frame(mensaje):
+                self.procesar_mensaje(sub)
         
         elif tipo == 'vuelo_completado':
             vuelo = mensaje.get('vuelo')
@@ -145,7 +173,14 @@ class VisualizadorMapa:
                 with self.lock:
                     if vuelo_id in self.vuelos_activos:
                         del self.vuelos_activos[vuelo_id]
-                # Notificar llegada
+                    self.trayectorias.pop(vuelo_id, None)
+                    self.indice.quitar(vuelo_id)
+                    self.numeros.pop(vuelo_id, None)
+                    for vista in self.vistas.values():
+                        vista.visibles.discard(vuelo_id)
+                        vista.pendientes.pop(vuelo_id, None)
+                        vista.fuera.discard(vuelo_id)
+                # Notificar llegada a todos (alimenta los contadores de cada página)
                 socketio.emit('vuelo_completado', vuelo, namespace='/')
                 print(f"🛬 Vuelo completado: {vuelo_id}")
         
@@ -170,7 +205,7 @@ class VisualizadorMapa:
         elif tipo == 'reset_estado':
             print("♻️  Reset de estado recibido en M4: limpiando vuelos del frontend")
             with self.lock:
-                self.vuelos_activos = {}
+                self.limpiar_estado()
             socketio.emit('vuelos_iniciales', [], namespace='/')
 
     def emitir_actualizaciones_periodicas(self):
@@ -202,44 +237,163 @@ class VisualizadorMapa:
                                 )
                                 vuelo['lat_actual'] = lat
                                 vuelo['lon_actual'] = lon
-                                vuelo['trayectoria'] = (vuelo.get('trayectoria') or []) + [[lat, lon]]
-                    socketio.emit('actualizar_vuelo', vuelo, namespace='/')
+                                self.agregar_punto(vuelo, lat, lon)
+                        # Solo se reenvían los vuelos extrapolados: el resto llegó con su update
+                        self.difundir(vuelo, vuelo)
                 time.sleep(self.DT)
             except Exception:
                 time.sleep(self.DT)
 
-    def haversine(self, lat1, lon1, lat2, lon2):
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return 6371.0 * c
+    def registrar_trayectoria(self, vuelo, agregar_actual=False):
+        """Pasa la trayectoria recibida a un buffer acotado; el dict queda con la lista simplificada"""
+        trayectoria = Trayectoria.desde_puntos(vuelo.get('trayectoria') or [])
+        if agregar_actual or not len(trayectoria):
+            trayectoria.agregar(vuelo['lat_actual'], vuelo['lon_actual'])
+        self.trayectorias[vuelo['id']] = trayectoria
+        vuelo['trayectoria'] = trayectoria.puntos()
+        return trayectoria
+
+    def agregar_punto(self, vuelo, lat, lon):
+        """Agrega un punto calculado localmente (el vuelo se difunde completo después)"""
+        with self.lock:
+            trayectoria = self.trayectorias.get(vuelo['id'])
+            if trayectoria is None:
+                trayectoria = self.registrar_trayectoria(vuelo)
+            trayectoria.agregar(lat, lon)
+
+    def vuelo_completo(self, vuelo):
+        """
+        El dict del vuelo con su trayectoria materializada y su número para los
+        frames binarios (llamar con self.lock tomado)
+        """
+        trayectoria = self.trayectorias.get(vuelo['id'])
+        if trayectoria is not None:
+            vuelo['trayectoria'] = trayectoria.puntos()
+        vuelo['num'] = self.numero(vuelo['id'])
+        return vuelo
+
+    def numero(self, vuelo_id):
+        num = self.numeros.get(vuelo_id)
+        if num is None:
+            num = self.numeros[vuelo_id] = self.siguiente_numero
+            self.siguiente_numero = (self.siguiente_numero + 1) & 0x7FFFFFFF
+        return num
+
+    def limpiar_estado(self):
+        """Olvida todos los vuelos (llamar con self.lock tomado)"""
+        self.vuelos_activos = {}
+        self.trayectorias = {}
+        self.numeros = {}
+        self.indice.limpiar()
+        for vista in self.vistas.values():
+            vista.olvidar()
+
+    # ---------- Vistas de los navegadores ----------
+
+    def registrar_cliente(self, sid):
+        with self.lock:
+            self.vistas[sid] = VistaCliente()
+
+    def quitar_cliente(self, sid):
+        with self.lock:
+            self.vistas.pop(sid, None)
+
+    def instantanea(self, sid):
+        """Vuelos dentro de la vista del cliente, completos (quedan como ya enviados)"""
+        with self.lock:
+            vista = self.vistas.setdefault(sid, VistaCliente())
+            vuelos = [
+                self.vuelo_completo(self.vuelos_activos[i])
+                for i in self.indice.consultar(vista) if i in self.vuelos_activos
+            ]
+            vista.olvidar()
+            for vuelo in vuelos:
+                vista.entra(vuelo['id'])
+        return vuelos
+
+    def cambiar_vista(self, sid, sur, oeste, norte, este, zoom, binario=False):
+        """Nueva vista de un cliente: (vuelos que entran, completos; ids que salen)"""
+        with self.lock:
+            vista = self.vistas.setdefault(sid, VistaCliente())
+            vista.actualizar(sur, oeste, norte, este, zoom)
+            vista.binario = binario
+            dentro = {i for i in self.indice.consultar(vista) if i in self.vuelos_activos}
+            entran = [self.vuelo_completo(self.vuelos_activos[i]) for i in dentro - vista.visibles]
+            salen = list(vista.visibles - dentro)
+            for vuelo_id in salen:  # Se avisan ya, en la respuesta: no van al frame
+                vista.visibles.discard(vuelo_id)
+                vista.pendientes.pop(vuelo_id, None)
+            for vuelo in entran:
+                vista.entra(vuelo['id'])
+        return entran, salen
+
+    def difundir(self, vuelo, datos):
+        """
+        Registra un cambio del vuelo para los clientes cuya vista lo contiene.
+        A quien no lo tenía se le envía completo ya (nuevo_vuelo); para el
+        resto el vuelo queda sucio y viaja en su próximo frame, igual que el
+        aviso de salida para quien lo tenía y ya no lo ve
+        """
+        envios = []
+        with self.lock:
+            vuelo_id = vuelo['id']
+            lat, lon = vuelo['lat_actual'], vuelo['lon_actual']
+            self.indice.mover(vuelo_id, lat, lon)
+            for sid, vista in self.vistas.items():
+                if vista.contiene(lat, lon):
+                    if vuelo_id not in vista.visibles:
+                        vista.entra(vuelo_id)
+                        envios.append((self.vuelo_completo(vuelo), sid))
+                    else:
+                        vista.marcar(vuelo_id, datos)
+                elif vuelo_id in vista.visibles:
+                    vista.sale(vuelo_id)
+        for contenido, sid in envios:
+            self.emitir('nuevo_vuelo', contenido, sid)
+
+    def emitir(self, evento, contenido, sid):
+        socketio.emit(evento, contenido, to=sid, namespace='/')
+
+    def vaciar_pendientes(self, ahora):
+        """
+        Un frame por cliente con los vuelos sucios y los que salieron de su
+        vista: frame_binario con el estado actual en columnas si el cliente lo
+        pidió, si no frame_vuelos con los campos cambiados en JSON
+        """
+        envios = []
+        with self.lock:
+            for sid, vista in self.vistas.items():
+                frame = vista.tomar_frame(ahora, self.periodo_frame)
+                if frame is None:
+                    continue
+                if vista.binario:
+                    vuelos = [self.vuelos_activos[d['id']] for d in frame['vuelos'] if d['id'] in self.vuelos_activos]
+                    fuera = [self.numeros[i] for i in frame['fuera'] if i in self.numeros]
+                    datos = empaquetar_frame([self.numero(v['id']) for v in vuelos], vuelos, fuera)
+                    envios.append(('frame_binario', datos, sid))
+                else:
+                    envios.append(('frame_vuelos', frame, sid))
+        for evento, contenido, sid in envios:
+            self.emitir(evento, contenido, sid)
+
+    def enviar_pendientes_periodicamente(self):
+        """Emite los frames de cada cliente a FPS_MAPA e informa el total de vuelos"""
+        ultimo_total = 0.0
+        while self.running:
+            time.sleep(self.periodo_frame)
+            ahora = time.time()
+            try:
+                self.vaciar_pendientes(ahora)
+                if ahora - ultimo_total >= 2:
+                    # Cada página solo conoce los vuelos de su vista: el total lo informa el servidor
+                    socketio.emit('total_vuelos', {'activos': len(self.vuelos_activos)}, namespace='/')
+                    ultimo_total = ahora
+            except Exception as e:
+                print(f"❌ Error enviando actualizaciones acumuladas: {e}")
 
     def slerp(self, lat1, lon1, lat2, lon2, t):
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-        x1 = math.cos(lat1) * math.cos(lon1)
-        y1 = math.cos(lat1) * math.sin(lon1)
-        z1 = math.sin(lat1)
-        x2 = math.cos(lat2) * math.cos(lon2)
-        y2 = math.cos(lat2) * math.sin(lon2)
-        z2 = math.sin(lat2)
-        dot = x1*x2 + y1*y2 + z1*z2
-        omega = math.acos(max(-1, min(1, dot)))
-        if omega < 0.001:
-            x = x1 + t * (x2 - x1)
-            y = y1 + t * (y2 - y1)
-            z = z1 + t * (z2 - z1)
-        else:
-            sin_omega = math.sin(omega)
-            a = math.sin((1-t) * omega) / sin_omega
-            b = math.sin(t * omega) / sin_omega
-            x = a * x1 + b * x2
-            y = a * y1 + b * y2
-            z = a * z1 + b * z2
-        lat = math.atan2(z, math.sqrt(x*x + y*y))
-        lon = math.atan2(y, x)
-        return math.degrees(lat), math.degrees(lon)
+        """Slerp con las constantes de ruta cacheadas en la tabla de rutas compartida"""
+        return self.rutas.obtener(lat1, lon1, lat2, lon2).posicion(t)
 
     def loop_local(self):
         while self.running and self.simulador_offline:
@@ -266,17 +420,21 @@ class VisualizadorMapa:
                         )
                         vuelo['lat_actual'] = lat
                         vuelo['lon_actual'] = lon
-                        vuelo['trayectoria'] = (vuelo.get('trayectoria') or []) + [[lat, lon]]
-                    socketio.emit('actualizar_vuelo', vuelo, namespace='/')
+                        self.agregar_punto(vuelo, lat, lon)
+                    self.difundir(vuelo, vuelo)
             time.sleep(self.DT)
     
+    def enviar_coordinador(self, mensaje):
+        """Envía un mensaje al coordinador en el formato negociado"""
+        self.socket_coord.sendall(codificar(mensaje, self.formato))
+    
     def solicitar_estadisticas_periodicas(self):
         """Solicita estadísticas periódicamente"""
         while self.running:
             time.sleep(10)  # Cada 10 segundos
             try:
                 mensaje = {'tipo': 'solicitar_estadisticas'}
-                self.socket_coord.send((json.dumps(mensaje) + '\n').encode('utf-8'))
+                self.enviar_coordinador(mensaje)
             except:
                 pass
     
@@ -294,6 +452,9 @@ class VisualizadorMapa:
         # Thread para emitir actualizaciones periódicas a clientes web
         threading.Thread(target=self.emitir_actualizaciones_periodicas, daemon=True).start()
 
+        # Thread que emite los frames de cambios acumulados de cada cliente
+        threading.Thread(target=self.enviar_pendientes_periodicamente, daemon=True).start()
+
 # Instancia global
 visualizador = VisualizadorMapa()
 
@@ -309,22 +470,33 @@ def health():
 def handle_connect():
     """Cliente web conectado"""
     print(f"🌐 Cliente web conectado")
-    # Enviar vuelos actuales
-    with visualizador.lock:
-        vuelos = list(visualizador.vuelos_activos.values())
-    emit('vuelos_iniciales', vuelos)
+    # Los vuelos se envían cuando la página informa su vista (o los pide)
+    visualizador.registrar_cliente(request.sid)
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Cliente web desconectado"""
     print(f"🌐 Cliente web desconectado")
+    visualizador.quitar_cliente(request.sid)
 
 @socketio.on('solicitar_vuelos')
 def handle_solicitar_vuelos():
-    """Envía todos los vuelos actuales"""
-    with visualizador.lock:
-        vuelos = list(visualizador.vuelos_activos.values())
-    emit('vuelos_iniciales', vuelos)
+    """Envía los vuelos actuales dentro de la vista del cliente"""
+    emit('vuelos_iniciales', visualizador.instantanea(request.sid))
+
+@socketio.on('vista')
+def handle_vista(data):
+    """Límites y zoom del mapa del cliente: recibe lo que entra y se entera de lo que sale"""
+    try:
+        limites = [float(data[clave]) for clave in ('sur', 'oeste', 'norte', 'este')]
+        zoom = float(data['zoom'])
+    except (KeyError, TypeError, ValueError):
+        return
+    entran, salen = visualizador.cambiar_vista(request.sid, *limites, zoom, bool(data.get('binario')))
+    if salen:
+        emit('vuelos_fuera', salen)
+    if entran:
+        emit('vuelos_iniciales', entran)
 
 @socketio.on('comando_atc')
 def handle_comando_atc(data):
@@ -338,7 +510,7 @@ def handle_comando_atc(data):
         'valor': data.get('valor')
     }
     try:
-        visualizador.socket_coord.send((json.dumps(mensaje) + '\n').encode('utf-8'))
+        visualizador.enviar_coordinador(mensaje)
     except Exception as e:
         print(f"❌ Error enviando comando ATC: {e}")
 
@@ -354,7 +526,7 @@ def handle_crear_vuelo_manual(data):
             'destino': data.get('destino'),
             'velocidad': data.get('velocidad')
         }
-        visualizador.socket_coord.send((json.dumps(mensaje) + '\n').encode('utf-8'))
+        visualizador.enviar_coordinador(mensaje)
         emit('crear_vuelo_ack', {'ok': True})
     except Exception as e:
         print(f"❌ Error enviando creación de vuelo: {e}")
@@ -366,7 +538,7 @@ def handle_pedir_estadisticas():
     print("📊 Solicitando estadísticas...")
     mensaje = {'tipo': 'solicitar_estadisticas'}
     try:
-        visualizador.socket_coord.send((json.dumps(mensaje) + '\n').encode('utf-8'))
+        visualizador.enviar_coordinador(mensaje)
     except Exception as e:
         print(f"❌ Error solicitando estadísticas: {e}")
 
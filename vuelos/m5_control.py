@@ -9,6 +9,8 @@ import threading
 import os
 import random
 
+from protocolo import FORMATO_JSON, codificar, negociar
+
 class PanelControl:
     def __init__(self, coordinador_host='localhost', coordinador_port=5555):
         host_env = os.getenv('COORDINADOR_HOST')
@@ -16,6 +18,7 @@ class PanelControl:
         self.coordinador_host = host_env.strip() if host_env else coordinador_host
         self.coordinador_port = int(port_env) if port_env else coordinador_port
         self.socket = None
+        self.formato = FORMATO_JSON  # Formato negociado con el coordinador
         self.running = True
         
     def conectar(self):
@@ -29,13 +32,11 @@ class PanelControl:
                 info = {
                     'nombre': 'm5_control',
                     'tipo': 'panel_control',
-                    'version': '1.0'
+                    'version': '1.0',
+                    'temas': [],  # Solo envía comandos: no recibe broadcasts
                 }
-                self.socket.send(json.dumps(info).encode('utf-8'))
-                
-                # Esperar confirmación
-                respuesta = self.socket.recv(1024).decode('utf-8')
-                confirmacion = json.loads(respuesta)
+                # Enviar identificación y esperar confirmación (negocia el formato)
+                confirmacion, self.formato, _ = negociar(self.socket, info)
                 
                 if confirmacion['status'] == 'OK':
                     print(f"🎮 [M5-CONTROL] Conectado al coordinador")
@@ -56,7 +57,7 @@ class PanelControl:
                 'comando': comando,
                 **kwargs
             }
-            self.socket.send(json.dumps(mensaje).encode('utf-8'))
+            self.socket.sendall(codificar(mensaje, self.formato))
             print(f"✅ Comando '{comando}' enviado")
             return True
         except Exception as e:
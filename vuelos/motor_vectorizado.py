@@ -0,0 +1,377 @@
+"""
+MOTOR VECTORIZADO (M2)
+Mantiene el estado dinámico de los vuelos en arreglos NumPy contiguos y
+avanza toda la flota con una sola pasada de Slerp por tick. También lleva
+el cono de simplificación de cada trayectoria (ver trayectoria.py) y arma
+en bloque los deltas de posición del frame, así que solo los vuelos que
+emiten un mensaje completo se vuelcan a su RegistroVuelo
+"""
+import math
+from datetime import datetime
+
+import geo
+from almacen_vuelos import iso
+from protocolo import LARGO_MAXIMO_ID
+from trayectoria import TOLERANCIA_GRADOS
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él se usa el motor escalar
+    np = None
+
+# Registro fijo de posición del protocolo binario (REGISTRO_POSICION, '<16s6d')
+TIPO_POSICION = np.dtype([
+    ('id', f'S{LARGO_MAXIMO_ID}'), ('lat', '<f8'), ('lon', '<f8'), ('progreso', '<f8'),
+    ('combustible', '<f8'), ('distancia_restante', '<f8'), ('eta', '<f8')
+]) if np is not None else None
+
+
+def _desfase_local(timestamp):
+    return datetime.fromtimestamp(timestamp).astimezone().utcoffset().total_seconds()
+
+
+def iso_lote(timestamps):
+    """
+    iso() de un arreglo de timestamps en una sola pasada (NaN -> None). Redondea
+    los microsegundos como datetime.fromtimestamp; si el desfase horario cambia
+    dentro del lote (horario de verano) formatea uno por uno
+    """
+    validos = ~np.isnan(timestamps)
+    if not validos.any():
+        return [None] * len(timestamps)
+    tiempos = np.where(validos, timestamps, timestamps[validos][0])
+    desfase = _desfase_local(float(tiempos.min()))
+    if desfase != _desfase_local(float(tiempos.max())):
+        return [iso(t) if t == t else None for t in timestamps.tolist()]
+    segundos = np.floor(tiempos)
+    micro = ((segundos.astype(np.int64) + int(desfase)) * 1_000_000
+             + np.round((tiempos - segundos) * 1e6).astype(np.int64))
+    textos = np.datetime_as_string(micro.astype('datetime64[us]')).tolist()
+    if not validos.all():
+        for k in np.flatnonzero(~validos).tolist():
+            textos[k] = None
+    return textos
+
+
+class MotorVectorizado:
+    """Estado de la flota en forma de arreglos (un índice por vuelo)"""
+
+    # Arreglos por vuelo y su tipo (p0/p1 aparte: son (n, 3))
+    CAMPOS = {
+        'omega': 'f8', 'sin_omega': 'f8', 'progreso': 'f8', 'velocidad': 'f8',
+        'combustible': 'f8', 'distancia_total': 'f8', 'rumbo': 'f8',
+        'lat': 'f8', 'lon': 'f8', 'distancia_restante': 'f8', 'eta_horas': 'f8',
+        'emergencia': bool,
+        # Cono de la trayectoria: último punto fijo y rango de rumbos
+        'ancla_lat': 'f8', 'ancla_lon': 'f8', 'rumbo_base': 'f8',
+        'cono_min': 'f8', 'cono_max': 'f8', 'alcance': 'f8', 'con_ultimo': bool,
+        # Para armar el frame sin tocar los registros
+        'hash_id': 'i8', 'id_bytes': f'S{LARGO_MAXIMO_ID}', 'id_corto': bool
+    }
+
+    def __init__(self, radio_tierra, aeropuertos, capacidad=1024):
+        if np is None:
+            raise ImportError("El motor vectorizado requiere NumPy (pip install numpy)")
+        self.RADIO_TIERRA = radio_tierra
+        self.aeropuertos = aeropuertos  # TablaAeropuertos compartida con el almacén
+        self.n = 0
+        self.capacidad = 0
+        self.ids = []       # índice -> id de vuelo
+        self.indices = {}   # id de vuelo -> índice
+        self.trayectorias = []  # índice -> Trayectoria del vuelo (recibe los puntos fijos)
+        self.p0 = np.zeros((0, 3))
+        self.p1 = np.zeros((0, 3))
+        for campo, tipo in self.CAMPOS.items():
+            setattr(self, campo, np.zeros(0, dtype=tipo))
+        self._crecer(capacidad)
+
+    def _crecer(self, capacidad):
+        """Redimensiona los arreglos conservando los primeros n vuelos"""
+        n = self.n
+        for campo in ('p0', 'p1'):
+            nuevo = np.zeros((capacidad, 3))
+            nuevo[:n] = getattr(self, campo)[:n]
+            setattr(self, campo, nuevo)
+        for campo, tipo in self.CAMPOS.items():
+            nuevo = np.zeros(capacidad, dtype=tipo)
+            nuevo[:n] = getattr(self, campo)[:n]
+            setattr(self, campo, nuevo)
+        self.capacidad = capacidad
+
+    def agregar(self, vuelo):
+        """Registra un vuelo; las constantes de la ruta se calculan una sola vez"""
+        if vuelo.id in self.indices:
+            self.eliminar(vuelo.id)
+        if self.n == self.capacidad:
+            self._crecer(self.capacidad * 2)
+        i = self.n
+        ruta = vuelo.ruta  # Constantes precalculadas en la tabla de rutas
+
+        self.p0[i] = ruta.p0
+        self.p1[i] = ruta.p1
+        self.omega[i] = ruta.omega
+        self.sin_omega[i] = ruta.sin_omega
+        self.distancia_total[i] = vuelo.distancia_total
+        self.rumbo[i] = vuelo.rumbo
+        self.lat[i] = vuelo.lat_actual
+        self.lon[i] = vuelo.lon_actual
+        self.distancia_restante[i] = vuelo.distancia_total
+        self.eta_horas[i] = 0.0
+        self.progreso[i] = vuelo.progreso
+        self.combustible[i] = vuelo.combustible
+        self.sincronizar(vuelo, i)
+
+        trayectoria = vuelo.trayectoria
+        self.ancla_lat[i] = trayectoria.ancla_lat
+        self.ancla_lon[i] = trayectoria.ancla_lon
+        self.rumbo_base[i] = trayectoria.rumbo_base
+        self.cono_min[i] = trayectoria.cono_min
+        self.cono_max[i] = trayectoria.cono_max
+        self.alcance[i] = trayectoria.alcance
+        self.con_ultimo[i] = trayectoria.ultimo is not None
+
+        id_bytes = vuelo.id.encode('utf-8')
+        self.hash_id[i] = hash(vuelo.id)
+        self.id_bytes[i] = id_bytes[:LARGO_MAXIMO_ID]
+        self.id_corto[i] = len(id_bytes) <= LARGO_MAXIMO_ID
+
+        self.ids.append(vuelo.id)
+        self.trayectorias.append(trayectoria)
+        self.indices[vuelo.id] = i
+        self.n += 1
+
+    def sincronizar(self, vuelo, i=None):
+        """Copia al motor los campos que pueden cambiar fuera del tick (comandos ATC)"""
+        if i is None:
+            i = self.indices.get(vuelo.id)
+            if i is None:
+                return
+        self.velocidad[i] = vuelo.velocidad
+        self.emergencia[i] = vuelo.emergencia
+
+    def eliminar(self, vuelo_id):
+        """Quita un vuelo moviendo el último a su posición (O(1))"""
+        i = self.indices.pop(vuelo_id, None)
+        if i is None:
+            return
+        ultimo = self.n - 1
+        if i != ultimo:
+            self.p0[i] = self.p0[ultimo]
+            self.p1[i] = self.p1[ultimo]
+            for campo in self.CAMPOS:
+                arreglo = getattr(self, campo)
+                arreglo[i] = arreglo[ultimo]
+            movido = self.ids[ultimo]
+            self.ids[i] = movido
+            self.trayectorias[i] = self.trayectorias[ultimo]
+            self.indices[movido] = i
+        self.ids.pop()
+        self.trayectorias.pop()
+        self.n -= 1
+
+    def limpiar(self):
+        self.n = 0
+        self.ids = []
+        self.indices = {}
+        self.trayectorias = []
+
+    def avanzar(self, dt, factor_tiempo, clima):
+        """
+        Avanza todos los vuelos un tick.
+        Devuelve (emergencias_nuevas, sin_combustible, completados) como arreglos de índices.
+        """
+        n = self.n
+        if n == 0:
+            vacio = np.zeros(0, dtype=np.intp)
+            return vacio, vacio, vacio
+
+        velocidad = self.velocidad[:n]
+        emergencia = self.emergencia[:n]
+
+        # Efecto del viento (simplificado)
+        velocidad_real = velocidad.copy()
+        if clima['viento_velocidad'] > 0:
+            diferencia_angulo = np.abs(self.rumbo[:n] - clima['viento_direccion'])
+            ajuste = clima['viento_velocidad'] * 0.5
+            velocidad_real[diferencia_angulo < 45] += ajuste
+            velocidad_real[diferencia_angulo > 135] -= ajuste
+
+        # Evento aleatorio: emergencia (0.1% por tick). Como en el motor escalar,
+        # la velocidad reducida se aplica desde el tick siguiente
+        emergencias = np.flatnonzero(~emergencia & (np.random.random(n) < 0.001))
+        if emergencias.size:
+            emergencia[emergencias] = True
+            velocidad[emergencias] *= 0.8
+
+        # Consumo de combustible y distancia recorrida en el tick
+        distancia_tick = velocidad_real * (dt / 3600.0) * factor_tiempo
+        combustible = self.combustible[:n]
+        con_combustible = combustible > 0
+        combustible -= distancia_tick
+        sin_combustible = np.flatnonzero(con_combustible & (combustible <= 0))
+        emergencia[sin_combustible] = True
+
+        distancia_total = self.distancia_total[:n]
+        progreso = self.progreso[:n]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            incremento = np.where(distancia_total > 0, distancia_tick / distancia_total, 1.0)
+        progreso += incremento
+        completados = np.flatnonzero(progreso >= 1.0)
+        progreso[completados] = 1.0
+
+        # Slerp por lotes (geo.py); la distancia restante es (1 - t) de la ruta
+        lat, lon = geo.slerp_np(self.p0[:n], self.p1[:n], self.omega[:n], self.sin_omega[:n], progreso)
+        np.multiply(1.0 - progreso, distancia_total, out=self.distancia_restante[:n])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.eta_horas[:n] = np.where(velocidad_real != 0, self.distancia_restante[:n] / velocidad_real, np.nan)
+        lat = np.degrees(lat)
+        lon = np.degrees(lon)
+        # Los que llegan conservan la posición anterior (extremo de su trayectoria):
+        # completar_vuelo los lleva al destino, como en el motor escalar
+        en_vuelo = np.ones(n, dtype=bool)
+        en_vuelo[completados] = False
+        lat[completados] = self.lat[completados]
+        lon[completados] = self.lon[completados]
+        self._seguir_trayectorias(lat, lon, en_vuelo)
+        self.lat[:n] = lat
+        self.lon[:n] = lon
+
+        return emergencias, sin_combustible, completados
+
+    def _seguir_trayectorias(self, lat, lon, en_vuelo):
+        """
+        Trayectoria.agregar para toda la flota: mientras el punto nuevo cae en
+        el cono solo se estrechan los arreglos; los vuelos que se salen fijan su
+        extremo provisional (la posición anterior) en su Trayectoria
+        """
+        n = self.n
+        tolerancia = TOLERANCIA_GRADOS
+        con_ultimo = self.con_ultimo[:n]
+        alcance = self.alcance[:n]
+        cono_min = self.cono_min[:n]
+        cono_max = self.cono_max[:n]
+
+        dlat = lat - self.ancla_lat[:n]
+        dlon = lon - self.ancla_lon[:n]
+        distancia = np.hypot(dlat, dlon)
+        # Rumbo relativo al del cono, en (-pi, pi]
+        rumbo = np.arctan2(dlat, dlon) - self.rumbo_base[:n]
+        rumbo[rumbo > math.pi] -= 2 * math.pi
+        rumbo[rumbo <= -math.pi] += 2 * math.pi
+
+        siguen = en_vuelo & con_ultimo
+        # Todo cerca del punto fijo: cualquier recta sirve
+        siguen &= ~((distancia <= tolerancia) & (alcance <= tolerancia))
+        dentro = siguen & (cono_min <= rumbo) & (rumbo <= cono_max) & (distancia >= alcance - tolerancia)
+        fuera = np.flatnonzero(siguen & ~dentro)
+
+        dentro = np.flatnonzero(dentro)
+        if dentro.size:
+            abertura = tolerancia / distancia[dentro]
+            alcance[dentro] = np.maximum(alcance[dentro], distancia[dentro])
+            cono_min[dentro] = np.maximum(cono_min[dentro], rumbo[dentro] - abertura)
+            cono_max[dentro] = np.minimum(cono_max[dentro], rumbo[dentro] + abertura)
+
+        # Se salen del cono: el extremo provisional pasa a ser un punto fijo
+        for i in fuera.tolist():
+            self.ancla_lat[i], self.ancla_lon[i] = self.trayectorias[i].fijar(float(self.lat[i]), float(self.lon[i]))
+
+        # Sin extremo provisional (o recién fijado): el punto nuevo abre el cono
+        abrir = np.concatenate((np.flatnonzero(en_vuelo & ~con_ultimo), fuera))
+        if abrir.size:
+            dlat = lat[abrir] - self.ancla_lat[abrir]
+            dlon = lon[abrir] - self.ancla_lon[abrir]
+            distancia = np.hypot(dlat, dlon)
+            self.rumbo_base[abrir] = np.arctan2(dlat, dlon)
+            alcance[abrir] = distancia
+            with np.errstate(divide='ignore'):
+                abertura = np.where(distancia <= tolerancia, math.pi, tolerancia / distancia)
+            cono_min[abrir] = -abertura
+            cono_max[abrir] = abertura
+        con_ultimo |= en_vuelo
+
+    def separar(self, tick, keyframe_ticks, marcados, completados, binario):
+        """
+        Reparte los vuelos en vuelo entre los que emiten un mensaje completo
+        (keyframe como SimuladorVuelos.es_keyframe, campos marcados o, en
+        binario, id que no entra en el registro) y los de solo posición.
+        Devuelve los dos arreglos de índices
+        """
+        n = self.n
+        completo = (self.hash_id[:n] % keyframe_ticks + tick % keyframe_ticks) % keyframe_ticks == 0
+        for vuelo_id in marcados:
+            completo[self.indices[vuelo_id]] = True
+        if binario:
+            completo |= ~self.id_corto[:n]
+        solo_posicion = ~completo
+        completo[completados] = False
+        solo_posicion[completados] = False
+        return np.flatnonzero(completo), np.flatnonzero(solo_posicion)
+
+    def materializar(self, vuelo, i, ahora):
+        """Vuelca en el registro del vuelo el estado del motor (solo los que emiten un mensaje completo)"""
+        lat = float(self.lat[i])
+        lon = float(self.lon[i])
+        vuelo.progreso = float(self.progreso[i])
+        vuelo.combustible = float(self.combustible[i])
+        vuelo.emergencia = bool(self.emergencia[i])
+        vuelo.lat_actual = lat
+        vuelo.lon_actual = lon
+        vuelo.distancia_restante = round(float(self.distancia_restante[i]), 2)
+        eta_horas = float(self.eta_horas[i])
+        if math.isnan(eta_horas):
+            vuelo.t_eta = None
+        else:
+            vuelo.t_eta = ahora + eta_horas * 3600.0
+            vuelo.t_llegada_estimada = vuelo.t_eta
+
+        # El cono de la trayectoria vive en los arreglos: se copia al volcar
+        trayectoria = self.trayectorias[i]
+        if self.con_ultimo[i]:
+            trayectoria.ultimo = [lat, lon]
+            trayectoria.rumbo_base = float(self.rumbo_base[i])
+            trayectoria.cono_min = float(self.cono_min[i])
+            trayectoria.cono_max = float(self.cono_max[i])
+            trayectoria.alcance = float(self.alcance[i])
+        return vuelo
+
+    def posiciones(self, indices, ahora):
+        """Registros REGISTRO_POSICION de los vuelos indicados, ya empaquetados"""
+        registros = np.empty(len(indices), dtype=TIPO_POSICION)
+        registros['id'] = self.id_bytes[indices]
+        registros['lat'] = self.lat[indices]
+        registros['lon'] = self.lon[indices]
+        registros['progreso'] = self.progreso[indices]
+        registros['combustible'] = self.combustible[indices]
+        registros['distancia_restante'] = np.round(self.distancia_restante[indices], 2)
+        registros['eta'] = ahora + self.eta_horas[indices] * 3600.0
+        return registros.tobytes()
+
+    def deltas(self, indices, ahora):
+        """vuelo_update delta (AlmacenVuelos.a_delta sin campos marcados) de los vuelos indicados"""
+        ids = self.ids
+        columnas = zip(
+            [ids[i] for i in indices.tolist()],
+            self.lat[indices].tolist(),
+            self.lon[indices].tolist(),
+            self.progreso[indices].tolist(),
+            self.combustible[indices].tolist(),
+            np.round(self.distancia_restante[indices], 2).tolist(),
+            iso_lote(ahora + self.eta_horas[indices] * 3600.0)  # NaN (sin velocidad): None
+        )
+        return [{
+            'tipo': 'vuelo_update',
+            'delta': True,
+            'vuelo': {
+                'id': vuelo_id,
+                'lat_actual': lat,
+                'lon_actual': lon,
+                'progreso': progreso,
+                'combustible': combustible,
+                'distancia_restante': restante,
+                'eta': eta,
+                'hora_llegada_estimada': eta,
+                'punto': [lat, lon]
+            }
+        } for vuelo_id, lat, lon, progreso, combustible, restante, eta in columnas]
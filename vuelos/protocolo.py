@@ -0,0 +1,282 @@
+"""
+PROTOCOLO DE MENSAJES ENTRE MÓDULOS
+Cada conexión negocia su formato en el handshake:
+- 'json':    una línea JSON por mensaje (formato original, siempre disponible)
+- 'msgpack': cabecera de 4 bytes con la longitud + cuerpo msgpack (requiere el
+             paquete msgpack en ambos extremos)
+En 'msgpack' los deltas de posición de un frame viajan además como registros
+de tamaño fijo (struct) en el campo binario 'posiciones' del frame
+"""
+import json
+import math
+import os
+import struct
+from datetime import datetime
+
+try:
+    import msgpack
+except ImportError:  # msgpack es opcional: sin él se usa JSON por líneas
+    msgpack = None
+
+FORMATO_JSON = 'json'
+FORMATO_MSGPACK = 'msgpack'
+
+CABECERA = struct.Struct('!I')  # Longitud del cuerpo en 'msgpack'
+
+# Registro fijo del delta de posición de un vuelo (64 bytes):
+# id (16 bytes), lat, lon, progreso, combustible, distancia_restante, eta (timestamp)
+# Los None se envían como NaN
+REGISTRO_POSICION = struct.Struct('<16s6d')
+LARGO_MAXIMO_ID = 16
+NAN = float('nan')
+
+TAMANO_BUFFER = 65536   # Tamaño inicial del buffer de recepción (crece si un mensaje no cabe)
+LECTURA_MINIMA = 16384  # Espacio libre mínimo que se ofrece a cada recv_into
+
+
+def formatos_soportados():
+    """Formatos que este proceso puede hablar, en orden de preferencia"""
+    if msgpack is None or os.getenv('PROTOCOLO', '').strip().lower() == FORMATO_JSON:
+        return [FORMATO_JSON]
+    return [FORMATO_MSGPACK, FORMATO_JSON]
+
+
+def elegir_formato(ofrecidos):
+    """Primer formato ofrecido por el cliente que también soportamos (JSON si no hay)"""
+    soportados = formatos_soportados()
+    for formato in ofrecidos or []:
+        if formato in soportados:
+            return formato
+    return FORMATO_JSON
+
+
+def negociar(sock, info):
+    """
+    Envía la identificación ofreciendo los formatos soportados y espera la
+    confirmación (siempre una línea JSON). Devuelve (confirmacion, formato, sobrante):
+    sobrante son los bytes recibidos tras la confirmación, ya en el formato negociado
+    """
+    sock.send(json.dumps(dict(info, formatos=formatos_soportados())).encode('utf-8'))
+    datos = b''
+    while b'\n' not in datos:
+        parte = sock.recv(1024)
+        if not parte:
+            raise ConnectionError("Conexión cerrada durante el handshake")
+        datos += parte
+    linea, sobrante = datos.split(b'\n', 1)
+    confirmacion = json.loads(linea)
+    return confirmacion, confirmacion.get('formato', FORMATO_JSON), sobrante
+
+
+def empaquetar_posiciones(posiciones):
+    """
+    Empaqueta deltas de posición en registros fijos.
+    posiciones: tuplas (id, lat, lon, progreso, combustible, distancia_restante, t_eta)
+    """
+    tam = REGISTRO_POSICION.size
+    datos = bytearray(tam * len(posiciones))
+    for i, (vuelo_id, lat, lon, progreso, combustible, restante, eta) in enumerate(posiciones):
+        REGISTRO_POSICION.pack_into(
+            datos, i * tam, vuelo_id.encode('utf-8'), lat, lon, progreso, combustible,
+            NAN if restante is None else restante, NAN if eta is None else eta
+        )
+    return bytes(datos)
+
+
+def desempaquetar_posiciones(datos):
+    """Convierte los registros fijos en mensajes vuelo_update delta equivalentes"""
+    mensajes = []
+    for vuelo_id, lat, lon, progreso, combustible, restante, eta in REGISTRO_POSICION.iter_unpack(datos):
+        eta = None if math.isnan(eta) else datetime.fromtimestamp(eta).isoformat()
+        mensajes.append({
+            'tipo': 'vuelo_update',
+            'delta': True,
+            'vuelo': {
+                'id': vuelo_id.rstrip(b'\0').decode('utf-8'),
+                'lat_actual': lat,
+                'lon_actual': lon,
+                'progreso': progreso,
+                'combustible': combustible,
+                'distancia_restante': None if math.isnan(restante) else restante,
+                'eta': eta,
+                'hora_llegada_estimada': eta,
+                'punto': [lat, lon]
+            }
+        })
+    return mensajes
+
+
+def mensajes_de_frame(frame):
+    """Todos los vuelo_update de un frame (los genéricos y los empaquetados)"""
+    mensajes = frame.get('mensajes') or []
+    posiciones = frame.get('posiciones')
+    if posiciones:
+        mensajes = list(mensajes) + desempaquetar_posiciones(posiciones)
+    return mensajes
+
+
+def codificar_elementos(mensajes, formato=FORMATO_JSON):
+    """
+    Serializa una lista de mensajes sin sus delimitadores (los elementos
+    sueltos), para unirla después con otras en codificar_frame_combinado
+    """
+    if not mensajes:
+        return b''
+    if formato == FORMATO_MSGPACK:
+        datos = msgpack.packb(mensajes, use_bin_type=True)
+        n = len(mensajes)
+        return datos[1 if n < 16 else 3 if n < 0x10000 else 5:]  # Sin la cabecera del array
+    return json.dumps(mensajes)[1:-1].encode('utf-8')
+
+
+def codificar_frame_combinado(campos, trozos, formato=FORMATO_JSON):
+    """
+    Serializa un frame con los campos dados cuyo 'mensajes' y 'posiciones' son
+    la concatenación de trozos ya serializados: (cantidad de mensajes,
+    codificar_elementos(...), empaquetar_posiciones(...)). Da los mismos bytes
+    que codificar() del frame completo sin volver a serializar cada mensaje
+    """
+    cantidad = sum(trozo[0] for trozo in trozos)
+    elementos = [trozo[1] for trozo in trozos if trozo[0]]
+    posiciones = b''.join(trozo[2] for trozo in trozos)
+    if formato == FORMATO_MSGPACK:
+        empaquetador = msgpack.Packer(use_bin_type=True)
+        partes = [empaquetador.pack_map_header(len(campos) + (2 if posiciones else 1))]
+        for clave, valor in campos.items():
+            partes += [empaquetador.pack(clave), empaquetador.pack(valor)]
+        partes += [empaquetador.pack('mensajes'), empaquetador.pack_array_header(cantidad)]
+        partes += elementos
+        if posiciones:
+            partes += [empaquetador.pack('posiciones'), empaquetador.pack(posiciones)]
+        cuerpo = b''.join(partes)
+        return CABECERA.pack(len(cuerpo)) + cuerpo
+    if posiciones:
+        # JSON no lleva binario: los registros fijos se expanden a mensajes
+        elementos.append(codificar_elementos(desempaquetar_posiciones(posiciones)))
+    cabecera = json.dumps(campos)[:-1].encode('utf-8')
+    return cabecera + b', "mensajes": [' + b', '.join(elementos) + b']}\n'
+
+
+def codificar(mensaje, formato=FORMATO_JSON):
+    """Serializa un mensaje en el formato de la conexión"""
+    if formato == FORMATO_MSGPACK:
+        cuerpo = msgpack.packb(mensaje, use_bin_type=True)
+        return CABECERA.pack(len(cuerpo)) + cuerpo
+    if mensaje.get('posiciones'):
+        # JSON no lleva binario: los registros fijos se expanden a mensajes
+        mensaje = dict(mensaje, mensajes=mensajes_de_frame(mensaje))
+        del mensaje['posiciones']
+    return (json.dumps(mensaje) + '\n').encode('utf-8')
+
+
+class Decodificador:
+    """
+    Lector de flujo compartido por todos los módulos: recibe con recv_into en
+    un bytearray preasignado y separa los mensajes según el formato negociado
+    sin copiar el resto del buffer por cada mensaje.
+    leer(sock) y alimentar(data) devuelven pares (mensaje, crudo), donde crudo
+    es un memoryview de los bytes originales del mensaje (con su terminador o
+    cabecera) para reenviarlos; solo es válido hasta la siguiente lectura
+    """
+
+    def __init__(self, formato=FORMATO_JSON, sobrante=b'', tamano=TAMANO_BUFFER):
+        self.formato = formato
+        self.buffer = bytearray(max(tamano, len(sobrante)))
+        self.vista = memoryview(self.buffer)
+        self.inicio = 0    # Primer byte sin consumir
+        self.fin = 0       # Fin de los bytes recibidos
+        self.revisado = 0  # Hasta dónde se buscó un fin de línea sin encontrarlo
+        self.faltan = 0    # Bytes que aún faltan del mensaje msgpack incompleto
+        if sobrante:
+            self._copiar(sobrante)
+
+    def leer(self, sock):
+        """Recibe del socket directo al buffer; None si la conexión se cerró"""
+        self._reservar(max(self.faltan, LECTURA_MINIMA))
+        recibidos = sock.recv_into(self.vista[self.fin:])
+        if not recibidos:
+            return None
+        self.fin += recibidos
+        return self._mensajes()
+
+    def alimentar(self, data):
+        """Agrega bytes ya recibidos (p. ej. de un stream asyncio) y separa los mensajes"""
+        self._copiar(data)
+        return self._mensajes()
+
+    def _copiar(self, data):
+        self._reservar(len(data))
+        self.buffer[self.fin:self.fin + len(data)] = data
+        self.fin += len(data)
+
+    def _reservar(self, minimo):
+        """
+        Deja al menos `minimo` bytes libres al final del buffer: primero mueve el
+        mensaje incompleto al principio y, si no alcanza, duplica el buffer
+        """
+        if self.inicio == self.fin:
+            self.inicio = self.fin = self.revisado = 0
+        if len(self.buffer) - self.fin >= minimo:
+            return
+        pendiente = self.fin - self.inicio
+        tamano = len(self.buffer)
+        while tamano - pendiente < minimo:
+            tamano *= 2
+        if tamano == len(self.buffer):
+            # Mismo largo: no redimensiona el bytearray (puede haber memoryviews vivos)
+            self.buffer[:pendiente] = bytes(self.vista[self.inicio:self.fin])
+        else:
+            buffer = bytearray(tamano)
+            buffer[:pendiente] = self.vista[self.inicio:self.fin]
+            self.buffer = buffer
+            self.vista = memoryview(buffer)
+        self.revisado -= self.inicio
+        self.inicio = 0
+        self.fin = pendiente
+
+    def _mensajes(self):
+        if self.formato == FORMATO_MSGPACK:
+            return self._mensajes_msgpack()
+        return self._mensajes_json()
+
+    def _mensajes_json(self):
+        buffer = self.buffer
+        vista = self.vista
+        mensajes = []
+        inicio = self.inicio
+        fin = buffer.find(b'\n', self.revisado, self.fin)
+        while fin != -1:
+            crudo = vista[inicio:fin + 1]
+            inicio = fin + 1
+            fin = buffer.find(b'\n', inicio, self.fin)
+            try:
+                texto = str(crudo, 'utf-8')
+                if texto.strip():
+                    mensajes.append((json.loads(texto), crudo))
+            except ValueError:
+                print(f"⚠️  Mensaje JSON inválido descartado: {bytes(crudo[:100])}")
+        self.inicio = inicio
+        self.revisado = self.fin
+        return mensajes
+
+    def _mensajes_msgpack(self):
+        buffer = self.buffer
+        vista = self.vista
+        mensajes = []
+        inicio = self.inicio
+        tam_cabecera = CABECERA.size
+        self.faltan = 0
+        while self.fin - inicio >= tam_cabecera:
+            largo, = CABECERA.unpack_from(buffer, inicio)
+            fin = inicio + tam_cabecera + largo
+            if fin > self.fin:
+                self.faltan = fin - self.fin
+                break
+            crudo = vista[inicio:fin]
+            inicio = fin
+            try:
+                mensajes.append((msgpack.unpackb(crudo[tam_cabecera:], raw=False), crudo))
+            except Exception:
+                print(f"⚠️  Mensaje msgpack inválido descartado ({largo} bytes)")
+        self.inicio = inicio
+        return mensajes
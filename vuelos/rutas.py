@@ -0,0 +1,69 @@
+"""
+TABLA DE RUTAS ORTODRÓMICAS
+Precalcula una sola vez por par de aeropuertos la distancia, el rumbo inicial,
+el ángulo central Ω, sin(Ω) y los vectores cartesianos de los extremos, para
+que generar vuelos y cada paso de Slerp reutilicen esas constantes (las
+fórmulas están en geo.py)
+"""
+import math
+
+import geo
+
+
+class Ruta:
+    """Constantes de la ruta ortodrómica entre dos puntos"""
+
+    __slots__ = ('distancia', 'rumbo', 'omega', 'sin_omega', 'p0', 'p1')
+
+    def __init__(self, lat1, lon1, lat2, lon2, radio):
+        # Vectores unitarios de origen y destino
+        self.p0 = geo.vector_unitario(lat1, lon1)
+        self.p1 = geo.vector_unitario(lat2, lon2)
+        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+        self.omega = geo.angulo_central_rad(lat1, lon1, lat2, lon2)
+        self.sin_omega = math.sin(self.omega)
+        self.distancia = radio * self.omega
+        self.rumbo = (math.degrees(geo.rumbo_rad(lat1, lon1, lat2, lon2)) + 360) % 360
+
+    def posicion(self, t):
+        """Slerp con las constantes de la ruta: (lat, lon) en la fracción t"""
+        return geo.slerp_vectores(self.p0, self.p1, self.omega, self.sin_omega, t)
+
+
+class TablaRutas:
+    """Caché de rutas por coordenadas (y por índices de TablaAeropuertos)"""
+
+    def __init__(self, radio_tierra=geo.RADIO_TIERRA):
+        self.RADIO_TIERRA = radio_tierra
+        self.rutas = {}
+        self.por_indice = {}
+
+    def __len__(self):
+        return len(self.rutas)
+
+    def obtener(self, lat1, lon1, lat2, lon2):
+        """Devuelve la ruta entre dos puntos, calculándola la primera vez"""
+        clave = (lat1, lon1, lat2, lon2)
+        ruta = self.rutas.get(clave)
+        if ruta is None:
+            ruta = Ruta(lat1, lon1, lat2, lon2, self.RADIO_TIERRA)
+            self.rutas[clave] = ruta
+        return ruta
+
+    def entre(self, aeropuertos, origen, destino):
+        """Ruta entre dos índices de una TablaAeropuertos"""
+        ruta = self.por_indice.get((origen, destino))
+        if ruta is None:
+            ruta = self.obtener(aeropuertos.lat[origen], aeropuertos.lon[origen],
+                                aeropuertos.lat[destino], aeropuertos.lon[destino])
+            self.por_indice[(origen, destino)] = ruta
+        return ruta
+
+    def precalcular(self, aeropuertos):
+        """Calcula todas las rutas ordenadas entre los aeropuertos de la tabla"""
+        n = len(aeropuertos)
+        for origen in range(n):
+            for destino in range(n):
+                if origen != destino:
+                    self.entre(aeropuertos, origen, destino)
+        return self
@@ -0,0 +1,349 @@
+"""
+SIMULACIÓN PARTICIONADA EN PROCESOS (M2)
+Con PARTICIONES_SIMULACION=N el simulador reparte la flota en N procesos para
+usar N núcleos (el GIL limita a uno al simulador de un solo proceso):
+- Cada partición (SimuladorParticion) es un SimuladorVuelos completo que solo
+  genera y avanza los vuelos cuyo ID le pertenece (crc32 del ID módulo N) y
+  corre su propio bucle de ticks. Serializa ella misma sus mensajes en el
+  formato negociado y manda por un Pipe un lote por tick
+- El proceso padre (SimuladorParticionado) mantiene la única conexión con el
+  coordinador: reenvía los mensajes sueltos tal cual, une los updates de
+  todas las particiones en un solo frame por tick sin volver a serializarlos
+  (protocolo.codificar_frame_combinado), envía cada comando_atc a la
+  partición dueña del vuelo y reparte max_vuelos, el clima y los resets
+"""
+import time
+import zlib
+import random
+import struct
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+
+from m2_simulador import SimuladorVuelos
+from protocolo import (FORMATO_MSGPACK, REGISTRO_POSICION, codificar, codificar_elementos,
+                       codificar_frame_combinado)
+
+# Las particiones arrancan con spawn: con fork heredarían el socket del coordinador
+# y los extremos del padre de todos los Pipes, y no verían EOF al terminar el padre
+CONTEXTO = multiprocessing.get_context('spawn')
+
+# Lote de una partición: [cabecera][mensajes sueltos][trozo]...
+# cabecera: msgpack (0/1), vuelos activos, bytes de mensajes sueltos, cantidad de trozos
+# trozo: [cantidad de mensajes, bytes de mensajes, bytes de posiciones][mensajes][posiciones]
+CABECERA_LOTE = struct.Struct('<BIII')
+CABECERA_TROZO = struct.Struct('<III')
+
+
+def particion_de(vuelo_id, particiones):
+    """Partición dueña de un vuelo (estable entre procesos, a diferencia de hash())"""
+    return zlib.crc32(vuelo_id.encode('utf-8')) % particiones
+
+
+def cuota(total, indice, particiones):
+    """Parte de total que le toca a la partición indice (el resto va a las primeras)"""
+    return total // particiones + (1 if indice < total % particiones else 0)
+
+
+class SimuladorParticion(SimuladorVuelos):
+    """Simulador de una partición: habla con el proceso padre en vez del coordinador"""
+
+    def __init__(self, indice, particiones, conexion, formato, max_vuelos, espera=None):
+        super().__init__()
+        self.indice = indice
+        self.particiones = particiones
+        self.conexion = conexion
+        self.formato = formato
+        self.max_vuelos = cuota(max_vuelos, indice, particiones)
+        self.min_vuelos = cuota(self.min_vuelos, indice, particiones)
+        self.espera = self.DT if espera is None else espera  # Pausa entre ticks
+        self.lock_lote = threading.Lock()
+        self.sueltos = []  # Mensajes ya serializados, en orden
+        self.trozos = []   # (cantidad, mensajes, posiciones) de los frames
+        self.num_activos = 0
+
+    def nuevo_id(self):
+        """ID aleatorio que pertenezca a esta partición"""
+        while True:
+            vuelo_id = super().nuevo_id()
+            if particion_de(vuelo_id, self.particiones) == self.indice:
+                return vuelo_id
+
+    def actualizar_clima(self):
+        """El clima es global: lo decide el padre y llega como mensaje 'clima'"""
+        return False
+
+    def enviar_mensaje(self, mensaje):
+        with self.lock_lote:
+            self.sueltos.append(codificar(mensaje, self.formato))
+
+    def enviar_frame(self, updates, num_activos, posiciones=b''):
+        """Serializa los updates del tick en trozos; el padre solo los concatena"""
+        tam = max(1, self.MAX_UPDATES_POR_FRAME)
+        registro = REGISTRO_POSICION.size
+        with self.lock_lote:
+            for inicio in range(0, max(len(updates), len(posiciones) // registro), tam):
+                mensajes = updates[inicio:inicio + tam]
+                trozo = posiciones[inicio * registro:(inicio + tam) * registro]
+                self.trozos.append((len(mensajes), codificar_elementos(mensajes, self.formato), trozo))
+            self.num_activos = num_activos
+
+    def vaciar_lote(self):
+        """Manda al padre lo acumulado desde el último lote"""
+        with self.lock_lote:
+            sueltos = b''.join(self.sueltos)
+            partes = [CABECERA_LOTE.pack(self.formato == FORMATO_MSGPACK, self.num_activos,
+                                         len(sueltos), len(self.trozos)), sueltos]
+            for cantidad, mensajes, posiciones in self.trozos:
+                partes += [CABECERA_TROZO.pack(cantidad, len(mensajes), len(posiciones)), mensajes, posiciones]
+            self.sueltos, self.trozos = [], []
+            try:
+                self.conexion.send_bytes(b''.join(partes))
+            except OSError:
+                self.running = False  # El padre terminó
+
+    def procesar_comando(self, mensaje):
+        """Mensajes del coordinador reenviados por el padre y los propios del padre"""
+        tipo = mensaje.get('tipo')
+        if tipo == 'formato':
+            # Reconexión del padre: lo serializado en el formato anterior se descarta
+            with self.lock_lote:
+                self.formato = mensaje['formato']
+                self.sueltos, self.trozos = [], []
+        elif tipo == 'clima':
+            self.clima_global.update(mensaje['clima'])
+        elif tipo == 'configuracion':
+            self.max_vuelos = mensaje['max_vuelos']  # Ya validado y repartido por el padre
+        elif tipo == 'reset_estado':
+            self.reiniciar(mensaje['vuelos'])
+        else:
+            super().procesar_comando(mensaje)
+
+    def recibir_comandos(self):
+        """Recibe mensajes del padre"""
+        while self.running:
+            try:
+                mensaje = self.conexion.recv()
+            except (EOFError, OSError):
+                self.running = False  # El padre terminó
+                break
+            self.procesar_comando(mensaje)
+            # Lo que genere el comando (p. ej. un resync con la simulación pausada) sale ya
+            self.vaciar_lote()
+
+    def loop_simulacion(self):
+        """Ticks de la partición; un lote al padre por tick"""
+        self.generar_iniciales()
+        self.vaciar_lote()
+        while self.running:
+            if self.pausado:
+                time.sleep(0.1)
+                continue
+            self.paso_simulacion()
+            self.vaciar_lote()
+            if self.espera:
+                time.sleep(self.espera)
+
+
+def ejecutar_particion(clase, indice, particiones, conexion, formato, max_vuelos, espera=None):
+    """Punto de entrada del proceso de una partición (clase: SimuladorParticion o una subclase)"""
+    simulador = clase(indice, particiones, conexion, formato, max_vuelos, espera)
+    threading.Thread(target=simulador.recibir_comandos, daemon=True).start()
+    try:
+        simulador.loop_simulacion()
+    except KeyboardInterrupt:
+        pass
+
+
+class SimuladorParticionado(SimuladorVuelos):
+    """Proceso padre: una conexión con el coordinador y N particiones"""
+
+    PARTICION = SimuladorParticion
+
+    def __init__(self, particiones, espera=None, **kwargs):
+        super().__init__(**kwargs)
+        self.particiones = particiones
+        self.espera = espera  # Pausa entre ticks de las particiones (None = DT)
+        self.motor = None     # Los vuelos viven en las particiones
+        self.procesos = []
+        self.conexiones = []
+        self.lock_particiones = threading.Lock()
+        self.activos = [0] * particiones  # Vuelos activos informados por cada partición
+
+    def conectar(self):
+        conectado = super().conectar()
+        if conectado:
+            if not self.procesos:
+                # Las particiones arrancan con el formato ya negociado
+                self.iniciar_particiones()
+            else:
+                self.enviar_a_particiones({'tipo': 'formato', 'formato': self.formato})
+        return conectado
+
+    def iniciar_particiones(self):
+        for indice in range(self.particiones):
+            padre, hijo = CONTEXTO.Pipe()
+            proceso = CONTEXTO.Process(
+                target=ejecutar_particion, name=f"m2_particion_{indice}", daemon=True,
+                args=(self.PARTICION, indice, self.particiones, hijo, self.formato, self.max_vuelos, self.espera)
+            )
+            proceso.start()
+            hijo.close()
+            self.procesos.append(proceso)
+            self.conexiones.append(padre)
+        print(f"🧩 {self.particiones} particiones de simulación iniciadas")
+
+    def detener(self):
+        """Cierra los Pipes (las particiones terminan al leer EOF) y espera los procesos"""
+        self.running = False
+        for conexion in self.conexiones:
+            conexion.close()
+        for proceso in self.procesos:
+            proceso.join(timeout=5)
+            if proceso.is_alive():
+                proceso.terminate()
+
+    def enviar_a_particion(self, indice, mensaje):
+        with self.lock_particiones:
+            try:
+                self.conexiones[indice].send(mensaje)
+            except OSError as e:
+                print(f"❌ Partición {indice} no disponible: {e}")
+
+    def enviar_a_particiones(self, mensaje):
+        for indice in range(len(self.conexiones)):
+            self.enviar_a_particion(indice, mensaje)
+
+    def enviar_crudo(self, datos):
+        """Envía bytes ya serializados en el formato de la conexión"""
+        try:
+            self.socket.sendall(datos)
+        except Exception as e:
+            print(f"❌ Error enviando mensaje: {e}")
+            try:
+                formato = self.formato
+                if self.running:
+                    print("🔄 Reconectando al coordinador...")
+                    # Si el formato cambió, los bytes ya no sirven: se descartan
+                    if self.conectar() and self.formato == formato:
+                        self.socket.sendall(datos)
+            except Exception as e2:
+                print(f"❌ Error reintentando envío: {e2}")
+
+    def procesar_comando(self, mensaje):
+        """Reenvía cada mensaje del coordinador a la partición que corresponde"""
+        tipo = mensaje.get('tipo')
+        if tipo == 'comando':
+            super().procesar_comando(mensaje)  # pausar/reanudar también aquí
+            self.enviar_a_particiones(mensaje)
+        elif tipo == 'comando_atc':
+            vuelo_id = mensaje.get('vuelo_id')
+            if vuelo_id:
+                self.enviar_a_particion(particion_de(vuelo_id, self.particiones), mensaje)
+        elif tipo == 'crear_vuelo_manual':
+            vuelo_id = (mensaje.get('id') or self.nuevo_id()).upper()
+            self.enviar_a_particion(particion_de(vuelo_id, self.particiones), dict(mensaje, id=vuelo_id))
+        elif tipo == 'configuracion':
+            if 'max_vuelos' in mensaje:
+                nuevo_max = mensaje['max_vuelos']
+                if 50 <= nuevo_max <= 50000:
+                    self.max_vuelos = nuevo_max
+                    print(f"⚙️  Máximo de vuelos actualizado: {self.max_vuelos}")
+                    print(f"   Vuelos activos actualmente: {sum(self.activos)}")
+                    for indice in range(self.particiones):
+                        self.enviar_a_particion(indice, {'tipo': 'configuracion',
+                                                         'max_vuelos': cuota(nuevo_max, indice, self.particiones)})
+                else:
+                    print(f"⚠️  El máximo debe estar entre 50 y 50,000 (recibido: {nuevo_max})")
+        elif tipo == 'reset_estado':
+            print("♻️  Reset de estado recibido: limpiando y generando vuelos aleatorios")
+            objetivo = max(50, min(self.max_vuelos, 50000))
+            vuelos_iniciales = random.randint(50, objetivo)
+            print(f"   Generando {vuelos_iniciales} vuelos iniciales (rango 50–{objetivo})")
+            for indice in range(self.particiones):
+                self.enviar_a_particion(indice, {'tipo': 'reset_estado',
+                                                 'vuelos': cuota(vuelos_iniciales, indice, self.particiones)})
+
+    def leer_lote(self, indice, datos, sueltos, trozos):
+        """Separa un lote de la partición en sus mensajes sueltos y sus trozos de frame"""
+        es_msgpack, num_activos, largo_sueltos, cantidad_trozos = CABECERA_LOTE.unpack_from(datos)
+        self.activos[indice] = num_activos
+        if es_msgpack != (self.formato == FORMATO_MSGPACK):
+            return  # Serializado antes de un cambio de formato
+        vista = memoryview(datos)
+        posicion = CABECERA_LOTE.size
+        if largo_sueltos:
+            sueltos.append(vista[posicion:posicion + largo_sueltos])
+            posicion += largo_sueltos
+        for _ in range(cantidad_trozos):
+            cantidad, largo_mensajes, largo_posiciones = CABECERA_TROZO.unpack_from(datos, posicion)
+            posicion += CABECERA_TROZO.size
+            mensajes = vista[posicion:posicion + largo_mensajes]
+            posicion += largo_mensajes
+            trozos.append((cantidad, mensajes, vista[posicion:posicion + largo_posiciones]))
+            posicion += largo_posiciones
+
+    def enviar_combinado(self, sueltos, trozos):
+        """
+        Los mensajes sueltos de todas las particiones y después un frame con los
+        updates de todas (en partes de hasta MAX_UPDATES_POR_FRAME), en un envío.
+        Si ninguna partición mandó updates (p. ej. un resync en pausa) no hay frame
+        """
+        tam = max(1, self.MAX_UPDATES_POR_FRAME)
+        grupos, grupo, mensajes, posiciones = [], [], 0, 0
+        for trozo in trozos:
+            registros = len(trozo[2]) // REGISTRO_POSICION.size
+            if grupo and (mensajes + trozo[0] > tam or posiciones + registros > tam):
+                grupos.append(grupo)
+                grupo, mensajes, posiciones = [], 0, 0
+            grupo.append(trozo)
+            mensajes += trozo[0]
+            posiciones += registros
+        if grupo:
+            grupos.append(grupo)
+        campos = {
+            'tipo': 'frame',
+            'tick': self.tick_actual,
+            'parte': 0,
+            'partes': len(grupos),
+            'vuelos_activos': sum(self.activos)
+        }
+        frames = [codificar_frame_combinado(dict(campos, parte=parte), grupo, self.formato)
+                  for parte, grupo in enumerate(grupos)]
+        self.enviar_crudo(b''.join(sueltos + frames))
+
+    def loop_simulacion(self):
+        """Reúne los lotes de las particiones y emite un frame combinado cada DT"""
+        print(f"🚀 Iniciando simulación de vuelos en {self.particiones} particiones...")
+        print(f"   Configuración: Máximo {self.max_vuelos} vuelos simultáneos")
+        print(f"   Aeropuertos disponibles: {len(self.aeropuertos)} en todo el mundo")
+
+        indices = {conexion: indice for indice, conexion in enumerate(self.conexiones)}
+        vivas = list(self.conexiones)
+        sueltos, trozos, recibidos = [], [], False
+        siguiente = time.monotonic() + self.DT
+        while self.running and vivas:
+            for conexion in wait(vivas, max(0.0, siguiente - time.monotonic())):
+                try:
+                    datos = conexion.recv_bytes()
+                except (EOFError, OSError):
+                    vivas.remove(conexion)
+                    self.activos[indices[conexion]] = 0
+                    if self.running:  # Si no, es detener() cerrando los Pipes
+                        print(f"❌ La partición {indices[conexion]} terminó")
+                    continue
+                self.leer_lote(indices[conexion], datos, sueltos, trozos)
+                recibidos = True
+
+            ahora = time.monotonic()
+            if ahora < siguiente:
+                continue
+            siguiente += self.DT
+            if siguiente < ahora:
+                siguiente = ahora + self.DT  # Atrasado: no encadenar frames vacíos
+            if not self.pausado and self.actualizar_clima():
+                self.enviar_a_particiones({'tipo': 'clima', 'clima': dict(self.clima_global)})
+            if recibidos:
+                self.enviar_combinado(sueltos, trozos)
+                self.tick_actual += 1
+                sueltos, trozos, recibidos = [], [], False
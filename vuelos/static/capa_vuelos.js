@@ -0,0 +1,394 @@
+/*
+ * CAPA DE VUELOS EN CANVAS (M4)
+ * Reemplaza un L.marker con divIcon más un L.polyline por vuelo. Los vuelos
+ * viven en arreglos tipados por slot (posición en Mercator normalizado, rumbo,
+ * estado) y se dibujan en un solo canvas: todos los aviones en un path por
+ * color y todas las trayectorias en otro, con un fill/stroke cada uno.
+ * En cada dibujo se arma una grilla de píxeles con los aviones en pantalla
+ * para resolver los clicks sin recorrer todos los vuelos.
+ *
+ * Uso:
+ *   const capa = new CapaVuelos({ alClick: id => ... }).addTo(map);
+ *   capa.agregar(vuelo)             // estado completo (nuevo_vuelo) con num
+ *   capa.actualizar(vuelo)          // estado ya fusionado (frame_vuelos)
+ *   capa.aplicarFrame(leerFrameBinario(buffer))
+ *   capa.quitar(id)
+ */
+(function () {
+    const MAX_PUNTOS = 300;       // Puntos de trayectoria por vuelo antes de recortar
+    const CELDA = 24;             // Lado de la celda de la grilla de clicks, en píxeles
+    const RADIO_CLICK = 12;
+    const PASO_MINIMO = 2;        // Píxeles entre puntos dibujados de una trayectoria
+    const LAT_MAXIMA = 85.0511287798;
+    const COLOR = '#fbbf24';
+    const COLOR_EMERGENCIA = '#ef4444';
+    const COLOR_TRAYECTORIA = 'rgba(255, 0, 170, 0.8)';
+    const COLOR_TRAYECTORIA_EMERGENCIA = 'rgba(239, 68, 68, 0.8)';
+    const ACTIVO = 1;
+    const EMERGENCIA = 2;
+    const COLUMNAS_FRAME = ['lat_actual', 'lon_actual', 'rumbo', 'progreso',
+                            'altitud', 'velocidad', 'combustible', 'distancia_restante'];
+
+    // Frame binario de M4 (frame_binario.py) como vistas tipadas sobre el buffer.
+    // Los arreglos tipados usan el orden de bytes de la máquina, little-endian en la práctica
+    function leerFrameBinario(buffer) {
+        const cabecera = new Uint32Array(buffer, 0, 2);
+        const n = cabecera[0], m = cabecera[1];
+        let posicion = 8;
+        const frame = { n, m, nums: new Int32Array(buffer, posicion, n) };
+        posicion += 4 * n;
+        for (const campo of COLUMNAS_FRAME) {
+            frame[campo] = new Float32Array(buffer, posicion, n);
+            posicion += 4 * n;
+        }
+        frame.eta = new Int32Array(buffer, posicion, n);
+        posicion += 4 * n;
+        frame.fuera = new Int32Array(buffer, posicion, m);
+        posicion += 4 * m;
+        frame.estado = new Uint8Array(buffer, posicion, n);
+        return frame;
+    }
+
+    function mercatorX(lon) {
+        return (lon + 180) / 360;
+    }
+
+    function mercatorY(lat) {
+        const phi = Math.max(-LAT_MAXIMA, Math.min(LAT_MAXIMA, lat)) * Math.PI / 180;
+        return (1 - Math.log(Math.tan(Math.PI / 4 + phi / 2)) / Math.PI) / 2;
+    }
+
+    function crecer(arreglo, capacidad) {
+        const nuevo = new arreglo.constructor(capacidad);
+        nuevo.set(arreglo);
+        return nuevo;
+    }
+
+    const CapaVuelos = L.Layer.extend({
+        initialize: function (opciones) {
+            L.setOptions(this, opciones);
+            this._capacidad = 1024;
+            this._usados = 0;          // Slots por debajo de este índice pueden estar vivos
+            this._libres = [];
+            this._vivo = new Uint8Array(this._capacidad);
+            this._mx = new Float64Array(this._capacidad);
+            this._my = new Float64Array(this._capacidad);
+            this._cos = new Float32Array(this._capacidad);
+            this._sin = new Float32Array(this._capacidad);
+            this._estado = new Uint8Array(this._capacidad);
+            this._ids = [];
+            this._trayectorias = [];   // Por slot: [mx, my, mx, my, ...]
+            this._slotPorId = new Map();
+            this._slotPorNum = new Map();
+            this._numPorSlot = new Int32Array(this._capacidad).fill(-1);
+            this._seleccionado = -1;
+            this._pendiente = false;
+            // Grilla de clicks (se rehace en cada dibujo)
+            this._px = new Float32Array(this._capacidad);
+            this._py = new Float32Array(this._capacidad);
+            this._enPantalla = new Int32Array(this._capacidad);
+            this._celdaDe = new Int32Array(this._capacidad);
+            this._inicioCelda = new Int32Array(1);
+            this._itemsCelda = new Int32Array(this._capacidad);
+            this._columnas = 0;
+            this._filas = 0;
+        },
+
+        onAdd: function (map) {
+            this._map = map;
+            this._canvas = L.DomUtil.create('canvas', 'leaflet-zoom-hide');
+            this._canvas.style.pointerEvents = 'none';
+            map.getPanes().overlayPane.appendChild(this._canvas);
+            map.on('move moveend zoomend', this._redibujar, this);
+            map.on('resize', this._ajustarTamano, this);
+            map.on('click', this._click, this);
+            this._ajustarTamano();
+        },
+
+        onRemove: function (map) {
+            L.DomUtil.remove(this._canvas);
+            map.off('move moveend zoomend', this._redibujar, this);
+            map.off('resize', this._ajustarTamano, this);
+            map.off('click', this._click, this);
+        },
+
+        // ---------- Datos ----------
+
+        _slot: function (id) {
+            let slot = this._slotPorId.get(id);
+            if (slot !== undefined) return slot;
+            if (this._libres.length) {
+                slot = this._libres.pop();
+            } else {
+                if (this._usados === this._capacidad) this._ampliar();
+                slot = this._usados++;
+            }
+            this._slotPorId.set(id, slot);
+            this._ids[slot] = id;
+            this._vivo[slot] = 1;
+            this._trayectorias[slot] = [];
+            return slot;
+        },
+
+        _ampliar: function () {
+            const capacidad = this._capacidad * 2;
+            for (const campo of ['_vivo', '_mx', '_my', '_cos', '_sin', '_estado', '_numPorSlot',
+                                 '_px', '_py', '_enPantalla', '_celdaDe', '_itemsCelda']) {
+                this[campo] = crecer(this[campo], capacidad);
+            }
+            this._numPorSlot.fill(-1, this._capacidad);
+            this._capacidad = capacidad;
+        },
+
+        _mover: function (slot, lat, lon, rumbo, estado) {
+            const mx = mercatorX(lon), my = mercatorY(lat);
+            this._mx[slot] = mx;
+            this._my[slot] = my;
+            const angulo = (rumbo || 0) * Math.PI / 180;
+            this._cos[slot] = Math.cos(angulo);
+            this._sin[slot] = Math.sin(angulo);
+            this._estado[slot] = estado;
+            const puntos = this._trayectorias[slot];
+            const k = puntos.length;
+            if (k === 0 || puntos[k - 2] !== mx || puntos[k - 1] !== my) {
+                puntos.push(mx, my);
+                if (puntos.length > 2 * MAX_PUNTOS) puntos.splice(0, MAX_PUNTOS);  // Se queda con la mitad más nueva
+            }
+        },
+
+        agregar: function (vuelo) {
+            const slot = this._slot(vuelo.id);
+            if (vuelo.num !== undefined) {
+                this._slotPorNum.set(vuelo.num, slot);
+                this._numPorSlot[slot] = vuelo.num;
+            }
+            const puntos = this._trayectorias[slot];
+            puntos.length = 0;
+            for (const p of vuelo.trayectoria || []) {
+                puntos.push(mercatorX(p[1]), mercatorY(p[0]));
+            }
+            this.actualizar(vuelo);
+        },
+
+        actualizar: function (vuelo) {
+            const slot = this._slotPorId.get(vuelo.id);
+            if (slot === undefined) return;
+            const estado = (vuelo.activo === false ? 0 : ACTIVO) | (vuelo.emergencia ? EMERGENCIA : 0);
+            this._mover(slot, vuelo.lat || vuelo.lat_actual, vuelo.lon || vuelo.lon_actual,
+                        vuelo.heading || vuelo.rumbo, estado);
+            this._programar();
+        },
+
+        aplicarFrame: function (frame) {
+            for (let i = 0; i < frame.n; i++) {
+                const slot = this._slotPorNum.get(frame.nums[i]);
+                if (slot === undefined) continue;
+                this._mover(slot, frame.lat_actual[i], frame.lon_actual[i], frame.rumbo[i], frame.estado[i]);
+            }
+            this._programar();
+        },
+
+        quitar: function (id) {
+            const slot = this._slotPorId.get(id);
+            if (slot === undefined) return;
+            this._slotPorId.delete(id);
+            if (this._numPorSlot[slot] >= 0) this._slotPorNum.delete(this._numPorSlot[slot]);
+            this._numPorSlot[slot] = -1;
+            this._vivo[slot] = 0;
+            this._ids[slot] = undefined;
+            this._trayectorias[slot] = null;
+            this._libres.push(slot);
+            if (this._seleccionado === slot) this._seleccionado = -1;
+            this._programar();
+        },
+
+        limpiar: function () {
+            this._slotPorId.clear();
+            this._slotPorNum.clear();
+            this._vivo.fill(0);
+            this._numPorSlot.fill(-1);
+            this._ids = [];
+            this._trayectorias = [];
+            this._libres = [];
+            this._usados = 0;
+            this._seleccionado = -1;
+            this._programar();
+        },
+
+        seleccionar: function (id) {
+            const slot = this._slotPorId.get(id);
+            this._seleccionado = slot === undefined ? -1 : slot;
+            this._programar();
+        },
+
+        cantidad: function () {
+            return this._slotPorId.size;
+        },
+
+        // ---------- Dibujo ----------
+
+        _ajustarTamano: function () {
+            const tamano = this._map.getSize();
+            const escala = window.devicePixelRatio || 1;
+            this._canvas.width = tamano.x * escala;
+            this._canvas.height = tamano.y * escala;
+            this._canvas.style.width = tamano.x + 'px';
+            this._canvas.style.height = tamano.y + 'px';
+            this._escalaPixel = escala;
+            this._redibujar();
+        },
+
+        _programar: function () {
+            if (this._pendiente || !this._map) return;
+            this._pendiente = true;
+            L.Util.requestAnimFrame(this._redibujar, this);
+        },
+
+        _redibujar: function () {
+            this._pendiente = false;
+            if (!this._map) return;
+            const inicio = performance.now();
+            this.dibujar();
+            this.ultimoDibujoMs = performance.now() - inicio;
+        },
+
+        dibujar: function () {
+            const map = this._map;
+            const esquina = map.containerPointToLayerPoint([0, 0]);
+            L.DomUtil.setPosition(this._canvas, esquina);
+            const tamano = map.getSize();
+            const ancho = tamano.x, alto = tamano.y;
+            const ctx = this._canvas.getContext('2d');
+            ctx.setTransform(this._escalaPixel, 0, 0, this._escalaPixel, 0, 0);
+            ctx.clearRect(0, 0, ancho, alto);
+
+            // Píxel de contenedor = Mercator normalizado * escala - origen
+            const escala = 256 * Math.pow(2, map.getZoom());
+            const origen = map.getPixelOrigin();
+            const ox = origen.x + esquina.x, oy = origen.y + esquina.y;
+
+            // Posiciones en pantalla de los vuelos visibles
+            let visibles = 0;
+            for (let s = 0; s < this._usados; s++) {
+                if (!this._vivo[s]) continue;
+                const x = this._mx[s] * escala - ox, y = this._my[s] * escala - oy;
+                if (x < -RADIO_CLICK || y < -RADIO_CLICK || x > ancho + RADIO_CLICK || y > alto + RADIO_CLICK) continue;
+                this._px[s] = x;
+                this._py[s] = y;
+                this._enPantalla[visibles++] = s;
+            }
+            this.visibles = visibles;
+
+            // Trayectorias: un stroke por color, puntos a menos de PASO_MINIMO px se saltean
+            ctx.lineWidth = 2;
+            for (const emergencia of [false, true]) {
+                ctx.beginPath();
+                for (let k = 0; k < visibles; k++) {
+                    const s = this._enPantalla[k];
+                    if (((this._estado[s] & EMERGENCIA) !== 0) !== emergencia) continue;
+                    const puntos = this._trayectorias[s];
+                    if (puntos.length < 2) continue;
+                    let ux = puntos[0] * escala - ox, uy = puntos[1] * escala - oy;
+                    ctx.moveTo(ux, uy);
+                    for (let j = 2; j < puntos.length; j += 2) {
+                        const x = puntos[j] * escala - ox, y = puntos[j + 1] * escala - oy;
+                        if (Math.abs(x - ux) + Math.abs(y - uy) < PASO_MINIMO && j < puntos.length - 2) continue;
+                        ctx.lineTo(x, y);
+                        ux = x;
+                        uy = y;
+                    }
+                }
+                ctx.strokeStyle = emergencia ? COLOR_TRAYECTORIA_EMERGENCIA : COLOR_TRAYECTORIA;
+                ctx.stroke();
+            }
+
+            // Aviones: un triángulo orientado por vuelo, un fill por color
+            for (const emergencia of [false, true]) {
+                ctx.beginPath();
+                for (let k = 0; k < visibles; k++) {
+                    const s = this._enPantalla[k];
+                    if (((this._estado[s] & EMERGENCIA) !== 0) !== emergencia) continue;
+                    const x = this._px[s], y = this._py[s];
+                    const c = this._cos[s], n = this._sin[s];  // Rumbo: 0 = norte, horario
+                    ctx.moveTo(x + 8 * n, y - 8 * c);
+                    ctx.lineTo(x - 5 * c - 6 * n, y - 5 * n + 6 * c);
+                    ctx.lineTo(x + 5 * c - 6 * n, y + 5 * n + 6 * c);
+                    ctx.closePath();
+                }
+                ctx.fillStyle = emergencia ? COLOR_EMERGENCIA : COLOR;
+                ctx.fill();
+            }
+
+            const s = this._seleccionado;
+            if (s >= 0 && this._vivo[s]) {
+                ctx.beginPath();
+                ctx.arc(this._mx[s] * escala - ox, this._my[s] * escala - oy, 12, 0, 2 * Math.PI);
+                ctx.strokeStyle = '#ffffff';
+                ctx.stroke();
+            }
+
+            this._indexar(visibles, ancho, alto);
+        },
+
+        // Grilla de CELDA px con los vuelos en pantalla (ordenamiento por conteo)
+        _indexar: function (visibles, ancho, alto) {
+            this._columnas = Math.ceil((ancho + 2 * RADIO_CLICK) / CELDA);
+            this._filas = Math.ceil((alto + 2 * RADIO_CLICK) / CELDA);
+            const celdas = this._columnas * this._filas;
+            if (this._inicioCelda.length < celdas + 1) this._inicioCelda = new Int32Array(celdas + 1);
+            const inicio = this._inicioCelda;
+            inicio.fill(0, 0, celdas + 1);
+            for (let k = 0; k < visibles; k++) {
+                const s = this._enPantalla[k];
+                const celda = this._celda(this._px[s], this._py[s]);
+                this._celdaDe[k] = celda;
+                inicio[celda + 1]++;
+            }
+            for (let c = 0; c < celdas; c++) inicio[c + 1] += inicio[c];
+            const cursor = inicio.slice(0, celdas);
+            for (let k = 0; k < visibles; k++) {
+                this._itemsCelda[cursor[this._celdaDe[k]]++] = this._enPantalla[k];
+            }
+        },
+
+        _celda: function (x, y) {
+            const columna = Math.min(this._columnas - 1, Math.max(0, Math.floor((x + RADIO_CLICK) / CELDA)));
+            const fila = Math.min(this._filas - 1, Math.max(0, Math.floor((y + RADIO_CLICK) / CELDA)));
+            return fila * this._columnas + columna;
+        },
+
+        // Id del vuelo más cercano al punto del contenedor, o null
+        vueloEn: function (x, y) {
+            if (!this._columnas) return null;
+            const columna = Math.floor((x + RADIO_CLICK) / CELDA);
+            const fila = Math.floor((y + RADIO_CLICK) / CELDA);
+            let mejor = -1, mejorDistancia = RADIO_CLICK * RADIO_CLICK;
+            for (let f = fila - 1; f <= fila + 1; f++) {
+                if (f < 0 || f >= this._filas) continue;
+                for (let c = columna - 1; c <= columna + 1; c++) {
+                    if (c < 0 || c >= this._columnas) continue;
+                    const celda = f * this._columnas + c;
+                    for (let k = this._inicioCelda[celda]; k < this._inicioCelda[celda + 1]; k++) {
+                        const s = this._itemsCelda[k];
+                        if (!this._vivo[s]) continue;
+                        const dx = this._px[s] - x, dy = this._py[s] - y;
+                        const distancia = dx * dx + dy * dy;
+                        if (distancia <= mejorDistancia) {
+                            mejor = s;
+                            mejorDistancia = distancia;
+                        }
+                    }
+                }
+            }
+            return mejor >= 0 ? this._ids[mejor] : null;
+        },
+
+        _click: function (e) {
+            const id = this.vueloEn(e.containerPoint.x, e.containerPoint.y);
+            if (id !== null && this.options.alClick) this.options.alClick(id);
+        }
+    });
+
+    window.CapaVuelos = CapaVuelos;
+    window.leerFrameBinario = leerFrameBinario;
+})();
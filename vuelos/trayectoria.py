@@ -0,0 +1,139 @@
+"""
+TRAYECTORIA ACOTADA Y SIMPLIFICADA
+Reemplaza la lista de puntos que crecía cada tick y se recortaba con
+[-1000:] (una copia por tick y vuelo). Los puntos se simplifican al llegar
+con el algoritmo del cono (sleeve): desde el último punto fijo se mantiene
+el rango de rumbos con el que una recta pasa a menos de `tolerancia` de
+todos los puntos descartados. Mientras el punto nuevo cae dentro del rango
+(y no retrocede hacia el punto fijo), reemplaza al extremo provisional; si
+no, el extremo se fija. Cada punto cuesta O(1), y un arco de círculo máximo
+queda en pocas decenas de puntos.
+Los puntos fijos van en un buffer circular de capacidad fija (un array int32
+con lat, lon intercalados en microgrados, como el archivo de trayectorias de
+M3) que crece hasta la capacidad y desde ahí pisa el más viejo. El extremo
+provisional es la posición actual exacta. Las distancias son planas en
+grados, suficiente a escala de tolerancia
+"""
+import math
+from array import array
+
+CAPACIDAD = 1000
+TOLERANCIA_GRADOS = 0.005  # ~550 m
+MICROGRADOS = 1_000_000
+
+
+class Trayectoria:
+    """Buffer circular de puntos fijos más el extremo provisional (posición actual)"""
+
+    __slots__ = ('capacidad', 'tolerancia', 'fijos', 'inicio',
+                 'ancla_lat', 'ancla_lon', 'ultimo', 'rumbo_base', 'cono_min', 'cono_max',
+                 'alcance')
+
+    def __init__(self, capacidad=CAPACIDAD, tolerancia=TOLERANCIA_GRADOS):
+        self.capacidad = max(2, capacidad)
+        self.tolerancia = tolerancia
+        self.fijos = array('i')  # lat, lon, lat, lon, ...
+        self.inicio = 0      # Posición del punto fijo más viejo una vez lleno el buffer
+        self.ancla_lat = self.ancla_lon = None  # Último punto fijo
+        self.ultimo = None   # Extremo provisional [lat, lon]
+        self.rumbo_base = 0.0
+        self.cono_min = -math.pi
+        self.cono_max = math.pi
+        self.alcance = 0.0   # Mayor distancia al punto fijo de los puntos descartados
+
+    @classmethod
+    def desde_puntos(cls, puntos, **opciones):
+        trayectoria = cls(**opciones)
+        for lat, lon in puntos:
+            trayectoria.agregar(lat, lon)
+        return trayectoria
+
+    def __len__(self):
+        return len(self.fijos) // 2 + (self.ultimo is not None)
+
+    def __iter__(self):
+        return iter(self.puntos())
+
+    def _fijar(self, lat, lon):
+        lat_micro = round(lat * MICROGRADOS)
+        lon_micro = round(lon * MICROGRADOS)
+        if len(self.fijos) < 2 * self.capacidad:
+            self.fijos.append(lat_micro)
+            self.fijos.append(lon_micro)
+        else:
+            self.fijos[self.inicio] = lat_micro
+            self.fijos[self.inicio + 1] = lon_micro
+            self.inicio = (self.inicio + 2) % (2 * self.capacidad)
+        self.ancla_lat = lat_micro / MICROGRADOS
+        self.ancla_lon = lon_micro / MICROGRADOS
+
+    def fijar(self, lat, lon):
+        """
+        Agrega (lat, lon) como punto fijo y devuelve el ancla redondeada. Lo usa
+        el motor vectorizado, que lleva el cono de toda la flota en sus arreglos
+        """
+        self._fijar(lat, lon)
+        return self.ancla_lat, self.ancla_lon
+
+    def _abrir_cono(self, lat, lon):
+        """Rango de rumbos desde el último punto fijo que respeta el punto (lat, lon)"""
+        dlat = lat - self.ancla_lat
+        dlon = lon - self.ancla_lon
+        distancia = math.hypot(dlat, dlon)
+        self.rumbo_base = math.atan2(dlat, dlon)
+        self.alcance = distancia
+        if distancia <= self.tolerancia:
+            self.cono_min, self.cono_max = -math.pi, math.pi
+        else:
+            # tolerancia / distancia <= asin(tolerancia / distancia):
+            # cono algo más estrecho, más barato
+            abertura = self.tolerancia / distancia
+            self.cono_min, self.cono_max = -abertura, abertura
+
+    def agregar(self, lat, lon):
+        if self.ultimo is None:
+            if self.ancla_lat is None:
+                self._fijar(lat, lon)
+            else:
+                self.ultimo = [lat, lon]
+                self._abrir_cono(lat, lon)
+            return
+        dlat = lat - self.ancla_lat
+        dlon = lon - self.ancla_lon
+        distancia = math.hypot(dlat, dlon)
+        if distancia <= self.tolerancia and self.alcance <= self.tolerancia:
+            self.ultimo = [lat, lon]  # Todo cerca del punto fijo: cualquier recta sirve
+            return
+        # Rumbo relativo al del cono, en (-pi, pi]
+        rumbo = math.atan2(dlat, dlon) - self.rumbo_base
+        if rumbo > math.pi:
+            rumbo -= 2 * math.pi
+        elif rumbo <= -math.pi:
+            rumbo += 2 * math.pi
+        # Dentro del cono y sin volver atrás: la recta al punto nuevo cubre a los descartados
+        if self.cono_min <= rumbo <= self.cono_max and distancia >= self.alcance - self.tolerancia:
+            self.ultimo = [lat, lon]
+            self.alcance = max(self.alcance, distancia)
+            abertura = self.tolerancia / distancia
+            self.cono_min = max(self.cono_min, rumbo - abertura)
+            self.cono_max = min(self.cono_max, rumbo + abertura)
+        else:
+            # Se sale del cono: el extremo provisional pasa a ser un punto fijo
+            self._fijar(*self.ultimo)
+            self.ultimo = [lat, lon]
+            self._abrir_cono(lat, lon)
+
+    def ultimo_punto(self):
+        """Posición más reciente [lat, lon] (el 'punto' de los deltas)"""
+        if self.ultimo is not None:
+            return self.ultimo
+        return [self.ancla_lat, self.ancla_lon] if self.ancla_lat is not None else None
+
+    def puntos(self):
+        """Lista [[lat, lon], ...] de la más vieja a la actual"""
+        fijos = self.fijos[self.inicio:] + self.fijos[:self.inicio]
+        puntos = [[lat / MICROGRADOS, lon / MICROGRADOS]
+                  for lat, lon in zip(fijos[::2], fijos[1::2])]
+        if self.ultimo is not None:
+            puntos.append(list(self.ultimo))
+        return puntos